@@ -0,0 +1,110 @@
+# benchmarks/backends_ocr.py
+"""Compara los motores de inferencia de OCR (ver project/ocr_backends.py).
+
+Cada motor se ejecuta en un proceso nuevo, para que el pico de memoria de uno no
+contamine al siguiente. Sobre las imágenes de ejemplo (por defecto project/uploads)
+se informa:
+
+* latencia mediana y p95 de 'readtext' por imagen, tras una lectura de calentamiento;
+* rendimiento en imágenes por segundo;
+* pico de memoria residente del proceso (incluye la carga del modelo);
+* paridad: si 'parse_ocr_text' entrega la misma fecha y monto que el motor de
+  referencia (el primero de '--backends') en cada imagen.
+
+Uso (desde la carpeta que contiene run.py):
+
+    python benchmarks/backends_ocr.py --backends int8 fp32 onnx --repeticiones 3
+
+Termina con código 1 si algún motor no coincide con la referencia, de modo que
+sirve también como prueba de paridad antes de cambiar OCR_BACKEND en producción.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.preprocesamiento_ocr import imagenes_de  # noqa: E402
+
+# Se ejecuta en el subproceso: carga el motor, lee todas las imágenes y devuelve JSON.
+_PLANTILLA = """
+import json, resource, statistics, sys, time
+sys.path.insert(0, {raiz!r})
+from project.ocr_backends import crear_reader
+from project.ocr import parse_ocr_text
+rutas = {rutas!r}
+inicio = time.perf_counter()
+reader = crear_reader({backend!r}, {carpeta_onnx!r})
+carga = time.perf_counter() - inicio
+reader.readtext(rutas[0], detail=0)
+latencias, resultados = [], {{}}
+inicio = time.perf_counter()
+for _ in range({repeticiones}):
+    for ruta in rutas:
+        t = time.perf_counter()
+        textos = reader.readtext(ruta, detail=0, paragraph=False)
+        latencias.append(time.perf_counter() - t)
+        resultados[ruta] = list(parse_ocr_text(textos))
+total = time.perf_counter() - inicio
+latencias.sort()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "carga_s": carga,
+    "p50_ms": statistics.median(latencias) * 1000,
+    "p95_ms": latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))] * 1000,
+    "imagenes_por_s": len(latencias) / total,
+    "rss_mb": rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024,
+    "resultados": resultados,
+}}))
+"""
+
+def medir_backend(backend, rutas, repeticiones, carpeta_onnx):
+    """Ejecuta un motor en un subproceso y devuelve sus medidas."""
+    codigo = _PLANTILLA.format(raiz=RAIZ, rutas=rutas, backend=backend, repeticiones=repeticiones, carpeta_onnx=carpeta_onnx)
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True)
+    if salida.returncode != 0:
+        return {"error": salida.stderr.strip().splitlines()[-1] if salida.stderr.strip() else "falló sin mensaje"}
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['int8', 'fp32', 'onnx'], help="Motores a comparar; el primero es la referencia.")
+    parser.add_argument('--carpeta', default=os.path.join(RAIZ, 'project', 'uploads'), help="Carpeta con imágenes de boletas.")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Pasadas sobre todas las imágenes por motor.")
+    parser.add_argument('--carpeta-onnx', default=os.path.join(RAIZ, 'instance', 'ocr_onnx'), help="Dónde exportar los modelos ONNX.")
+    parser.add_argument('--json', action='store_true', help="Imprime el resultado como JSON.")
+    args = parser.parse_args()
+
+    rutas = imagenes_de(args.carpeta)
+    if not rutas:
+        sys.exit(f"No hay imágenes en {args.carpeta}")
+    medidas = {backend: medir_backend(backend, rutas, args.repeticiones, args.carpeta_onnx) for backend in args.backends}
+
+    referencia = medidas[args.backends[0]].get("resultados")
+    paridad_ok = True
+    for backend, m in medidas.items():
+        if "error" in m or referencia is None:
+            continue
+        distintas = [os.path.basename(r) for r in rutas if m["resultados"][r] != referencia[r]]
+        m["paridad"] = "ok" if not distintas else distintas
+        paridad_ok = paridad_ok and not distintas
+
+    if args.json:
+        print(json.dumps(medidas, indent=2, ensure_ascii=False))
+    else:
+        print(f"{len(rutas)} imágenes x {args.repeticiones} pasadas; referencia: {args.backends[0]}")
+        print(f"{'Motor':<6} {'Carga (s)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'img/s':>7} {'RSS (MB)':>9}  Paridad")
+        for backend, m in medidas.items():
+            if "error" in m:
+                print(f"{backend:<6} no disponible: {m['error']}")
+                continue
+            paridad = m.get("paridad", "-")
+            paridad = paridad if isinstance(paridad, str) else "difiere en " + ", ".join(paridad)
+            print(f"{backend:<6} {m['carga_s']:>10.2f} {m['p50_ms']:>10.1f} {m['p95_ms']:>10.1f} {m['imagenes_por_s']:>7.2f} {m['rss_mb']:>9.1f}  {paridad}")
+    sys.exit(0 if paridad_ok else 1)
+
+if __name__ == '__main__':
+    main()
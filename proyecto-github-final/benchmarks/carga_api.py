@@ -0,0 +1,389 @@
+# benchmarks/carga_api.py
+"""Mide la latencia y el rendimiento de la API sobre una base de datos sembrada.
+
+Crea con create_app una base SQLite desechable en una carpeta temporal y la llena
+con la cantidad indicada de usuarios, categorías y boletas (de 10 mil a 1 millón),
+con las imágenes de ejemplo de project/uploads asociadas a parte de ellas. Luego
+ejecuta contra los endpoints reales:
+
+* '/api/login';
+* '/api/boletas' con cada combinación de filtros (usuario y administrador, rango de
+  fechas, categoría, razón, búsqueda de texto, página profunda y cursor);
+* '/api/boletas/manual' (crea boletas sin imagen);
+* '/api/uploads/<archivo>';
+* '/api/boletas/upload' con las imágenes de ejemplo, solo con '--ocr' (carga
+  EasyOCR y desactiva la caché de OCR para medir la lectura real).
+
+Hay dos modos de ejecución, que se pueden combinar:
+
+* 'cliente': el cliente de pruebas de Flask en un proceso nuevo, petición por
+  petición. Mide el costo de la aplicación sin red ni servidor.
+* 'gunicorn': un Gunicorn local con '--workers' procesos, al que se envían
+  peticiones HTTP desde '--concurrencia' hilos. Mide el servidor completo.
+
+Por cada escenario se informa p50/p95/p99 de latencia, peticiones por segundo,
+errores y el pico de memoria residente (del proceso del cliente, o la suma de los
+workers de Gunicorn). El resultado se guarda como JSON con '--salida'; con '--base'
+se compara con un resultado anterior guardado igual.
+
+Uso (desde la carpeta que contiene run.py):
+
+    python benchmarks/carga_api.py --boletas 100000 --salida base.json
+    python benchmarks/carga_api.py --boletas 100000 --modos cliente gunicorn --base base.json
+
+Termina con código 1 si algún escenario empeora respecto de '--base' más que
+'--tolerancia' (p95 o memoria mayores, o menos peticiones por segundo).
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import tempfile
+import resource
+import subprocess
+import multiprocessing
+from datetime import date, datetime, timedelta
+from http.client import HTTPConnection
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.preprocesamiento_ocr import imagenes_de  # noqa: E402
+
+# Variable de entorno con la carpeta de la base sembrada; la lee 'crear_app_benchmark'
+# en el proceso del cliente y en cada worker de Gunicorn.
+VARIABLE_CARPETA = 'CARGA_API_CARPETA'
+CLAVE = 'clave-benchmark'
+_PALABRAS = ['supermercado', 'ferretería', 'farmacia', 'bencina', 'almuerzo', 'tornillos', 'pintura', 'remedios', 'peaje', 'estacionamiento']
+
+def _rss_mb():
+    """Pico de memoria residente del proceso actual, en MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # En macOS ru_maxrss está en bytes; en Linux, en KiB.
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def crear_app_benchmark():
+    """Crea la aplicación sobre la base sembrada de la carpeta en CARGA_API_CARPETA.
+
+    Es también la fábrica que recibe Gunicorn ('benchmarks.carga_api:crear_app_benchmark()').
+    """
+    carpeta = os.environ[VARIABLE_CARPETA]
+    os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(carpeta, 'carga.db')
+    from project import create_app
+    app = create_app('project.config.ProductionConfig')
+    app.config.update(
+        UPLOAD_FOLDER=os.path.join(carpeta, 'uploads'),
+        THUMBNAIL_FOLDER=os.path.join(carpeta, 'thumbnails'),
+        OCR_SPOOL_FOLDER=os.path.join(carpeta, 'ocr_spool'),
+        # Sin caché, '/api/boletas/upload' mide la lectura de OCR y no un acierto de caché.
+        OCR_CACHE_ACTIVO=False,
+    )
+    return app
+
+def sembrar(app, usuarios, categorias, boletas, semilla=1234):
+    """Llena la base vacía y devuelve los datos que necesitan los escenarios.
+
+    Todos los usuarios comparten la misma contraseña, cuyo hash se calcula una vez.
+    El usuario 1 es administrador, el 2 es el usuario normal de los escenarios y el 3
+    solo se usa para '/api/login', que reemplaza su API Key en cada inicio de sesión.
+    """
+    from werkzeug.security import generate_password_hash
+    from project import db, resumen, busqueda
+    from project.almacenamiento import guardar_contenido
+    from project.models import ApiKey, User, Categoria, Boleta, hash_api_key
+    rng = random.Random(semilla)
+    claves = {'admin': 'admin-' + os.urandom(16).hex(), 'usuario': 'usuario-' + os.urandom(16).hex()}
+    with app.app_context():
+        password_hash = generate_password_hash(CLAVE)
+        db.session.execute(db.insert(User), [{
+            "username": f"usuario{i}", "password_hash": password_hash, "role": 'admin' if i == 1 else 'user',
+        } for i in range(1, max(usuarios, 3) + 1)])
+        db.session.execute(db.insert(ApiKey), [{"user_id": 1, "key_hash": hash_api_key(claves['admin'])},
+                                               {"user_id": 2, "key_hash": hash_api_key(claves['usuario'])}])
+        db.session.execute(db.insert(Categoria), [{"nombre": f"Categoría {i}"} for i in range(1, categorias + 1)])
+        imagenes = []
+        for ruta in imagenes_de(os.path.join(RAIZ, 'project', 'uploads')):
+            with open(ruta, 'rb') as archivo:
+                imagenes.append(guardar_contenido(archivo, ruta))
+        inicio = date(2020, 1, 1)
+        razones = [None, None, None, 'Corrección Manual', 'Lectura OCR']
+        for bloque in range(0, boletas, 5000):
+            db.session.execute(db.insert(Boleta), [{
+                "fecha": inicio + timedelta(days=rng.randrange(6 * 365)), "monto_total": rng.randint(100, 500000),
+                "notas": ' '.join(rng.sample(_PALABRAS, 2)) if rng.random() < 0.5 else None,
+                "razon_modificacion": rng.choice(razones), "imagen_url": rng.choice(imagenes) if imagenes and rng.random() < 0.3 else None,
+                # El usuario 2 tiene una boleta de cada 20, para que su listado no sea trivial.
+                "is_deleted": rng.random() < 0.05, "user_id": 2 if rng.random() < 0.05 else rng.randint(1, max(usuarios, 3)),
+                "categoria_id": rng.randint(1, categorias),
+            } for _ in range(bloque, min(bloque + 5000, boletas))])
+        db.session.commit()
+        resumen.reconstruir()
+        busqueda.reconstruir()
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+    return {"claves": claves, "imagenes": imagenes, "boletas": boletas}
+
+def _multipart(campo, nombre, datos):
+    """Arma el cuerpo multipart/form-data de un formulario con un solo archivo."""
+    limite = os.urandom(16).hex()
+    cuerpo = (f'--{limite}\r\nContent-Disposition: form-data; name="{campo}"; filename="{os.path.basename(nombre)}"\r\n'
+              f'Content-Type: application/octet-stream\r\n\r\n').encode() + datos + f'\r\n--{limite}--\r\n'.encode()
+    return cuerpo, f'multipart/form-data; boundary={limite}'
+
+def escenarios(datos, ocr=False):
+    """Devuelve los escenarios a medir: nombre -> lista de peticiones que se recorren en ciclo.
+
+    Cada petición es un diccionario con 'metodo', 'ruta', 'cabeceras', 'cuerpo' (bytes)
+    y el código de estado 'esperado'; todo serializable para pasarlo a otro proceso.
+    """
+    admin = {'X-Api-Key': datos['claves']['admin']}
+    usuario = {'X-Api-Key': datos['claves']['usuario']}
+    rango = {"fecha_inicio": "2023-03-01", "fecha_fin": "2023-03-31"}
+
+    def get(ruta, cabeceras, **params):
+        return {"metodo": 'GET', "ruta": ruta + ('?' + urlencode(params) if params else ''), "cabeceras": cabeceras, "cuerpo": b'', "esperado": 200}
+
+    def formulario(ruta, cabeceras, campos, esperado):
+        return {"metodo": 'POST', "ruta": ruta, "cabeceras": {**cabeceras, 'Content-Type': 'application/x-www-form-urlencoded'},
+                "cuerpo": urlencode(campos).encode(), "esperado": esperado}
+
+    ultima_pagina = max(1, datos['boletas'] // 20 // 10)
+    resultado = {
+        "login": [{"metodo": 'POST', "ruta": '/api/login', "cabeceras": {'Content-Type': 'application/json'},
+                   "cuerpo": json.dumps({"username": 'usuario3', "password": CLAVE}).encode(), "esperado": 200}],
+        "boletas: usuario": [get('/api/boletas', usuario)],
+        "boletas: usuario, rango de fechas": [get('/api/boletas', usuario, **rango)],
+        "boletas: admin": [get('/api/boletas', admin)],
+        "boletas: admin, rango de fechas": [get('/api/boletas', admin, **rango)],
+        "boletas: admin, categoría": [get('/api/boletas', admin, categoria='Categoría 1')],
+        "boletas: admin, razón": [get('/api/boletas', admin, razon='Lectura OCR')],
+        "boletas: admin, rango y categoría": [get('/api/boletas', admin, categoria='Categoría 1', **rango)],
+        "boletas: admin, búsqueda": [get('/api/boletas', admin, q=p) for p in _PALABRAS],
+        "boletas: admin, página profunda": [get('/api/boletas', admin, page=ultima_pagina)],
+        "boletas: admin, cursor": [get('/api/boletas', admin, cursor='')],
+        "boletas/manual": [formulario('/api/boletas/manual', usuario, {"fecha": '2024-05-10', "monto_total": '12990', "categoria_id": '1', "notas": 'benchmark'}, 201)],
+    }
+    if datos['imagenes']:
+        resultado["uploads"] = [get('/api/uploads/' + nombre, admin) for nombre in datos['imagenes']]
+    if ocr and datos['imagenes']:
+        subidas = []
+        for ruta in imagenes_de(os.path.join(RAIZ, 'project', 'uploads')):
+            with open(ruta, 'rb') as archivo:
+                cuerpo, tipo = _multipart('boleta_image', ruta, archivo.read())
+            subidas.append({"metodo": 'POST', "ruta": '/api/boletas/upload', "cabeceras": {**admin, 'Content-Type': tipo}, "cuerpo": cuerpo, "esperado": 200})
+        resultado["boletas/upload (OCR)"] = subidas
+    return resultado
+
+def percentil(ordenadas, p):
+    """Percentil 'p' (0 a 100) de una lista ya ordenada, por el método del rango más cercano."""
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))]
+
+def resumir(latencias, errores, segundos, rss_mb):
+    """Arma las medidas de un escenario a partir de sus latencias en segundos."""
+    latencias = sorted(latencias)
+    return {
+        "peticiones": len(latencias), "errores": errores,
+        "p50_ms": percentil(latencias, 50) * 1000, "p95_ms": percentil(latencias, 95) * 1000, "p99_ms": percentil(latencias, 99) * 1000,
+        "rps": len(latencias) / segundos, "rss_mb": rss_mb,
+    }
+
+def ejecutar_cliente(carpeta, lista, peticiones, calentamiento):
+    """Mide los escenarios con el cliente de pruebas de Flask. Se ejecuta en un proceso nuevo."""
+    os.environ[VARIABLE_CARPETA] = carpeta
+    cliente = crear_app_benchmark().test_client()
+    medidas = {}
+    for nombre, ciclo in lista.items():
+        cantidad = max(1, peticiones // 10) if nombre.startswith("boletas/upload") else peticiones
+        latencias, errores = [], 0
+        for i in range(calentamiento + cantidad):
+            p = ciclo[i % len(ciclo)]
+            inicio = time.perf_counter()
+            respuesta = cliente.open(p['ruta'], method=p['metodo'], headers=p['cabeceras'], data=p['cuerpo'])
+            respuesta.get_data()
+            duracion = time.perf_counter() - inicio
+            if i >= calentamiento:
+                latencias.append(duracion)
+                errores += respuesta.status_code != p['esperado']
+        medidas[nombre] = resumir(latencias, errores, sum(latencias), _rss_mb())
+    return medidas
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _pico_rss_proceso_mb(pid):
+    """Pico de memoria residente (VmHWM) de un proceso, en MB; None fuera de Linux."""
+    try:
+        with open(f'/proc/{pid}/status') as archivo:
+            for linea in archivo:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+def _hijos(pid):
+    """Procesos hijos directos de 'pid' (los workers de Gunicorn), leídos de /proc."""
+    hijos = []
+    for entrada in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if entrada.isdigit():
+            try:
+                with open(f'/proc/{entrada}/stat') as archivo:
+                    if int(archivo.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        hijos.append(int(entrada))
+            except (OSError, IndexError, ValueError):
+                continue
+    return hijos
+
+def _rss_gunicorn_mb(proceso):
+    """Suma del pico de memoria de los workers de Gunicorn, en MB."""
+    picos = [_pico_rss_proceso_mb(pid) for pid in _hijos(proceso.pid)]
+    picos = [p for p in picos if p is not None]
+    return sum(picos) if picos else None
+
+def _peticion_http(conexion, p):
+    conexion.request(p['metodo'], p['ruta'], body=p['cuerpo'] or None, headers=p['cabeceras'])
+    respuesta = conexion.getresponse()
+    respuesta.read()
+    return respuesta.status
+
+def ejecutar_gunicorn(carpeta, lista, peticiones, calentamiento, workers, concurrencia, espera=60):
+    """Mide los escenarios contra un Gunicorn local con varios workers."""
+    puerto = _puerto_libre()
+    entorno = {**os.environ, VARIABLE_CARPETA: carpeta}
+    proceso = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{puerto}',
+                                '--chdir', RAIZ, '--log-level', 'warning', 'benchmarks.carga_api:crear_app_benchmark()'], env=entorno)
+    try:
+        limite = time.monotonic() + espera
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+                break
+            except OSError:
+                if proceso.poll() is not None or time.monotonic() > limite:
+                    raise RuntimeError("Gunicorn no arrancó; revise que esté instalado ('pip install gunicorn').")
+                time.sleep(0.2)
+
+        def hilo(ciclo, inicio, cantidad):
+            conexion = HTTPConnection('127.0.0.1', puerto, timeout=300)
+            latencias, errores = [], 0
+            try:
+                for i in range(inicio, inicio + cantidad):
+                    p = ciclo[i % len(ciclo)]
+                    t = time.perf_counter()
+                    estado = _peticion_http(conexion, p)
+                    latencias.append(time.perf_counter() - t)
+                    errores += estado != p['esperado']
+            finally:
+                conexion.close()
+            return latencias, errores
+
+        medidas = {}
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            for nombre, ciclo in lista.items():
+                cantidad = max(1, peticiones // 10) if nombre.startswith("boletas/upload") else peticiones
+                # Calentamiento: cada worker carga sus cachés antes de medir.
+                list(pool.map(lambda i: hilo(ciclo, i, calentamiento), range(concurrencia)))
+                partes = [cantidad // concurrencia + (1 if i < cantidad % concurrencia else 0) for i in range(concurrencia)]
+                inicio = time.perf_counter()
+                resultados = list(pool.map(lambda i: hilo(ciclo, sum(partes[:i]), partes[i]), range(concurrencia)))
+                segundos = time.perf_counter() - inicio
+                latencias = [l for parte, _ in resultados for l in parte]
+                medidas[nombre] = resumir(latencias, sum(e for _, e in resultados), segundos, _rss_gunicorn_mb(proceso))
+        return medidas
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+def comparar(actual, base, tolerancia):
+    """Compara un resultado con otro guardado y devuelve la lista de regresiones (textos)."""
+    regresiones = []
+    for modo, escenarios_modo in actual['resultados'].items():
+        for nombre, m in escenarios_modo.items():
+            b = base.get('resultados', {}).get(modo, {}).get(nombre)
+            if not b:
+                continue
+            if m['p95_ms'] > b['p95_ms'] * (1 + tolerancia):
+                regresiones.append(f"{modo} / {nombre}: p95 {b['p95_ms']:.1f} -> {m['p95_ms']:.1f} ms")
+            if m['rps'] < b['rps'] * (1 - tolerancia):
+                regresiones.append(f"{modo} / {nombre}: {b['rps']:.1f} -> {m['rps']:.1f} peticiones/s")
+            if m['rss_mb'] and b.get('rss_mb') and m['rss_mb'] > b['rss_mb'] * (1 + tolerancia):
+                regresiones.append(f"{modo} / {nombre}: memoria {b['rss_mb']:.0f} -> {m['rss_mb']:.0f} MB")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=100, help="Usuarios sintéticos (mínimo 3).")
+    parser.add_argument('--categorias', type=int, default=20, help="Categorías sintéticas.")
+    parser.add_argument('--boletas', type=int, default=10000, help="Boletas sintéticas (de 10 mil a 1 millón).")
+    parser.add_argument('--modos', nargs='+', choices=['cliente', 'gunicorn'], default=['cliente'], help="Formas de ejecutar las peticiones.")
+    parser.add_argument('--peticiones', type=int, default=200, help="Peticiones medidas por escenario (un décimo para el OCR).")
+    parser.add_argument('--calentamiento', type=int, default=5, help="Peticiones previas sin medir, por escenario (y por hilo en Gunicorn).")
+    parser.add_argument('--workers', type=int, default=4, help="Workers de Gunicorn.")
+    parser.add_argument('--concurrencia', type=int, default=8, help="Hilos que envían peticiones a Gunicorn a la vez.")
+    parser.add_argument('--ocr', action='store_true', help="Incluye '/api/boletas/upload' con las imágenes de ejemplo (carga EasyOCR).")
+    parser.add_argument('--carpeta', default=None, help="Carpeta de trabajo vacía (por defecto, una temporal nueva).")
+    parser.add_argument('--salida', default=None, help="Archivo donde guardar el resultado JSON (por defecto se imprime).")
+    parser.add_argument('--base', default=None, help="Resultado JSON anterior con el que comparar.")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Empeoramiento relativo aceptado respecto de '--base'.")
+    args = parser.parse_args()
+
+    carpeta = args.carpeta or tempfile.mkdtemp(prefix='carga-api-')
+    os.makedirs(carpeta, exist_ok=True)
+    if os.path.exists(os.path.join(carpeta, 'carga.db')):
+        sys.exit(f"La carpeta {carpeta} ya tiene una base sembrada; indique una carpeta vacía.")
+    os.environ[VARIABLE_CARPETA] = carpeta
+    inicio = time.perf_counter()
+    datos = sembrar(crear_app_benchmark(), args.usuarios, args.categorias, args.boletas)
+    print(f"Base sembrada en {carpeta} ({args.boletas} boletas) en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+    lista = escenarios(datos, args.ocr)
+
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec='seconds'), "python": platform.python_version(), "plataforma": platform.platform(),
+        "parametros": {k: v for k, v in vars(args).items() if k not in ('carpeta', 'salida', 'base')},
+        "resultados": {},
+    }
+    if 'cliente' in args.modos:
+        # Un proceso nuevo, para que la memoria de la siembra no cuente en el pico.
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            resultado['resultados']['cliente'] = pool.apply(ejecutar_cliente, (carpeta, lista, args.peticiones, args.calentamiento))
+    if 'gunicorn' in args.modos:
+        try:
+            resultado['resultados']['gunicorn'] = ejecutar_gunicorn(carpeta, lista, args.peticiones, args.calentamiento, args.workers, args.concurrencia)
+        except RuntimeError as e:
+            sys.exit(str(e))
+
+    for modo, medidas in resultado['resultados'].items():
+        print(f"\n[{modo}]", file=sys.stderr)
+        print(f"{'Escenario':<36} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'pet/s':>8} {'errores':>8} {'RSS (MB)':>9}", file=sys.stderr)
+        for nombre, m in medidas.items():
+            rss = f"{m['rss_mb']:>9.1f}" if m['rss_mb'] else f"{'-':>9}"
+            print(f"{nombre:<36} {m['p50_ms']:>9.1f} {m['p95_ms']:>9.1f} {m['p99_ms']:>9.1f} {m['rps']:>8.1f} {m['errores']:>8} {rss}", file=sys.stderr)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    regresiones = []
+    if args.base:
+        with open(args.base, encoding='utf-8') as archivo:
+            regresiones = comparar(resultado, json.load(archivo), args.tolerancia)
+        print(f"\nComparación con {args.base} (tolerancia {args.tolerancia:.0%}):", file=sys.stderr)
+        for regresion in regresiones:
+            print(f"  REGRESIÓN {regresion}", file=sys.stderr)
+        if not regresiones:
+            print("  sin regresiones", file=sys.stderr)
+    errores = sum(m['errores'] for medidas in resultado['resultados'].values() for m in medidas.values())
+    sys.exit(1 if regresiones or errores else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# benchmarks/concurrencia_sqlite.py
+"""Prueba de estrés: escritores y lectores concurrentes sobre la misma base SQLite.
+
+Crea una base SQLite temporal con create_app y lanza '--escritores' procesos que, a
+la vez, crean boletas ('POST /api/boletas/manual') y las modifican ('PUT
+/api/boletas/<id>', que lee la boleta y luego la escribe), más '--lectores' procesos
+que listan boletas y piden el reporte mientras tanto. Todos usan el cliente de
+pruebas de Flask sobre su propia aplicación, como los workers de Gunicorn.
+
+Al terminar verifica que:
+
+* ninguna petición falló (en particular, con "database is locked");
+* se crearon todas las boletas y el resumen mensual coincide con ellas.
+
+Informa además la latencia máxima y p95 de los lectores, que con WAL no deberían
+esperar a los escritores. Con '--sin-ajustes' se desactivan WAL y 'BEGIN IMMEDIATE'
+(ver project/motor_bd.py) para comparar con el comportamiento anterior.
+
+Uso (desde la carpeta que contiene run.py):
+
+    python benchmarks/concurrencia_sqlite.py --escritores 8 --transacciones 50
+
+Termina con código 1 si alguna petición falló o los datos no cuadran.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+# Configuración de '--sin-ajustes': journal DELETE y 'BEGIN' diferido.
+SIN_AJUSTES = {"SQLITE_WAL": False, "SQLITE_SERIALIZAR_ESCRITURAS": False}
+
+def _crear_app(uri, ajustes):
+    """Crea una aplicación de pruebas sobre la base indicada (en el proceso actual).
+
+    La configuración es una subclase de ProductionConfig con la base y los 'ajustes'
+    indicados, así que no depende de las variables de entorno ya leídas al importarla.
+    """
+    from project import create_app
+    from project.config import ProductionConfig
+    app = create_app(type('ConfigEstres', (ProductionConfig,), {"SQLALCHEMY_DATABASE_URI": uri, **ajustes}))
+    # Las excepciones llegan al cliente de pruebas en vez de convertirse en un 500.
+    app.testing = True
+    return app
+
+def _clasificar(error):
+    return 'bloqueo' if 'database is locked' in str(error) else type(error).__name__
+
+def _escritor(uri, ajustes, clave, transacciones, barrera, resultados):
+    """Crea boletas y modifica cada una recién creada; informa sus errores."""
+    cliente = _crear_app(uri, ajustes).test_client()
+    cabeceras = {'X-Api-Key': clave}
+    errores, creadas = {}, 0
+    barrera.wait()
+    inicio = time.perf_counter()
+    for i in range(transacciones):
+        try:
+            r = cliente.post('/api/boletas/manual', headers=cabeceras, data={"fecha": f"2024-{i % 12 + 1:02d}-10", "monto_total": "1000", "categoria_id": "1"})
+            if r.status_code != 201:
+                errores[f"HTTP {r.status_code}"] = errores.get(f"HTTP {r.status_code}", 0) + 1
+                continue
+            creadas += 1
+            r = cliente.put(f"/api/boletas/{r.json['id']}", headers=cabeceras, json={"monto_total": 1500, "categoria_id": 1 + i % 2})
+            if r.status_code != 200:
+                errores[f"HTTP {r.status_code}"] = errores.get(f"HTTP {r.status_code}", 0) + 1
+        except Exception as e:
+            errores[_clasificar(e)] = errores.get(_clasificar(e), 0) + 1
+    resultados.put(('escritor', creadas, errores, [time.perf_counter() - inicio]))
+
+def _lector(uri, ajustes, clave, barrera, fin, resultados):
+    """Lista boletas y pide el reporte hasta que terminan los escritores."""
+    cliente = _crear_app(uri, ajustes).test_client()
+    cabeceras = {'X-Api-Key': clave}
+    errores, latencias = {}, []
+    barrera.wait()
+    while not fin.is_set():
+        for ruta in ('/api/boletas', '/api/reports/summary?exacto=1'):
+            inicio = time.perf_counter()
+            try:
+                r = cliente.get(ruta, headers=cabeceras)
+                if r.status_code != 200:
+                    errores[f"HTTP {r.status_code}"] = errores.get(f"HTTP {r.status_code}", 0) + 1
+            except Exception as e:
+                errores[_clasificar(e)] = errores.get(_clasificar(e), 0) + 1
+            latencias.append(time.perf_counter() - inicio)
+    resultados.put(('lector', 0, errores, latencias))
+
+def ejecutar(carpeta, n_escritores, n_lectores, transacciones, ajustes=None):
+    """Ejecuta la prueba sobre una base nueva dentro de 'carpeta' y devuelve sus resultados.
+
+    Returns:
+        dict: 'creadas', 'esperadas' y 'en_base' (boletas), 'diferencias' del resumen
+            mensual, 'errores' por tipo, 'latencias' de los lectores (ordenadas) y
+            'duracion' en segundos.
+    """
+    uri = 'sqlite:///' + os.path.join(carpeta, 'estres.db')
+    ajustes = ajustes or {}
+    app = _crear_app(uri, ajustes)
+    cliente = app.test_client()
+    cliente.post('/api/register', json={"username": 'admin', "password": 'x'})
+    clave = cliente.post('/api/login', json={"username": 'admin', "password": 'x'}).json['api_key']
+    cliente.post('/api/categorias', headers={'X-Api-Key': clave}, json={"nombre": 'Categoría 1'})
+    cliente.post('/api/categorias', headers={'X-Api-Key': clave}, json={"nombre": 'Categoría 2'})
+
+    ctx = multiprocessing.get_context('spawn')
+    barrera, fin, resultados = ctx.Barrier(n_escritores + n_lectores), ctx.Event(), ctx.Queue()
+    escritores = [ctx.Process(target=_escritor, args=(uri, ajustes, clave, transacciones, barrera, resultados)) for _ in range(n_escritores)]
+    lectores = [ctx.Process(target=_lector, args=(uri, ajustes, clave, barrera, fin, resultados)) for _ in range(n_lectores)]
+    for proceso in escritores + lectores:
+        proceso.start()
+    recibidos = [resultados.get() for _ in escritores]
+    fin.set()
+    recibidos += [resultados.get() for _ in lectores]
+    for proceso in escritores + lectores:
+        proceso.join()
+
+    errores = {}
+    for _, _, errores_proceso, _ in recibidos:
+        for tipo, cantidad in errores_proceso.items():
+            errores[tipo] = errores.get(tipo, 0) + cantidad
+    creadas = sum(c for tipo, c, _, _ in recibidos if tipo == 'escritor')
+    latencias = sorted(l for tipo, _, _, ls in recibidos if tipo == 'lector' for l in ls)
+    # Los escritores informan cuánto tardaron desde la barrera; la prueba dura lo que el más lento.
+    duracion = max(ls[0] for tipo, _, _, ls in recibidos if tipo == 'escritor')
+
+    from project import db, resumen
+    from project.models import Boleta
+    with app.app_context():
+        en_base = db.session.execute(db.select(db.func.count()).select_from(Boleta)).scalar_one()
+        diferencias = resumen.verificar()
+        db.engine.dispose()
+    return {"creadas": creadas, "esperadas": n_escritores * transacciones, "en_base": en_base, "diferencias": diferencias,
+            "errores": errores, "latencias": latencias, "duracion": duracion}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escritores', type=int, default=8, help="Procesos que escriben a la vez.")
+    parser.add_argument('--lectores', type=int, default=2, help="Procesos que leen mientras tanto.")
+    parser.add_argument('--transacciones', type=int, default=50, help="Boletas que crea (y modifica) cada escritor.")
+    parser.add_argument('--sin-ajustes', action='store_true', help="Desactiva WAL y 'BEGIN IMMEDIATE' para comparar.")
+    args = parser.parse_args()
+
+    r = ejecutar(tempfile.mkdtemp(prefix='concurrencia-'), args.escritores, args.lectores, args.transacciones, SIN_AJUSTES if args.sin_ajustes else None)
+    creadas, esperadas, en_base, diferencias = r["creadas"], r["esperadas"], r["en_base"], r["diferencias"]
+    errores, latencias, duracion = r["errores"], r["latencias"], r["duracion"]
+    print(f"Modo: {'sin ajustes (journal DELETE, BEGIN diferido)' if args.sin_ajustes else 'WAL + BEGIN IMMEDIATE'}")
+    print(f"Escritores: {args.escritores} x {args.transacciones} boletas (crear + modificar) en {duracion:.1f} s "
+          f"({2 * creadas / duracion:.0f} transacciones/s)")
+    print(f"Boletas creadas: {creadas}/{esperadas}; en la base: {en_base}; diferencias del resumen: {len(diferencias)}")
+    if latencias:
+        print(f"Lectores: {len(latencias)} peticiones, p95 {latencias[int(len(latencias) * 0.95)] * 1000:.1f} ms, "
+              f"máxima {latencias[-1] * 1000:.1f} ms")
+    print(f"Errores: {errores or 'ninguno'}")
+    sys.exit(1 if errores or creadas != esperadas or en_base != esperadas or diferencias else 0)
+
+if __name__ == '__main__':
+    main()
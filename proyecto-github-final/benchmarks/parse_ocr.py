@@ -0,0 +1,184 @@
+# benchmarks/parse_ocr.py
+"""Compara 'parse_ocr_text' con su versión anterior, en resultados y en velocidad.
+
+La versión actual (project/ocr.py) usa expresiones precompiladas y una sola pasada
+por el texto. Este script conserva la implementación anterior para verificar, sobre
+un corpus de textos de boletas, que ambas devuelven exactamente la misma fecha y el
+mismo monto, y para medir cuánto tarda cada una.
+
+El corpus se arma con:
+
+* las lecturas de OCR guardadas en la tabla 'ocr_lecturas' de la base de datos
+  configurada (si existe y tiene filas);
+* textos sintéticos generados con semilla fija, que mezclan los cuatro formatos de
+  fecha, montos con y sin separador de miles, RUTs, folios y ruido;
+* fragmentos aleatorios (dígitos, separadores, meses, espacios, caracteres Unicode
+  que IGNORECASE iguala a letras ASCII) para los casos borde; solo se usan para
+  comparar resultados, no en la medición de tiempo.
+
+Uso (desde la carpeta que contiene run.py):
+
+    python benchmarks/parse_ocr.py --sinteticos 5000 --repeticiones 5
+
+Termina con código 1 si alguna entrada del corpus da un resultado distinto.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+from project.ocr import parse_ocr_text  # noqa: E402
+
+def parse_ocr_text_anterior(text_list):
+    """Implementación de 'parse_ocr_text' anterior a la versión precompilada."""
+    full_text = "\n".join(text_list)
+    fecha = None
+    monto = 0
+    date_patterns = [
+        r'(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+del?\s+(\d{4})',
+        r'(\d{1,2})\s+(ene|feb|mar|abr|may|jun|jul|ago|sep|oct|nov|dic)\s+(\d{4})',
+        r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})',
+        r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})'
+    ]
+    month_map_full = {'enero':'01','febrero':'02','marzo':'03','abril':'04','mayo':'05','junio':'06','julio':'07','agosto':'08','septiembre':'09','octubre':'10','noviembre':'11','diciembre':'12'}
+    month_map_short = {'ene':'01','feb':'02','mar':'03','abr':'04','may':'05','jun':'06','jul':'07','ago':'08','sep':'09','oct':'10','nov':'11','dic':'12'}
+    for i, pattern in enumerate(date_patterns):
+        match = re.search(pattern, full_text, re.IGNORECASE)
+        if match:
+            groups = match.groups()
+            try:
+                if i == 0: day, month_text, year = groups; month = month_map_full.get(month_text.lower()); fecha = f"{year}-{month}-{day.zfill(2)}"
+                elif i == 1: day, month_text, year = groups; month = month_map_short.get(month_text.lower()); fecha = f"{year}-{month}-{day.zfill(2)}"
+                elif i == 2: year, month, day = groups; fecha = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+                elif i == 3: day, month, year = groups; fecha = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+                if fecha:
+                    break
+            except:
+                continue
+    amounts = re.findall(r'(\d{1,3}(?:[.,]\d{3})*)', full_text)
+    if amounts:
+        cleaned_amounts = []
+        for a in amounts:
+            num_str = a.replace('.', '').replace(',', '').replace(' ', '')
+            if num_str.isdigit() and len(num_str) < 8 and len(num_str) > 2:
+                cleaned_amounts.append(int(num_str))
+        if cleaned_amounts:
+            monto = max(cleaned_amounts)
+    return fecha, monto
+
+_MESES = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre']
+_PRODUCTOS = ['LECHE', 'PAN', 'Cafe 250g', 'ARROZ 1KG', 'Bebida 1.5L', 'Detergente', 'Servicio', 'Propina 10%']
+
+def _miles(n, rng):
+    sep = rng.choice(['.', ','])
+    return f"{n:,}".replace(',', sep) if rng.random() < 0.8 else str(n)
+
+def _fecha(rng):
+    d, m, a = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2015, 2026)
+    formato = rng.randrange(6)
+    if formato == 0: return f"{d} de {_MESES[m - 1].capitalize()} del {a}"
+    if formato == 1: return f"{d:02d} {_MESES[m - 1][:3].upper()} {a}"
+    if formato == 2: return f"{a}-{m:02d}-{d:02d}"
+    if formato == 3: return f"{d:02d}/{m}/{a}"
+    if formato == 4: return f"Fecha Emision: {d:02d}-{m:02d}-{a} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+    return f"{a}/{m}/{d}-{m:02d}-{a}"
+
+def corpus_sintetico(cantidad, semilla=1234):
+    """Genera listas de textos con la forma de las que devuelve EasyOCR."""
+    rng = random.Random(semilla)
+    corpus = []
+    for _ in range(cantidad):
+        textos = [rng.choice(['SUPERMERCADO', 'Farmacia Central', 'BOLETA ELECTRONICA', 'Restaurant']),
+                  f"R.U.T.: {rng.randint(1, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}-{rng.choice('0123456789K')}",
+                  f"Folio {rng.randint(1, 9999999)}"]
+        for _ in range(rng.randint(0, 3)):
+            textos.append(_fecha(rng))
+        for _ in range(rng.randint(1, 12)):
+            textos.append(f"{rng.choice(_PRODUCTOS)} {rng.randint(1, 9)} x {_miles(rng.randint(50, 99999), rng)}")
+        textos.append(f"TOTAL $ {_miles(rng.randint(100, 9999999), rng)}")
+        if rng.random() < 0.3:
+            textos.append(''.join(rng.choice('0123456789.,/- abcdeO') for _ in range(rng.randint(5, 40))))
+        rng.shuffle(textos)
+        corpus.append(textos)
+    return corpus
+
+_FRAGMENTOS = ['0', '1', '2', '9', '12', '2020', '2023', '-', '/', '.', ',', ' ', '\n', '\t', 'de', 'del', 'DE', 'enero', 'ENE',
+               'sep', 'SEPTIEMBRE', '\u017feptiembre', '\u0130', '\u0131', 'dic', 'diciembre', 'jul', 'x', 'K', '1.234', '12,345', '1234567', 'Marzo']
+
+def corpus_aleatorio(cantidad, semilla=4321):
+    """Genera listas de textos armadas al azar con fragmentos que suelen confundir al análisis."""
+    rng = random.Random(semilla)
+    return [[''.join(rng.choice(_FRAGMENTOS) for _ in range(rng.randint(1, 12))) for _ in range(rng.randint(1, 4))] for _ in range(cantidad)]
+
+def corpus_guardado():
+    """Lee los textos de las lecturas de OCR guardadas en la base SQLite configurada.
+
+    'create_app' crea tablas e índices faltantes, así que no se abre la base real:
+    se copia a una carpeta temporal y se lee la copia.
+    """
+    try:
+        from project import create_app, db
+        from project.config import DevelopmentConfig
+        from project.models import OcrLectura
+        uri = DevelopmentConfig.SQLALCHEMY_DATABASE_URI
+        if not uri.startswith('sqlite:///') or not os.path.exists(uri[len('sqlite:///'):]):
+            print(f"(no hay una base SQLite local con resultados guardados: {uri})", file=sys.stderr)
+            return []
+        with tempfile.TemporaryDirectory() as carpeta:
+            copia = os.path.join(carpeta, 'copia.db')
+            shutil.copyfile(uri[len('sqlite:///'):], copia)
+            app = create_app(type('ConfigCopia', (DevelopmentConfig,), {"SQLALCHEMY_DATABASE_URI": 'sqlite:///' + copia}))
+            with app.app_context():
+                filas = db.session.execute(db.select(OcrLectura.resultado_json)).scalars()
+                corpus = [[texto for _, texto, _ in json.loads(fila)] for fila in filas]
+                db.engine.dispose()
+            return corpus
+    except Exception as e:
+        print(f"(no se pudieron leer resultados guardados: {e})", file=sys.stderr)
+        return []
+
+def medir(funcion, corpus, repeticiones):
+    """Devuelve el mejor tiempo total, en segundos, de analizar todo el corpus."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for textos in corpus:
+            funcion(textos)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sinteticos', type=int, default=5000, help="Cantidad de boletas sintéticas.")
+    parser.add_argument('--aleatorios', type=int, default=50000, help="Cantidad de textos aleatorios para comparar casos borde.")
+    parser.add_argument('--repeticiones', type=int, default=5, help="Repeticiones de la medición (se informa la mejor).")
+    parser.add_argument('--sin-base', action='store_true', help="No incluye los resultados guardados en la base de datos.")
+    args = parser.parse_args()
+
+    guardados = [] if args.sin_base else corpus_guardado()
+    corpus = guardados + corpus_sintetico(args.sinteticos)
+    comparados = corpus + corpus_aleatorio(args.aleatorios)
+    distintos = [(textos, parse_ocr_text_anterior(textos), parse_ocr_text(textos)) for textos in comparados if parse_ocr_text_anterior(textos) != parse_ocr_text(textos)]
+    for textos, anterior, actual in distintos[:10]:
+        print(f"DIFERENCIA: anterior={anterior} actual={actual} textos={textos}")
+
+    anterior = medir(parse_ocr_text_anterior, corpus, args.repeticiones)
+    actual = medir(parse_ocr_text, corpus, args.repeticiones)
+    print(f"Corpus: {len(corpus)} boletas ({len(guardados)} guardadas, {len(corpus) - len(guardados)} sintéticas)")
+    print(f"Coincidencias: {len(comparados) - len(distintos)}/{len(comparados)} (incluye {args.aleatorios} textos aleatorios)")
+    print(f"{'Versión':<10} {'Total (ms)':>11} {'µs/boleta':>10}")
+    for nombre, segundos in (('anterior', anterior), ('actual', actual)):
+        print(f"{nombre:<10} {segundos * 1000:>11.1f} {segundos * 1e6 / len(corpus):>10.1f}")
+    print(f"Aceleración: {anterior / actual:.2f}x")
+    sys.exit(1 if distintos else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/planes_boletas.py
+"""Verifica con EXPLAIN que los filtros principales de boletas usan un índice.
+
+Crea una base de datos SQLite temporal (o usa la indicada con '--uri', por
+ejemplo una MySQL de pruebas, en cuyo caso no se cargan datos), la llena con
+boletas sintéticas, ejecuta ANALYZE y revisa el plan de las consultas que arman
+'filtrar_boletas' y las rutas de la API para las combinaciones de filtros más
+comunes:
+
+* listado de un usuario normal, con y sin rango de fechas;
+* listado de un administrador por rango de fechas, categoría o razón;
+* conteo total de páginas con rango de fechas;
+* búsqueda de las boletas que usan una imagen;
+* reporte por mes sobre las boletas.
+
+Una consulta falla si recorre la tabla 'boletas' completa sin un índice.
+
+Uso (desde la carpeta que contiene run.py):
+
+    python benchmarks/planes_boletas.py --boletas 20000 --verbose
+
+Termina con código 1 si alguna consulta no usa un índice sobre 'boletas'.
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+def _sembrar(db, cantidad, semilla=1234):
+    """Inserta usuarios, categorías y boletas sintéticas en la base vacía."""
+    from project.models import User, Categoria, Boleta
+    rng = random.Random(semilla)
+    db.session.execute(db.insert(User), [{"username": f"usuario{i}", "password_hash": "-", "role": "user"} for i in range(50)])
+    db.session.execute(db.insert(Categoria), [{"nombre": f"Categoría {i}"} for i in range(12)])
+    inicio = date(2020, 1, 1)
+    razones = [None, None, None, 'Corrección Manual', 'Lectura OCR']
+    filas = [{
+        "fecha": inicio + timedelta(days=rng.randrange(6 * 365)), "monto_total": rng.randint(100, 500000),
+        "razon_modificacion": rng.choice(razones), "imagen_url": f"{i:064x}.png" if rng.random() < 0.7 else None,
+        "is_deleted": rng.random() < 0.05, "user_id": rng.randint(1, 50), "categoria_id": rng.randint(1, 12),
+    } for i in range(cantidad)]
+    for i in range(0, len(filas), 5000):
+        db.session.execute(db.insert(Boleta), filas[i:i + 5000])
+    db.session.commit()
+
+def consultas():
+    """Devuelve las consultas a revisar: nombre -> sentencia de SQLAlchemy."""
+    from werkzeug.datastructures import MultiDict
+    from sqlalchemy import func
+    from project import db
+    from project.auth import Principal
+    from project.models import Boleta, Categoria, User
+    from project.routes import filtrar_boletas, AGRUPACIONES_RESUMEN, _metricas_monto
+    usuario = Principal(id=7, username='usuario6', role='user')
+    admin = Principal(id=1, username='usuario0', role='admin')
+    rango = {"fecha_inicio": "2023-03-01", "fecha_fin": "2023-03-31"}
+    orden = (Boleta.fecha.desc(), Boleta.id.desc())
+
+    def listado(principal, filtros):
+        return filtrar_boletas(Boleta.select_serializado(), principal, MultiDict(filtros)).order_by(*orden).limit(11)
+
+    def reporte_por_mes(principal, filtros):
+        mes = AGRUPACIONES_RESUMEN['mes']
+        query = db.select(mes, *_metricas_monto()).select_from(Boleta).join(Categoria, Boleta.categoria_id == Categoria.id).join(User, Boleta.user_id == User.id)
+        return filtrar_boletas(query, principal, MultiDict(filtros)).filter(Boleta.is_deleted == False).group_by(mes)
+
+    return {
+        "usuario: listado": listado(usuario, {}),
+        "usuario: rango de fechas": listado(usuario, rango),
+        "admin: listado": listado(admin, {}),
+        "admin: rango de fechas": listado(admin, rango),
+        "admin: categoría": listado(admin, {"categoria": "Categoría 3"}),
+        "admin: razón": listado(admin, {"razon": "Lectura OCR"}),
+        "admin: conteo por rango": db.select(func.count()).select_from(filtrar_boletas(Boleta.select_serializado(), admin, MultiDict(rango)).subquery()),
+        "imagen: boletas que la usan": db.select(Boleta.user_id).filter_by(imagen_url=f"{5:064x}.png").distinct(),
+        "usuario: reporte por mes": reporte_por_mes(usuario, rango),
+    }
+
+def plan(db, consulta):
+    """Devuelve el plan de una consulta como lista de textos y si recorre 'boletas' sin índice."""
+    conexion = db.session.connection()
+    sql = str(consulta.compile(dialect=conexion.dialect, compile_kwargs={"literal_binds": True}))
+    if conexion.dialect.name == 'sqlite':
+        detalles = [fila[-1] for fila in conexion.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+        sin_indice = any(d.startswith('SCAN boletas') and 'INDEX' not in d for d in detalles)
+        return detalles, sin_indice
+    filas = [dict(fila._mapping) for fila in conexion.exec_driver_sql("EXPLAIN " + sql)]
+    detalles = [f"{f.get('table')}: type={f.get('type')} key={f.get('key')}" for f in filas]
+    sin_indice = any(f.get('table') == 'boletas' and f.get('type') == 'ALL' for f in filas)
+    return detalles, sin_indice
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--boletas', type=int, default=20000, help="Boletas sintéticas de la base temporal.")
+    parser.add_argument('--uri', default=None, help="Base de datos ya existente a revisar (no se le cargan datos).")
+    parser.add_argument('--verbose', action='store_true', help="Imprime el plan completo de cada consulta.")
+    args = parser.parse_args()
+
+    carpeta = tempfile.mkdtemp(prefix='planes-')
+    os.environ['DATABASE_URI'] = args.uri or 'sqlite:///' + os.path.join(carpeta, 'planes.db')
+    from project import create_app, db
+    app = create_app('project.config.DevelopmentConfig')
+    fallidas = []
+    with app.app_context():
+        if not args.uri:
+            _sembrar(db, args.boletas)
+            db.session.execute(db.text("ANALYZE"))
+        for nombre, consulta in consultas().items():
+            detalles, sin_indice = plan(db, consulta)
+            print(f"{'SIN ÍNDICE' if sin_indice else 'ok':<10} {nombre}")
+            if args.verbose or sin_indice:
+                for detalle in detalles:
+                    print(f"{'':<10}   {detalle}")
+            if sin_indice:
+                fallidas.append(nombre)
+    sys.exit(1 if fallidas else 0)
+
+if __name__ == '__main__':
+    main()
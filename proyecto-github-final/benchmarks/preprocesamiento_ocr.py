@@ -0,0 +1,128 @@
+# benchmarks/preprocesamiento_ocr.py
+"""Mide el efecto de cada etapa de preprocesamiento sobre el tiempo y la precisión del OCR.
+
+Para cada imagen de la carpeta indicada (por defecto project/uploads) se ejecutan
+configuraciones acumulativas: la imagen original, luego EXIF + escalado, + grises,
++ recorte, etc. De cada una se informa:
+
+* el tiempo de cada etapa de preprocesamiento y el total;
+* los megapíxeles que recibe EasyOCR;
+* el tiempo de 'readtext';
+* la fecha y el monto que obtiene parse_ocr_text y si coinciden con los de la
+  imagen original (o con '--esperado', un JSON nombre -> [fecha, monto]).
+
+Uso (desde la carpeta que contiene run.py):
+
+    python benchmarks/preprocesamiento_ocr.py --lado-maximo 1600
+    python benchmarks/preprocesamiento_ocr.py --sin-ocr   # solo el preprocesamiento
+
+Enderezar y binarizar se omiten si OpenCV no está instalado.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+from project.preprocesamiento import preprocesar  # noqa: E402
+from project.ocr import parse_ocr_text  # noqa: E402
+
+EXTENSIONES = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tif', '.tiff')
+
+CONFIGURACIONES = [
+    ('original', []),
+    ('exif+escalar', ['exif', 'escalar']),
+    ('+grises', ['exif', 'escalar', 'grises']),
+    ('+recortar', ['exif', 'escalar', 'grises', 'recortar']),
+    ('+enderezar', ['exif', 'escalar', 'grises', 'recortar', 'enderezar']),
+    ('+binarizar', ['exif', 'escalar', 'grises', 'recortar', 'enderezar', 'binarizar']),
+]
+
+def _hay_opencv():
+    try:
+        import cv2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def imagenes_de(carpeta):
+    """Devuelve las rutas de las imágenes de una carpeta, incluidas sus subcarpetas."""
+    rutas = []
+    for base, _, archivos in os.walk(carpeta):
+        rutas.extend(os.path.join(base, a) for a in archivos if a.lower().endswith(EXTENSIONES))
+    return sorted(rutas)
+
+def medir_imagen(ruta, etapas, lado_maximo, reader):
+    """Ejecuta una configuración sobre una imagen y devuelve sus medidas."""
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    inicio = time.perf_counter()
+    arreglo, tiempos = preprocesar(datos, etapas, lado_maximo)
+    medida = {
+        "preproceso_s": time.perf_counter() - inicio,
+        "etapas_s": tiempos,
+        "megapixeles": arreglo.shape[0] * arreglo.shape[1] / 1e6,
+    }
+    if reader is not None:
+        inicio = time.perf_counter()
+        textos = reader.readtext(arreglo, detail=0, paragraph=False)
+        medida["ocr_s"] = time.perf_counter() - inicio
+        medida["resultado"] = list(parse_ocr_text(textos))
+    return medida
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--carpeta', default=os.path.join(RAIZ, 'project', 'uploads'), help="Carpeta con imágenes de boletas.")
+    parser.add_argument('--lado-maximo', type=int, default=1600, help="Lado mayor para la etapa 'escalar'.")
+    parser.add_argument('--sin-ocr', action='store_true', help="Mide solo el preprocesamiento, sin cargar EasyOCR.")
+    parser.add_argument('--esperado', help="JSON con el resultado correcto por nombre de archivo: {\"x.png\": [\"2024-01-31\", 12990]}.")
+    parser.add_argument('--json', action='store_true', help="Imprime el resultado completo como JSON.")
+    args = parser.parse_args()
+
+    rutas = imagenes_de(args.carpeta)
+    if not rutas:
+        sys.exit(f"No hay imágenes en {args.carpeta}")
+    configuraciones = CONFIGURACIONES if _hay_opencv() else [c for c in CONFIGURACIONES if not {'enderezar', 'binarizar'} & set(c[1])]
+    esperado = {}
+    if args.esperado:
+        with open(args.esperado, encoding='utf-8') as f:
+            esperado = json.load(f)
+
+    reader = None
+    if not args.sin_ocr:
+        from project.ocr import get_reader
+        reader = get_reader()
+
+    detalle = {}
+    for ruta in rutas:
+        nombre = os.path.basename(ruta)
+        detalle[nombre] = {etiqueta: medir_imagen(ruta, etapas, args.lado_maximo, reader) for etiqueta, etapas in configuraciones}
+
+    resumen = {}
+    for etiqueta, _ in configuraciones:
+        medidas = [detalle[n][etiqueta] for n in detalle]
+        fila = {
+            "preproceso_ms": round(statistics.median(m["preproceso_s"] for m in medidas) * 1000, 1),
+            "megapixeles": round(statistics.median(m["megapixeles"] for m in medidas), 2),
+        }
+        if reader is not None:
+            fila["ocr_ms"] = round(statistics.median(m["ocr_s"] for m in medidas) * 1000, 1)
+            # Sin resultados esperados, la referencia es lo que se obtiene con la imagen original.
+            aciertos = sum(1 for n in detalle if detalle[n][etiqueta]["resultado"] == esperado.get(n, detalle[n]['original']["resultado"]))
+            fila["coincidencias"] = f"{aciertos}/{len(detalle)}"
+        resumen[etiqueta] = fila
+
+    if args.json:
+        print(json.dumps({"resumen": resumen, "detalle": detalle}, indent=2, ensure_ascii=False))
+        return
+    print(f"{len(rutas)} imágenes, lado máximo {args.lado_maximo}px (medianas)")
+    print(f"{'Configuración':<14} {'Preproc. (ms)':>14} {'MPx':>6} {'OCR (ms)':>10} {'Coincide':>9}")
+    for etiqueta, fila in resumen.items():
+        print(f"{etiqueta:<14} {fila['preproceso_ms']:>14.1f} {fila['megapixeles']:>6.2f} {fila.get('ocr_ms', float('nan')):>10.1f} {fila.get('coincidencias', '-'):>9}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/startup_ocr.py
+"""Compara el tiempo de arranque y la memoria de un proceso de la aplicación.
+
+Mide, en procesos nuevos e independientes, tres escenarios:
+
+* 'app (modelo diferido)': lo que paga hoy un worker web o 'flask create-user'.
+  create_app ya no importa easyocr ni torch.
+* 'app + modelo cargado': el costo anterior, cuando el lector se creaba al importar
+  routes.py. Equivale a un worker que sí carga el modelo en su propio proceso.
+* 'app + servidor de OCR': un worker que delega el OCR por socket Unix; sólo
+  importa el cliente, el modelo vive una vez en el proceso de 'flask ocr-server'.
+
+Uso (desde la carpeta que contiene run.py):
+
+    python benchmarks/startup_ocr.py --repeticiones 3
+
+El resultado se imprime como tabla y, con '--json', como JSON.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Cada escenario se ejecuta en un intérprete limpio. Al terminar, el proceso imprime
+# su pico de memoria residente (ru_maxrss) para que el padre lo recoja.
+_PLANTILLA = """
+import resource, sys, time
+inicio = time.perf_counter()
+from project import create_app
+app = create_app('project.config.DevelopmentConfig')
+{extra}
+duracion = time.perf_counter() - inicio
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# En macOS ru_maxrss está en bytes; en Linux, en KiB.
+rss_mb = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+print(f"{{duracion}} {{rss_mb}}")
+"""
+
+ESCENARIOS = {
+    'app (modelo diferido)': "",
+    'app + modelo cargado': "from project.ocr import get_reader\nget_reader()",
+    'app + servidor de OCR': "import project.ocr_server",
+}
+
+def medir(codigo_extra, entorno):
+    """Ejecuta un escenario en un subproceso y devuelve (segundos, MB de RSS máximo)."""
+    codigo = _PLANTILLA.format(extra=codigo_extra)
+    inicio = time.perf_counter()
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True)
+    total = time.perf_counter() - inicio
+    _, rss_mb = salida.stdout.strip().splitlines()[-1].split()
+    # Se informa el tiempo total de pared del proceso, que incluye el arranque del intérprete.
+    return total, float(rss_mb)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=3, help="Ejecuciones por escenario (se informa la mediana).")
+    parser.add_argument('--json', action='store_true', help="Imprime el resultado como JSON.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        entorno = dict(os.environ, DATABASE_URI='sqlite:///' + os.path.join(tmp, 'bench.db'))
+        resultados = {}
+        for nombre, extra in ESCENARIOS.items():
+            medidas = sorted(medir(extra, entorno) for _ in range(args.repeticiones))
+            tiempo, rss = medidas[len(medidas) // 2]
+            resultados[nombre] = {"segundos": round(tiempo, 3), "rss_mb": round(rss, 1)}
+
+    if args.json:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+        return
+    print(f"{'Escenario':<26} {'Arranque (s)':>13} {'RSS máx. (MB)':>14}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<26} {r['segundos']:>13.3f} {r['rss_mb']:>14.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Convierte boletas.fecha en una columna Date y agrega índices para los filtros.
+
+La columna era un String(10) sin formato garantizado: una fecha como '2024-3-05'
+se comparaba mal en los filtros por rango. Esta migración normaliza las filas
+existentes a 'AAAA-MM-DD', cambia el tipo de la columna a DATE y crea los índices
+de los filtros por categoría, razón de modificación e imagen.
+
+Es la primera migración: las bases de datos anteriores se crearon con
+'db.create_all', así que cada paso revisa el estado actual y solo hace lo que
+falta. En una base nueva (ya creada con el esquema actual) no cambia nada.
+
+Revision ID: 7020ef38e708
+Revises:
+Create Date: 2026-10-18 08:05:00.000000
+
+"""
+import re
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7020ef38e708'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Índices que agrega esta migración: nombre -> columnas.
+INDICES = {
+    'ix_boletas_user_deleted_fecha_id': ['user_id', 'is_deleted', 'fecha', 'id'],
+    'ix_boletas_fecha_id': ['fecha', 'id'],
+    'ix_boletas_categoria_id': ['categoria_id'],
+    'ix_boletas_razon_modificacion': ['razon_modificacion'],
+    'ix_boletas_imagen_url': ['imagen_url'],
+}
+
+# Formatos aceptados al normalizar: año primero (AAAA-M-D) o día primero (D/M/AAAA),
+# con '-', '/' o '.' como separador.
+_ANIO_PRIMERO = re.compile(r'(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})')
+_DIA_PRIMERO = re.compile(r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})')
+
+
+def _normalizar(valor):
+    """Devuelve la fecha como 'AAAA-MM-DD', o None si no se puede interpretar."""
+    texto = str(valor or '').strip()
+    if m := _ANIO_PRIMERO.fullmatch(texto):
+        anio, mes, dia = m.groups()
+    elif m := _DIA_PRIMERO.fullmatch(texto):
+        dia, mes, anio = m.groups()
+    else:
+        return None
+    try:
+        return date(int(anio), int(mes), int(dia)).isoformat()
+    except ValueError:
+        return None
+
+
+def _normalizar_fechas(conexion):
+    """Reescribe las fechas de las boletas en formato 'AAAA-MM-DD'.
+
+    Raises:
+        RuntimeError: Si alguna fecha no se puede interpretar; la migración se
+                      detiene sin cambios para que se corrijan a mano.
+    """
+    boletas = sa.table('boletas', sa.column('id', sa.Integer), sa.column('fecha', sa.String))
+    cambios, invalidas = [], []
+    for boleta_id, fecha in conexion.execute(sa.select(boletas.c.id, boletas.c.fecha)):
+        normalizada = _normalizar(fecha)
+        if normalizada is None:
+            invalidas.append(f"{boleta_id}={fecha!r}")
+        elif normalizada != fecha:
+            cambios.append({'b_id': boleta_id, 'b_fecha': normalizada})
+    if invalidas:
+        raise RuntimeError(f"Hay {len(invalidas)} boletas con fechas no reconocidas (id=fecha): {', '.join(invalidas[:20])}. Corríjalas y vuelva a ejecutar 'flask db upgrade'.")
+    if cambios:
+        conexion.execute(boletas.update().where(boletas.c.id == sa.bindparam('b_id')).values(fecha=sa.bindparam('b_fecha')), cambios)
+
+
+def upgrade():
+    conexion = op.get_bind()
+    inspector = sa.inspect(conexion)
+    fecha = next(c for c in inspector.get_columns('boletas') if c['name'] == 'fecha')
+    if not isinstance(fecha['type'], sa.Date):
+        _normalizar_fechas(conexion)
+        # En SQLite la tabla se recrea. Se declara la columna como Date al reflejarla
+        # para que Alembic copie el texto tal cual: un CAST(fecha AS DATE) en SQLite
+        # la convertiría en número (afinidad NUMERIC) y dejaría solo el año.
+        with op.batch_alter_table('boletas', reflect_args=[sa.Column('fecha', sa.Date(), nullable=False)]) as batch_op:
+            batch_op.alter_column('fecha', existing_type=sa.String(length=10), type_=sa.Date(), existing_nullable=False)
+    existentes = {i['name'] for i in sa.inspect(conexion).get_indexes('boletas')}
+    for nombre, columnas in INDICES.items():
+        if nombre not in existentes:
+            op.create_index(nombre, 'boletas', columnas)
+
+
+def downgrade():
+    for nombre in ('ix_boletas_imagen_url', 'ix_boletas_razon_modificacion', 'ix_boletas_categoria_id'):
+        op.drop_index(nombre, table_name='boletas')
+    with op.batch_alter_table('boletas', reflect_args=[sa.Column('fecha', sa.String(length=10), nullable=False)]) as batch_op:
+        batch_op.alter_column('fecha', existing_type=sa.Date(), type_=sa.String(length=10), existing_nullable=False)
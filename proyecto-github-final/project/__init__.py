@@ -9,6 +9,7 @@ problemas de importación circular.
 import os
 from flask import Flask, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 
@@ -16,6 +17,20 @@ from flask_cors import CORS
 # No se asocian a una aplicación todavía para mantener la modularidad.
 db = SQLAlchemy()
 jwt = JWTManager() # Se mantiene por si se usa en el futuro, pero no está activo en el sistema de API Key.
+migrate = Migrate()
+
+# Carpeta de las migraciones de Alembic ('flask db upgrade'), junto a run.py.
+MIGRATIONS_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'migrations')
+
+def crear_indices_faltantes():
+    """Crea los índices declarados en los modelos que aún no existan en la base de datos.
+
+    'db.create_all' solo crea tablas nuevas; en una base de datos existente los
+    índices añadidos después a una tabla ya creada se crean aquí.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
 
 def create_app(config_class_name='project.config.DevelopmentConfig'):
     """Construye y configura una instancia de la aplicación Flask.
@@ -46,20 +61,55 @@ def create_app(config_class_name='project.config.DevelopmentConfig'):
     except OSError:
         pass
 
+    # Ajustes del motor según la base configurada (pool de MySQL, tiempo de espera de SQLite).
+    from . import motor_bd
+    motor_bd.configurar(app)
+
     # Vincula las extensiones (db, CORS) con la instancia de la aplicación.
     db.init_app(app)
+    # 'render_as_batch' permite que las migraciones alteren columnas también en SQLite.
+    migrate.init_app(app, db, directory=MIGRATIONS_FOLDER, render_as_batch=True)
     CORS(app, resources={r"/api/*": {"origins": "*"}})
 
     # El 'app_context' es necesario para que las extensiones sepan a qué aplicación
     # pertenecen al realizar operaciones como la creación de tablas.
     with app.app_context():
         # Se importan las rutas aquí para evitar importaciones circulares.
-        from . import routes
+        from . import routes, auth, metricas, subidas, versiones
+        # PRAGMAs de SQLite y 'BEGIN IMMEDIATE' en las peticiones que escriben.
+        motor_bd.init_app(app)
+        # Crea la caché de API Keys usada por el decorador 'api_key_required'.
+        auth.init_app(app)
+        # Crea la caché de páginas JSON de '/api/boletas' y '/api/categorias'.
+        versiones.init_app(app)
+        # Mide las peticiones a la API y sus consultas SQL para '/api/metrics'.
+        metricas.init_app(app)
+        # Las rutas de subida reciben los archivos del formulario en su carpeta de destino.
+        subidas.init_app(app)
         # Se registra el Blueprint de la API, añadiendo el prefijo '/api' a todas sus rutas.
         app.register_blueprint(routes.api_bp, url_prefix='/api')
 
         # Crea todas las tablas definidas en los modelos si no existen.
+        inspector = db.inspect(db.engine)
+        resumen_existia = inspector.has_table('resumen_mensual')
+        busqueda_existia = inspector.has_table('boletas_busqueda')
         db.create_all()
+        crear_indices_faltantes()
+
+        # 'create_all' no altera tablas existentes: una base creada cuando 'fecha' era texto
+        # necesita la migración que la convierte en Date.
+        fecha = next(c for c in db.inspect(db.engine).get_columns('boletas') if c['name'] == 'fecha')
+        if not isinstance(fecha['type'], db.Date):
+            app.logger.warning("La columna boletas.fecha aún no es de tipo fecha. Ejecute 'flask db upgrade'.")
+
+        # Si la tabla de resumen se acaba de crear sobre una base con boletas, se llena una vez.
+        if not resumen_existia:
+            from . import resumen
+            resumen.reconstruir()
+        # Lo mismo con el índice de búsqueda de texto completo.
+        if not busqueda_existia:
+            from . import busqueda
+            busqueda.reconstruir()
 
     # Define una ruta para la raíz del sitio ('/').
     @app.route('/')
@@ -0,0 +1,131 @@
+# project/almacenamiento.py
+"""Almacenamiento de imágenes direccionado por contenido.
+
+Cada imagen se guarda con el nombre de su hash SHA-256 dentro de subcarpetas
+según los primeros caracteres del hash ('ab/cd/<hash>.<ext>'). Así, subir dos
+veces la misma foto la guarda una sola vez (varias boletas pueden apuntar al
+mismo archivo) y ninguna carpeta crece sin límite.
+
+El hash se calcula mientras el archivo se copia a disco por bloques, sin tener
+la imagen completa en memoria.
+"""
+import os
+import re
+import hashlib
+import tempfile
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+TAMANO_BLOQUE = 64 * 1024
+
+# Forma de una ruta ya direccionada por contenido, relativa a UPLOAD_FOLDER.
+PATRON_RUTA = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]{1,10})?$')
+
+# Extensión con que se guarda cada tipo de imagen aceptado (ver subidas.detectar_tipo).
+# Depende solo del contenido, para que los mismos bytes siempre den la misma ruta y el
+# tipo con que se sirve el archivo no lo decida el nombre que envió el cliente.
+EXTENSIONES_POR_TIPO = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+    'image/bmp': '.bmp',
+    'image/tiff': '.tif',
+}
+
+def extension_de(filename):
+    """Devuelve la extensión normalizada (ej. '.jpg') de un nombre de archivo, o ''.
+
+    Solo se usa para los archivos antiguos (ver 'migrar_archivo'), cuyo tipo no se verificó.
+    """
+    extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,10}', extension) else ''
+
+def ruta_para_hash(sha256, extension=''):
+    """Construye la ruta relativa fragmentada para un hash: 'ab/cd/<hash><ext>'."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+def es_ruta_direccionada(ruta):
+    """Indica si un valor de 'imagen_url' ya usa el almacenamiento por contenido."""
+    return bool(PATRON_RUTA.match(ruta or ''))
+
+def hash_de_ruta(ruta):
+    """Devuelve el SHA-256 que da nombre a una ruta direccionada por contenido, o None si es antigua."""
+    return os.path.splitext(os.path.basename(ruta))[0] if es_ruta_direccionada(ruta) else None
+
+def guardar_contenido(stream, filename, carpeta=None):
+    """Guarda un flujo binario bajo su hash SHA-256 y devuelve la ruta relativa.
+
+    El contenido se escribe en un archivo temporal dentro de la misma carpeta de
+    destino mientras se calcula el hash; luego se mueve a su ruta definitiva con
+    un renombrado atómico. Si ya existía un archivo con el mismo contenido, el
+    temporal se descarta.
+
+    Args:
+        stream: Objeto con método 'read' (ej. FileStorage.stream o un miembro de un ZIP).
+        filename (str): Nombre original, usado solo para conservar la extensión.
+        carpeta (str | None): Carpeta base; por defecto UPLOAD_FOLDER.
+
+    Returns:
+        str: La ruta relativa a la carpeta base (ej. 'ab/cd/<hash>.png').
+    """
+    carpeta = carpeta or current_app.config['UPLOAD_FOLDER']
+    os.makedirs(carpeta, exist_ok=True)
+    sha = hashlib.sha256()
+    fd, ruta_temporal = tempfile.mkstemp(prefix='.subida-', dir=carpeta)
+    try:
+        with os.fdopen(fd, 'wb') as destino:
+            while True:
+                bloque = stream.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                sha.update(bloque)
+                destino.write(bloque)
+        return ubicar_por_contenido(ruta_temporal, sha.hexdigest(), extension_de(filename), carpeta)
+    except BaseException:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+        raise
+
+def ubicar_por_contenido(ruta_temporal, sha256, extension, carpeta=None):
+    """Mueve un archivo ya escrito y con hash conocido a su ruta direccionada.
+
+    El archivo temporal debe estar en la misma carpeta base (mismo sistema de
+    archivos) para que el renombrado sea atómico. Si ya existía un archivo con el
+    mismo contenido, el temporal se elimina.
+
+    Args:
+        extension (str): Extensión del archivo (ej. '.png', ver EXTENSIONES_POR_TIPO) o ''.
+
+    Returns:
+        str: La ruta relativa a la carpeta base (ej. 'ab/cd/<hash>.png').
+    """
+    carpeta = carpeta or current_app.config['UPLOAD_FOLDER']
+    relativa = ruta_para_hash(sha256, extension)
+    definitiva = os.path.join(carpeta, relativa)
+    if os.path.exists(definitiva):
+        os.remove(ruta_temporal)
+    else:
+        os.makedirs(os.path.dirname(definitiva), exist_ok=True)
+        os.replace(ruta_temporal, definitiva)
+    return relativa
+
+def migrar_archivo(nombre, carpeta=None):
+    """Mueve un archivo del esquema antiguo (plano) a su ruta direccionada por contenido.
+
+    Args:
+        nombre (str): Nombre del archivo relativo a la carpeta base.
+        carpeta (str | None): Carpeta base; por defecto UPLOAD_FOLDER.
+
+    Returns:
+        str: La nueva ruta relativa.
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe.
+    """
+    carpeta = carpeta or current_app.config['UPLOAD_FOLDER']
+    origen = os.path.join(carpeta, nombre)
+    with open(origen, 'rb') as stream:
+        nueva = guardar_contenido(stream, nombre, carpeta)
+    os.remove(origen)
+    return nueva
@@ -0,0 +1,110 @@
+# project/auth.py
+"""Autenticación por API Key con caché en memoria del proceso.
+
+Cada petición protegida necesita resolver su cabecera 'X-Api-Key' a un usuario.
+Para no consultar la tabla 'users' en cada petición, el resultado se guarda en una
+caché acotada (LRU con tiempo de vida) indexada por el hash de la clave. La caché
+guarda un 'Principal' liviano y desconectado de la sesión de SQLAlchemy, no el
+objeto User.
+
+Un usuario puede tener varias claves vigentes (tabla 'api_keys'), una por cada
+inicio de sesión, para que entrar desde un dispositivo no cierre la sesión de los
+demás.
+
+La caché es local a cada proceso. Cuando un usuario se crea, cambia o se elimina,
+o se revoca una de sus claves, sus entradas se invalidan en el proceso que hizo el
+cambio; en los demás workers caducan al cumplirse AUTH_CACHE_TTL.
+"""
+import threading
+from collections import namedtuple
+from cachetools import TTLCache
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from . import db, motor_bd
+from .models import ApiKey, User, hash_api_key, API_KEY_HASH_PREFIX
+
+# Datos mínimos del usuario autenticado que necesitan las rutas.
+Principal = namedtuple('Principal', ['id', 'username', 'role'])
+
+class CacheApiKeys:
+    """Caché de hash de API Key a Principal, segura entre hilos."""
+
+    def __init__(self, maxsize, ttl):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def obtener(self, key_hash):
+        """Devuelve el Principal asociado al hash o None si no está en caché."""
+        with self._lock:
+            return self._cache.get(key_hash)
+
+    def guardar(self, key_hash, principal):
+        """Guarda el Principal asociado al hash de una API Key."""
+        with self._lock:
+            self._cache[key_hash] = principal
+
+    def invalidar_usuario(self, user_id):
+        """Elimina todas las entradas que pertenecen a un usuario."""
+        with self._lock:
+            for key_hash in [k for k, p in self._cache.items() if p.id == user_id]:
+                del self._cache[key_hash]
+
+    def limpiar(self):
+        """Vacía la caché por completo."""
+        with self._lock:
+            self._cache.clear()
+
+def init_app(app):
+    """Crea la caché de API Keys de la aplicación según su configuración."""
+    app.extensions['api_key_cache'] = CacheApiKeys(app.config['AUTH_CACHE_SIZE'], app.config['AUTH_CACHE_TTL'])
+
+def _cache():
+    return current_app.extensions['api_key_cache']
+
+def autenticar_api_key(api_key):
+    """Resuelve una API Key a su Principal, usando la caché cuando es posible.
+
+    Args:
+        api_key (str): La clave enviada en la cabecera 'X-Api-Key'.
+
+    Returns:
+        Principal | None: El usuario autenticado o None si la clave no es válida.
+    """
+    key_hash = hash_api_key(api_key)
+    principal = _cache().obtener(key_hash)
+    if principal is not None:
+        return principal
+
+    user = db.session.execute(db.select(User).join(ApiKey).where(ApiKey.key_hash == key_hash)).scalar_one_or_none()
+    if user is None:
+        # Compatibilidad con la clave única de versiones anteriores, guardada en
+        # 'users.api_key' con hash o en texto plano: si coincide, se pasa a 'api_keys'
+        # para que la siguiente búsqueda sea la normal.
+        candidatas = [key_hash] if api_key.startswith(API_KEY_HASH_PREFIX) else [key_hash, api_key]
+        user = db.session.execute(db.select(User).where(User.api_key_hash.in_(candidatas))).scalar_one_or_none()
+        if user is not None:
+            user.api_key_hash = None
+            user.api_keys.append(ApiKey(key_hash=key_hash))
+            db.session.commit()
+    principal = None if user is None else Principal(id=user.id, username=user.username, role=user.role)
+    # La ruta todavía no leyó el cuerpo de la petición (puede ser una subida grande):
+    # no debe hacerlo con el bloqueo de escritura de esta consulta tomado.
+    motor_bd.terminar_lectura()
+    if principal is not None:
+        _cache().guardar(key_hash, principal)
+    return principal
+
+# Cualquier alta, cambio (rol, clave regenerada) o baja de un usuario invalida
+# sus entradas, sin importar desde qué ruta o comando de terminal se haga.
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidar_usuario(mapper, connection, target):
+    if has_app_context() and 'api_key_cache' in current_app.extensions:
+        _cache().invalidar_usuario(target.id)
+
+# Una clave revocada (al rotar o por superar API_KEYS_POR_USUARIO) deja de valer de inmediato.
+@event.listens_for(ApiKey, 'after_delete')
+def _invalidar_clave(mapper, connection, target):
+    if has_app_context() and 'api_key_cache' in current_app.extensions:
+        _cache().invalidar_usuario(target.user_id)
@@ -0,0 +1,162 @@
+# project/busqueda.py
+"""Búsqueda de texto completo sobre las boletas ('?q=' en '/api/boletas').
+
+El texto buscable de cada boleta (notas, nombre de la categoría y texto leído por
+OCR de su imagen) se guarda en la tabla 'boletas_busqueda'. El índice depende
+del motor de base de datos:
+
+* SQLite: una tabla virtual FTS5 de contenido externo ('boletas_busqueda_fts')
+  que se mantiene con triggers sobre 'boletas_busqueda'. El tokenizador ignora
+  mayúsculas y tildes ("ferreteria" encuentra "Ferretería").
+* MySQL: un índice FULLTEXT sobre la columna 'texto' (ver models.BoletaBusqueda).
+* Otros motores: una búsqueda con LIKE, sin índice, para no dejar de funcionar.
+
+Las rutas que crean o modifican boletas llaman a 'indexar' antes de su 'commit',
+igual que con el resumen mensual, así que el índice y las boletas se guardan en
+la misma transacción. Una boleta eliminada (soft delete) conserva su texto: sigue
+visible para los administradores y 'filtrar_boletas' la oculta a los demás.
+"""
+import re
+import json
+from sqlalchemy import event, false, literal_column, table, column
+from sqlalchemy.dialects.mysql import match as mysql_match
+from . import db
+from .almacenamiento import hash_de_ruta
+from .models import Boleta, BoletaBusqueda, Categoria, OcrLectura
+
+# Boletas que se leen e indexan juntas al reconstruir el índice completo.
+BOLETAS_POR_BLOQUE = 1000
+
+# Palabras de la consulta; el resto (comillas, operadores) se descarta para que la
+# sintaxis de FTS5 o del modo booleano de MySQL nunca llegue desde el usuario.
+_PATRON_PALABRA = re.compile(r'\w+')
+
+# Tabla virtual FTS5 y triggers que la sincronizan con 'boletas_busqueda' en SQLite.
+_FTS = table('boletas_busqueda_fts', column('rowid'), column('rank'))
+_DDL_SQLITE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS boletas_busqueda_fts USING fts5("
+    "texto, content='boletas_busqueda', content_rowid='boleta_id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS boletas_busqueda_ai AFTER INSERT ON boletas_busqueda BEGIN "
+    "INSERT INTO boletas_busqueda_fts(rowid, texto) VALUES (new.boleta_id, new.texto); END",
+    "CREATE TRIGGER IF NOT EXISTS boletas_busqueda_ad AFTER DELETE ON boletas_busqueda BEGIN "
+    "INSERT INTO boletas_busqueda_fts(boletas_busqueda_fts, rowid, texto) VALUES ('delete', old.boleta_id, old.texto); END",
+    "CREATE TRIGGER IF NOT EXISTS boletas_busqueda_au AFTER UPDATE ON boletas_busqueda BEGIN "
+    "INSERT INTO boletas_busqueda_fts(boletas_busqueda_fts, rowid, texto) VALUES ('delete', old.boleta_id, old.texto); "
+    "INSERT INTO boletas_busqueda_fts(rowid, texto) VALUES (new.boleta_id, new.texto); END",
+)
+
+@event.listens_for(BoletaBusqueda.__table__, 'after_create')
+def _crear_fts(tabla, conexion, **kwargs):
+    """Crea el índice FTS5 cuando 'db.create_all' crea la tabla de búsqueda en SQLite."""
+    if conexion.dialect.name == 'sqlite':
+        for sentencia in _DDL_SQLITE:
+            conexion.exec_driver_sql(sentencia)
+
+def _dialecto():
+    """Devuelve el nombre del motor de la base de datos de la sesión ('sqlite', 'mysql', ...)."""
+    return db.session.get_bind().dialect.name
+
+def palabras(q):
+    """Separa la consulta del usuario en palabras, en minúsculas."""
+    return _PATRON_PALABRA.findall((q or '').lower())
+
+def _textos_ocr(hashes):
+    """Devuelve el texto de las lecturas de OCR de cada imagen: sha256 -> texto.
+
+    Se lee de 'ocr_lecturas', que a diferencia de la caché nunca pierde filas.
+    """
+    textos = {}
+    hashes = list(hashes)
+    for i in range(0, len(hashes), BOLETAS_POR_BLOQUE):
+        filas = db.session.execute(db.select(OcrLectura.sha256, OcrLectura.resultado_json).where(OcrLectura.sha256.in_(hashes[i:i + BOLETAS_POR_BLOQUE])))
+        for sha256, resultado_json in filas:
+            textos[sha256] = ' '.join(texto for _, texto, _ in json.loads(resultado_json))
+    return textos
+
+def _documentos(condicion):
+    """Arma el texto buscable de las boletas que cumplen 'condicion'.
+
+    Returns:
+        list: Diccionarios {'boleta_id', 'texto'} listos para insertar.
+    """
+    filas = db.session.execute(
+        db.select(Boleta.id, Boleta.notas, Categoria.nombre, Boleta.imagen_url)
+        .join(Categoria, Boleta.categoria_id == Categoria.id).where(condicion)
+    ).all()
+    hashes = {fila.imagen_url: hash_de_ruta(fila.imagen_url) for fila in filas if fila.imagen_url}
+    textos_ocr = _textos_ocr(h for h in hashes.values() if h)
+    return [{
+        "boleta_id": fila.id,
+        "texto": '\n'.join(t for t in (fila.notas, fila.nombre, textos_ocr.get(hashes.get(fila.imagen_url))) if t),
+    } for fila in filas]
+
+def indexar(condicion):
+    """Vuelve a generar el texto buscable de las boletas que cumplen 'condicion'.
+
+    No hace 'commit': se llama dentro de la transacción que modifica las boletas.
+
+    Args:
+        condicion: Expresión de SQLAlchemy sobre Boleta (ej. Boleta.id == 5).
+
+    Returns:
+        int: La cantidad de boletas indexadas.
+    """
+    documentos = _documentos(condicion)
+    if not documentos:
+        return 0
+    ids = [d['boleta_id'] for d in documentos]
+    db.session.execute(db.delete(BoletaBusqueda).where(BoletaBusqueda.boleta_id.in_(ids)).execution_options(synchronize_session=False))
+    db.session.execute(db.insert(BoletaBusqueda), documentos)
+    return len(documentos)
+
+def indexar_boleta(boleta_id):
+    """Indexa una sola boleta (tras crearla o modificarla)."""
+    return indexar(Boleta.id == boleta_id)
+
+def reconstruir():
+    """Borra y vuelve a generar el índice de búsqueda de todas las boletas.
+
+    Returns:
+        int: La cantidad de boletas indexadas.
+    """
+    db.session.execute(db.delete(BoletaBusqueda))
+    total, ultimo = 0, 0
+    while True:
+        ids = db.session.execute(db.select(Boleta.id).where(Boleta.id > ultimo).order_by(Boleta.id).limit(BOLETAS_POR_BLOQUE)).scalars().all()
+        if not ids:
+            break
+        total += indexar(Boleta.id.between(ids[0], ids[-1]))
+        ultimo = ids[-1]
+        db.session.commit()
+    if _dialecto() == 'sqlite':
+        # Regenera el índice FTS5 desde la tabla, por si había quedado desfasado de ella.
+        db.session.execute(db.text("INSERT INTO boletas_busqueda_fts(boletas_busqueda_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    return total
+
+def filtrar(query, q):
+    """Restringe una consulta de boletas a las que contienen todas las palabras de 'q'.
+
+    Cada palabra también coincide como prefijo ("ferret" encuentra "ferretería").
+
+    Args:
+        query: Consulta que ya selecciona desde Boleta.
+        q (str): El texto buscado, tal como lo escribió el usuario.
+
+    Returns:
+        tuple: (consulta filtrada, expresión ORDER BY por relevancia, de mayor a menor).
+    """
+    terminos = palabras(q)
+    if not terminos:
+        return query.where(false()), None
+    dialecto = _dialecto()
+    if dialecto == 'sqlite':
+        expresion = ' '.join(f'"{t}"*' for t in terminos)
+        query = query.join(_FTS, _FTS.c.rowid == Boleta.id).where(literal_column('boletas_busqueda_fts').op('MATCH')(expresion))
+        # 'rank' es bm25: más negativo cuanto más relevante.
+        return query, _FTS.c.rank.asc()
+    query = query.join(BoletaBusqueda, BoletaBusqueda.boleta_id == Boleta.id)
+    if dialecto in ('mysql', 'mariadb'):
+        relevancia = mysql_match(BoletaBusqueda.texto, against=' '.join(f'+{t}*' for t in terminos)).in_boolean_mode()
+        return query.where(relevancia), relevancia.desc()
+    return query.where(*[BoletaBusqueda.texto.ilike(f'%{t}%') for t in terminos]), None
@@ -19,6 +19,147 @@ class Config:
     # Define la ruta a la carpeta donde se guardarán las imágenes subidas.
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'instance', 'uploads')
 
+    # --- Límites de las subidas (ver subidas.py) ---
+    # Bytes máximos de una petición completa; Flask responde 413 sin leer el resto.
+    # Debe alcanzar para un lote de imágenes y para los ZIP de la importación masiva.
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', str(200 * 1024 * 1024)))
+    # Bytes máximos de cada imagen subida.
+    SUBIDA_MAX_BYTES = int(os.environ.get('SUBIDA_MAX_BYTES', str(20 * 1024 * 1024)))
+    # Píxeles máximos (ancho x alto) de cada imagen, comprobados antes de decodificarla.
+    SUBIDA_MAX_PIXELES = int(os.environ.get('SUBIDA_MAX_PIXELES', str(50_000_000)))
+
+    # --- Motor de base de datos (ver motor_bd.py) ---
+    # SQLite: journal WAL, para que los lectores no esperen a los escritores. Requiere
+    # que la base esté en un disco local (no en una carpeta de red).
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', '1') == '1'
+    # 'NORMAL' es seguro con WAL (una caída del sistema solo puede perder la última transacción).
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    # Milisegundos que una conexión espera el bloqueo de escritura antes de fallar.
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '15000'))
+    # Bytes del archivo que se leen con mmap y KiB de caché de páginas, por conexión.
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_CACHE_KB = int(os.environ.get('SQLITE_CACHE_KB', '32768'))
+    # Las peticiones que escriben empiezan su transacción con 'BEGIN IMMEDIATE'.
+    SQLITE_SERIALIZAR_ESCRITURAS = os.environ.get('SQLITE_SERIALIZAR_ESCRITURAS', '1') == '1'
+    # MySQL: conexiones del pool por proceso, adicionales en picos, segundos de espera
+    # por una conexión libre y segundos tras los que se reemplaza (menor que 'wait_timeout').
+    MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', '10'))
+    MYSQL_MAX_OVERFLOW = int(os.environ.get('MYSQL_MAX_OVERFLOW', '20'))
+    MYSQL_POOL_TIMEOUT = int(os.environ.get('MYSQL_POOL_TIMEOUT', '30'))
+    MYSQL_POOL_RECYCLE = int(os.environ.get('MYSQL_POOL_RECYCLE', '280'))
+
+    # --- Importación masiva ('/api/boletas/bulk') ---
+    # Máximo de filas aceptadas por archivo; todas se validan en memoria antes de insertar.
+    BULK_MAX_FILAS = int(os.environ.get('BULK_MAX_FILAS', '100000'))
+    # Filas por cada 'executemany' y filas por transacción (commit).
+    BULK_FILAS_POR_BLOQUE = 1000
+    BULK_FILAS_POR_TRANSACCION = 10000
+    # Bytes máximos del contenido descomprimido de un ZIP (manifiesto e imágenes). Cada
+    # imagen debe cumplir además los límites de las subidas (SUBIDA_MAX_BYTES y SUBIDA_MAX_PIXELES).
+    BULK_ZIP_MAX_BYTES = int(os.environ.get('BULK_ZIP_MAX_BYTES', str(500 * 1024 * 1024)))
+
+    # --- Caché de autenticación ---
+    # Cantidad máxima de API Keys resueltas que se mantienen en memoria por proceso.
+    AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', '1024'))
+    # Segundos que una entrada sigue siendo válida. Acota cuánto tarda un cambio de rol
+    # o de clave hecho en otro worker en reflejarse en este.
+    AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', '60'))
+    # API Keys vigentes por usuario (una por inicio de sesión); al superarlo se revocan las más antiguas.
+    API_KEYS_POR_USUARIO = int(os.environ.get('API_KEYS_POR_USUARIO', '10'))
+
+    # --- Caché de respuestas de lectura ('/api/boletas', '/api/categorias', ver versiones.py) ---
+    # Guarda en memoria del proceso las páginas JSON ya generadas, hasta que cambian los datos.
+    CACHE_PAGINAS_ACTIVA = os.environ.get('CACHE_PAGINAS_ACTIVA', '1') == '1'
+    # Cantidad máxima de páginas por proceso y bytes máximos de una página para guardarla.
+    CACHE_PAGINAS_SIZE = int(os.environ.get('CACHE_PAGINAS_SIZE', '256'))
+    CACHE_PAGINAS_MAX_BYTES = int(os.environ.get('CACHE_PAGINAS_MAX_BYTES', str(256 * 1024)))
+
+    # --- Servidor de OCR compartido ---
+    # Ruta del socket Unix del proceso 'flask ocr-server'. Si se define, los workers web
+    # delegan la inferencia a ese proceso en vez de cargar su propia copia del modelo.
+    OCR_SERVER_SOCKET = os.environ.get('OCR_SERVER_SOCKET')
+    # Si el servidor de OCR no responde, se carga el modelo en el proceso actual como respaldo.
+    OCR_SERVER_FALLBACK_LOCAL = os.environ.get('OCR_SERVER_FALLBACK_LOCAL', '1') == '1'
+    # Segundos máximos de espera por la respuesta del servidor de OCR.
+    OCR_SERVER_TIMEOUT = float(os.environ.get('OCR_SERVER_TIMEOUT', '120'))
+
+    # --- Miniaturas y vistas previas de imágenes ---
+    # Carpeta donde se guardan las variantes reducidas generadas a partir de UPLOAD_FOLDER.
+    THUMBNAIL_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'instance', 'thumbnails')
+    # Lado mayor, en píxeles, de la miniatura ('thumb') y de la vista previa ('preview').
+    THUMBNAIL_SIZE = 240
+    PREVIEW_SIZE = 1280
+    # Formato de las variantes ('WEBP' o 'JPEG') y su calidad de compresión.
+    THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'WEBP')
+    THUMBNAIL_QUALITY = 80
+    # Si está activo, las variantes se generan al subir la imagen en vez de en la primera petición.
+    THUMBNAILS_AL_SUBIR = os.environ.get('THUMBNAILS_AL_SUBIR', '0') == '1'
+    # Segundos que el navegador puede reutilizar una imagen guardada por contenido sin revalidarla.
+    UPLOADS_CACHE_MAX_AGE = 365 * 24 * 3600
+
+    # --- Preprocesamiento de imágenes antes del OCR (ver preprocesamiento.py) ---
+    # Interruptor general: si está desactivado, EasyOCR recibe la imagen original.
+    OCR_PREPROCESO_ACTIVO = os.environ.get('OCR_PREPROCESO_ACTIVO', '1') == '1'
+    # Etapas individuales. Enderezar y binarizar requieren OpenCV y vienen desactivadas.
+    OCR_PRE_EXIF = True
+    OCR_PRE_ESCALAR = True
+    OCR_PRE_GRISES = True
+    OCR_PRE_RECORTAR = os.environ.get('OCR_PRE_RECORTAR', '1') == '1'
+    OCR_PRE_ENDEREZAR = os.environ.get('OCR_PRE_ENDEREZAR', '0') == '1'
+    OCR_PRE_BINARIZAR = os.environ.get('OCR_PRE_BINARIZAR', '0') == '1'
+    # Lado mayor, en píxeles, al que se reduce la imagen antes de la detección de texto.
+    OCR_LADO_MAXIMO = int(os.environ.get('OCR_LADO_MAXIMO', '1600'))
+
+    # --- Motor y modo de lectura de OCR ---
+    # Motor de inferencia: 'int8' (cuantizado, lo predeterminado de EasyOCR en CPU),
+    # 'fp32' o 'onnx' (requiere onnxruntime). Ver ocr_backends.py.
+    OCR_BACKEND = os.environ.get('OCR_BACKEND', 'int8')
+    # Carpeta donde se guardan los modelos exportados a ONNX la primera vez que se usan.
+    OCR_ONNX_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'instance', 'ocr_onnx')
+    # Modo de lectura: 'completo' reconoce todas las cajas de texto; 'anclado' reconoce
+    # solo las líneas de "TOTAL" y "FECHA" y recurre a la lectura completa si no bastan
+    # (ver ocr_anclado.py).
+    OCR_MODO = os.environ.get('OCR_MODO', 'completo')
+
+    # --- Lectura por lotes ('/api/boletas/upload/batch') ---
+    # Máximo de imágenes aceptadas por petición.
+    OCR_LOTE_MAX_ARCHIVOS = int(os.environ.get('OCR_LOTE_MAX_ARCHIVOS', '100'))
+    # Hilos que preprocesan las imágenes siguientes mientras EasyOCR lee la actual.
+    OCR_LOTE_HILOS = int(os.environ.get('OCR_LOTE_HILOS', '4'))
+    # Recortes de texto que el reconocedor procesa por pasada ('batch_size' de readtext)
+    # y procesos auxiliares que los preparan ('workers').
+    OCR_LOTE_BATCH_SIZE = int(os.environ.get('OCR_LOTE_BATCH_SIZE', '16'))
+    OCR_LOTE_WORKERS = int(os.environ.get('OCR_LOTE_WORKERS', '0'))
+
+    # --- Caché de resultados de OCR ---
+    # Reutiliza el resultado cuando se sube una imagen con exactamente los mismos bytes.
+    OCR_CACHE_ACTIVO = os.environ.get('OCR_CACHE_ACTIVO', '1') == '1'
+    # Máximo de imágenes guardadas; al superarlo se eliminan las usadas hace más tiempo.
+    OCR_CACHE_MAX_ENTRADAS = int(os.environ.get('OCR_CACHE_MAX_ENTRADAS', '5000'))
+
+    # --- Cola de OCR asíncrona ---
+    # Si está activo, '/api/boletas/upload' encola la imagen y responde con un id de trabajo
+    # en lugar de ejecutar el OCR dentro de la petición. Se puede forzar con '?async=1'.
+    OCR_ASYNC = os.environ.get('OCR_ASYNC', '0') == '1'
+    # Carpeta temporal donde esperan las imágenes encoladas hasta que un trabajador las procese.
+    OCR_SPOOL_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', 'instance', 'ocr_spool')
+    # Segundos que espera un trabajador entre consultas cuando la cola está vacía.
+    OCR_WORKER_POLL_INTERVAL = float(os.environ.get('OCR_WORKER_POLL_INTERVAL', '1.0'))
+    # Segundos tras los cuales un trabajo 'procesando' se considera abandonado y se reencola.
+    OCR_JOB_TIMEOUT = int(os.environ.get('OCR_JOB_TIMEOUT', '600'))
+    # Número máximo de intentos antes de marcar un trabajo como fallido.
+    OCR_JOB_MAX_INTENTOS = int(os.environ.get('OCR_JOB_MAX_INTENTOS', '3'))
+
+    # --- Métricas e instrumentación ('/api/metrics', ver metricas.py) ---
+    # Mide la latencia de las rutas de la API y sus consultas SQL, y expone las métricas.
+    METRICAS_ACTIVAS = os.environ.get('METRICAS_ACTIVAS', '1') == '1'
+    # Agrega la cabecera 'Server-Timing' a las respuestas de la API (visible en el navegador).
+    METRICAS_SERVER_TIMING = os.environ.get('METRICAS_SERVER_TIMING', '0') == '1'
+    # '/api/metrics' exige 'Authorization: Bearer <METRICAS_TOKEN>' (si se define) o la
+    # API Key de un administrador. Con METRICAS_PUBLICAS=1 no exige nada.
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+    METRICAS_PUBLICAS = os.environ.get('METRICAS_PUBLICAS', '0') == '1'
+
 class DevelopmentConfig(Config):
     """Configuración específica para el entorno de desarrollo local."""
     
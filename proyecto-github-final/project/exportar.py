@@ -0,0 +1,66 @@
+# project/exportar.py
+"""Exportación masiva de boletas en formato CSV o NDJSON.
+
+Las filas se leen con un cursor del lado del servidor ('stream_results' y
+'yield_per') y se escriben en bloques a medida que llegan, por lo que la memoria
+usada no depende de la cantidad de boletas exportadas. No se construyen objetos
+del ORM ni se llama a 'to_dict' por cada fila.
+
+Lo usan la ruta '/api/boletas/export' y el comando 'flask export-boletas'.
+"""
+import io
+import csv
+import json
+from datetime import date
+from . import db
+from .models import Boleta
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Cantidad de filas que se piden al cursor y que se agrupan en cada bloque escrito.
+FILAS_POR_BLOQUE = 1000
+
+def consulta_exportacion(query):
+    """Ordena la consulta y activa la lectura incremental desde el servidor."""
+    return query.order_by(Boleta.fecha, Boleta.id).execution_options(stream_results=True, yield_per=FILAS_POR_BLOQUE)
+
+def generar_exportacion(query, formato):
+    """Genera el contenido de la exportación en bloques de texto.
+
+    Args:
+        query: Consulta de 'Boleta.select_serializado' ya filtrada.
+        formato (str): 'csv' o 'ndjson'.
+
+    Yields:
+        str: Bloques de texto listos para escribir en la respuesta o en un archivo.
+    """
+    resultado = db.session.execute(consulta_exportacion(query))
+    columnas = list(resultado.keys())
+    if formato == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columnas)
+        for bloque in resultado.partitions():
+            writer.writerows(bloque)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # Si no hubo filas, aún falta enviar la cabecera.
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        # Las fechas (columna Date) se escriben como 'AAAA-MM-DD', igual que en el CSV.
+        dumps = json.JSONEncoder(ensure_ascii=False, default=date.isoformat).encode
+        for bloque in resultado.partitions():
+            yield ''.join(dumps(dict(zip(columnas, fila))) + '\n' for fila in bloque)
+
+def exportar_a_archivo(query, formato, ruta):
+    """Escribe la exportación en un archivo y devuelve la cantidad de bytes escritos."""
+    escritos = 0
+    with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+        for bloque in generar_exportacion(query, formato):
+            escritos += archivo.write(bloque)
+    return escritos
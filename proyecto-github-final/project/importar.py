@@ -0,0 +1,263 @@
+# project/importar.py
+"""Importación masiva de boletas históricas.
+
+Acepta un archivo CSV o NDJSON con una boleta por fila, o un ZIP que contiene las
+imágenes y un manifiesto ('manifest.csv' o 'manifest.ndjson') cuyas filas indican
+en la columna 'imagen' el archivo del ZIP que corresponde a cada boleta.
+
+Todas las filas se validan antes de escribir nada; las categorías se resuelven con
+una sola consulta y las boletas se insertan en bloques (un INSERT de varias filas que
+devuelve sus ids), en pocas transacciones, junto con su aporte a la tabla de resumen
+mensual y al índice de búsqueda.
+"""
+import io
+import os
+import csv
+import json
+import time
+import zipfile
+from collections import Counter
+from flask import current_app
+from sqlalchemy import or_
+from . import db, busqueda, resumen, subidas, versiones
+from .models import Boleta, Categoria, convertir_fecha
+from .subidas import ImagenRechazada
+
+FORMATOS_IMPORTACION = ('csv', 'ndjson', 'zip')
+MANIFIESTOS = {'manifest.csv': 'csv', 'manifest.ndjson': 'ndjson'}
+# Columnas opcionales de texto; en NDJSON pueden faltar o ser null, pero no otro tipo.
+COLUMNAS_TEXTO = ('notas', 'razon_modificacion', 'imagen')
+
+class ErrorImportacion(Exception):
+    """Error que impide procesar el archivo completo (formato o tamaño no válidos)."""
+
+def detectar_formato(nombre_archivo=None, mimetype=None):
+    """Deduce el formato a partir de la extensión del archivo o del tipo MIME del cuerpo."""
+    if nombre_archivo:
+        extension = os.path.splitext(nombre_archivo)[1].lower().lstrip('.')
+        if extension == 'jsonl': extension = 'ndjson'
+        if extension in FORMATOS_IMPORTACION: return extension
+    por_mimetype = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson', 'application/jsonl': 'ndjson', 'application/zip': 'zip', 'application/x-zip-compressed': 'zip'}
+    return por_mimetype.get(mimetype)
+
+def leer_filas(stream, formato):
+    """Lee las filas de un flujo binario CSV o NDJSON como diccionarios.
+
+    Raises:
+        ErrorImportacion: Si el archivo no está en UTF-8, el CSV está mal formado o
+            alguna línea NDJSON no es un objeto JSON válido.
+    """
+    texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if formato == 'csv':
+            lector = csv.DictReader(texto)
+            try: yield from lector
+            except csv.Error as e: raise ErrorImportacion(f"El CSV no es válido (línea {lector.line_num}): {e}.")
+            return
+        yield from _filas_ndjson(texto)
+    except UnicodeDecodeError:
+        raise ErrorImportacion("El archivo debe estar codificado en UTF-8.")
+
+def _filas_ndjson(texto):
+    for numero, linea in enumerate(texto, start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError:
+            raise ErrorImportacion(f"La línea {numero} no es JSON válido.")
+        if not isinstance(fila, dict):
+            raise ErrorImportacion(f"La línea {numero} no es un objeto JSON.")
+        yield fila
+
+def _resolver_categorias(filas):
+    """Obtiene con una sola consulta los ids de todas las categorías citadas en las filas.
+
+    Returns:
+        tuple: (dict nombre -> id, set de ids existentes).
+    """
+    nombres = {str(f.get('categoria')).strip() for f in filas if f.get('categoria')}
+    ids = set()
+    for f in filas:
+        try: ids.add(int(f.get('categoria_id')))
+        except (TypeError, ValueError): pass
+    if not nombres and not ids:
+        return {}, set()
+    filas_categoria = db.session.execute(db.select(Categoria.id, Categoria.nombre).filter(or_(Categoria.nombre.in_(nombres), Categoria.id.in_(ids)))).all()
+    return {c.nombre: c.id for c in filas_categoria}, {c.id for c in filas_categoria}
+
+def validar_filas(filas, user_id, imagenes_zip=None):
+    """Valida todas las filas y las convierte en valores listos para insertar.
+
+    Args:
+        filas (list): Diccionarios leídos del archivo.
+        user_id (int): Usuario al que se asignan las boletas.
+        imagenes_zip (set | None): Nombres de archivos disponibles en el ZIP, si lo hay.
+
+    Returns:
+        tuple: (lista de (número de fila, valores), lista de errores por fila).
+    """
+    por_nombre, ids_validos = _resolver_categorias(filas)
+    validas, errores = [], []
+    for numero, fila in enumerate(filas, start=1):
+        problemas = []
+        try: fecha = convertir_fecha(str(fila.get('fecha') or ''))
+        except ValueError as e: problemas.append(str(e))
+        # 'inf' o '1e400' pasan 'float' pero 'int' los rechaza con OverflowError.
+        try: monto = int(float(fila.get('monto_total')))
+        except (TypeError, ValueError, OverflowError): problemas.append("El monto total debe ser un número válido."); monto = None
+        categoria_id = None
+        if fila.get('categoria'):
+            categoria_id = por_nombre.get(str(fila['categoria']).strip())
+            if categoria_id is None: problemas.append(f"La categoría '{fila['categoria']}' no existe.")
+        elif fila.get('categoria_id') not in (None, ''):
+            try: categoria_id = int(fila['categoria_id'])
+            except (TypeError, ValueError): pass
+            if categoria_id not in ids_validos: problemas.append(f"La categoría con id '{fila['categoria_id']}' no existe."); categoria_id = None
+        else:
+            problemas.append("La categoría es obligatoria.")
+        texto_invalido = [c for c in COLUMNAS_TEXTO if fila.get(c) is not None and not isinstance(fila[c], str)]
+        problemas.extend(f"La columna '{c}' debe ser texto." for c in texto_invalido)
+        imagen = None if 'imagen' in texto_invalido else (fila.get('imagen') or '').strip() or None
+        if imagen and imagenes_zip is None: problemas.append("La columna 'imagen' solo se admite al importar un ZIP.")
+        elif imagen and imagen not in imagenes_zip: problemas.append(f"La imagen '{imagen}' no está en el ZIP.")
+
+        if problemas:
+            errores.append({"fila": numero, "errores": problemas})
+            continue
+        validas.append((numero, {
+            "fecha": fecha, "monto_total": monto, "categoria_id": categoria_id,
+            "notas": fila.get('notas') or None, "razon_modificacion": fila.get('razon_modificacion') or None,
+            "imagen_url": imagen, "user_id": user_id, "is_deleted": False,
+        }))
+    return validas, errores
+
+def _mb(n):
+    return f"{n / (1024 * 1024):.1f} MB"
+
+def _guardar_imagenes_zip(archivo_zip, valores):
+    """Extrae del ZIP las imágenes de las filas válidas al almacenamiento por contenido.
+
+    Cada imagen pasa por los mismos controles que una subida ('subidas.recibir': tipo,
+    tamaño y píxeles) mientras se copia por bloques desde el ZIP al disco, y el valor
+    'imagen_url' de la fila se reemplaza por la ruta guardada. Antes de extraer nada
+    se revisa el tamaño descomprimido que declara el ZIP; como puede ser falso, al
+    extraer se limitan además los bytes reales, por imagen y en total
+    (BULK_ZIP_MAX_BYTES). Las imágenes repetidas (dentro del ZIP o ya subidas antes)
+    se guardan una sola vez.
+
+    Raises:
+        ErrorImportacion: Si alguna imagen no es válida o el ZIP supera los límites.
+    """
+    por_imagen = current_app.config['SUBIDA_MAX_BYTES']
+    total = current_app.config['BULK_ZIP_MAX_BYTES']
+    nombres = list(dict.fromkeys(f['imagen_url'] for f in valores if f['imagen_url']))
+    declarado = 0
+    for nombre in nombres:
+        tamano = archivo_zip.getinfo(nombre).file_size
+        if tamano > por_imagen: raise ErrorImportacion(f"La imagen '{nombre}' del ZIP supera el máximo de {_mb(por_imagen)}.")
+        declarado += tamano
+    if declarado > total: raise ErrorImportacion(f"Las imágenes del ZIP ocupan más de {_mb(total)} descomprimidas.")
+
+    guardadas, extraido = {}, 0
+    for nombre in nombres:
+        with archivo_zip.open(nombre) as origen:
+            try: guardadas[nombre], tamano = subidas.guardar(origen, max(1, min(por_imagen, total - extraido)))
+            except ImagenRechazada as e: raise ErrorImportacion(f"La imagen '{nombre}' del ZIP no es válida: {e}")
+        extraido += tamano
+    for fila in valores:
+        if fila['imagen_url']:
+            fila['imagen_url'] = guardadas[fila['imagen_url']]
+
+def _insertar_bloque(filas):
+    """Inserta un bloque de boletas y devuelve sus ids, en el mismo orden.
+
+    Con 'RETURNING' en varias filas (SQLite 3.35+, PostgreSQL) es un solo
+    INSERT por bloque. MySQL no lo admite, así que ahí las filas se insertan de a una
+    para conocer el id de cada una.
+    """
+    if db.session.get_bind().dialect.insert_executemany_returning:
+        return db.session.execute(db.insert(Boleta).returning(Boleta.id, sort_by_parameter_order=True), filas).scalars().all()
+    return [db.session.execute(db.insert(Boleta), fila).inserted_primary_key[0] for fila in filas]
+
+def insertar_boletas(valores):
+    """Inserta las boletas por bloques y actualiza el resumen mensual y el índice de
+    búsqueda en la misma transacción.
+
+    Returns:
+        int: La cantidad de boletas insertadas.
+    """
+    por_bloque = current_app.config['BULK_FILAS_POR_BLOQUE']
+    por_transaccion = current_app.config['BULK_FILAS_POR_TRANSACCION']
+    for inicio_tx in range(0, len(valores), por_transaccion):
+        lote = valores[inicio_tx:inicio_tx + por_transaccion]
+        for inicio in range(0, len(lote), por_bloque):
+            # El índice de búsqueda se arma con los ids que devuelve el INSERT.
+            busqueda.indexar(Boleta.id.in_(_insertar_bloque(lote[inicio:inicio + por_bloque])))
+        grupos = Counter()
+        sumas = Counter()
+        for v in lote:
+            clave = (v['user_id'], v['categoria_id'], resumen.mes_de(v['fecha']))
+            grupos[clave] += 1
+            sumas[clave] += v['monto_total']
+        for (user_id, categoria_id, mes), cantidad in grupos.items():
+            resumen.aplicar_delta(user_id, categoria_id, mes, cantidad, sumas[(user_id, categoria_id, mes)])
+        versiones.boletas_modificadas(lote[0]['user_id'])
+        db.session.commit()
+    return len(valores)
+
+def importar(stream, formato, user_id, parcial=False):
+    """Importa un archivo completo de boletas.
+
+    Args:
+        stream: Flujo binario con el contenido (CSV, NDJSON o ZIP).
+        formato (str): 'csv', 'ndjson' o 'zip'.
+        user_id (int): Usuario al que se asignan las boletas.
+        parcial (bool): Si es True, se insertan las filas válidas aunque otras tengan errores.
+                        Si es False, cualquier error cancela la importación completa.
+
+    Returns:
+        dict: Resumen con filas recibidas, insertadas, errores por fila y filas por segundo.
+
+    Raises:
+        ErrorImportacion: Si el archivo no se puede leer o supera el límite de filas.
+    """
+    inicio = time.perf_counter()
+    max_filas = current_app.config['BULK_MAX_FILAS']
+    archivo_zip = None
+    try:
+        if formato == 'zip':
+            try: archivo_zip = zipfile.ZipFile(stream)
+            except zipfile.BadZipFile: raise ErrorImportacion("El archivo ZIP no es válido.")
+            nombres = set(archivo_zip.namelist())
+            manifiesto = next((m for m in MANIFIESTOS if m in nombres), None)
+            if not manifiesto: raise ErrorImportacion(f"El ZIP debe incluir un manifiesto: {', '.join(MANIFIESTOS)}.")
+            if archivo_zip.getinfo(manifiesto).file_size > current_app.config['BULK_ZIP_MAX_BYTES']:
+                raise ErrorImportacion(f"El manifiesto supera el máximo de {_mb(current_app.config['BULK_ZIP_MAX_BYTES'])} descomprimido.")
+            with archivo_zip.open(manifiesto) as contenido:
+                filas = list(leer_filas(contenido, MANIFIESTOS[manifiesto]))
+            imagenes_zip = nombres - {manifiesto}
+        else:
+            filas = list(leer_filas(stream, formato))
+            imagenes_zip = None
+        if len(filas) > max_filas: raise ErrorImportacion(f"El archivo supera el máximo de {max_filas} filas por importación.")
+
+        validas, errores = validar_filas(filas, user_id, imagenes_zip)
+        insertadas = 0
+        if validas and (parcial or not errores):
+            valores = [v for _, v in validas]
+            if archivo_zip is not None:
+                _guardar_imagenes_zip(archivo_zip, valores)
+            insertadas = insertar_boletas(valores)
+    finally:
+        if archivo_zip is not None:
+            archivo_zip.close()
+
+    duracion = time.perf_counter() - inicio
+    return {
+        "filas_recibidas": len(filas),
+        "filas_insertadas": insertadas,
+        "errores": errores,
+        "duracion_s": round(duracion, 3),
+        "filas_por_segundo": round(insertadas / duracion, 1) if duracion > 0 else None,
+    }
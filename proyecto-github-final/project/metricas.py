@@ -0,0 +1,248 @@
+# project/metricas.py
+"""Métricas de la aplicación en el formato de texto de Prometheus ('GET /api/metrics').
+
+Cuando una subida se vuelve lenta, estas métricas permiten saber en qué se fue el
+tiempo sin agregar dependencias:
+
+* la latencia de cada ruta de la API, por método, regla de la ruta y código de estado;
+* la cantidad de consultas SQL y el tiempo que tomaron, por petición, medidos con
+  los eventos del motor de SQLAlchemy;
+* el tiempo de cada etapa del OCR (preprocesar, detectar, reconocer, parse_ocr_text)
+  y de otras operaciones costosas de las rutas, como guardar el archivo subido o
+  verificar la contraseña al iniciar sesión ('medir');
+* el estado de la cola de OCR asíncrona y el tiempo ocupado de sus trabajadores,
+  calculados desde la tabla 'ocr_jobs' al momento de cada lectura (por eso son
+  gauges: bajan si se eliminan trabajos de la tabla).
+
+Los histogramas y contadores viven en la memoria de cada proceso: con varios
+workers de Gunicorn cada uno expone los suyos y Prometheus los suma. Las etapas de
+OCR que se ejecutan en otro proceso ('flask ocr-worker', 'flask ocr-server') no
+aparecen en los workers web, pero la cola sí, porque se lee de la base de datos.
+
+Con METRICAS_SERVER_TIMING activo, cada respuesta de la API incluye además la
+cabecera 'Server-Timing' con los tiempos de esa petición, que las herramientas de
+desarrollo del navegador muestran en la pestaña de red.
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, func, literal_column
+from . import db
+from .models import OcrJob, _ahora
+
+# Límites superiores (en segundos o en consultas) de los buckets de cada histograma.
+BUCKETS_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_ETAPA = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+def _escapar(valor):
+    """Escapa el valor de una etiqueta según el formato de texto de Prometheus."""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+# Etiqueta 'le' de cada bucket de un histograma.
+_LE = '"{}"'
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Histograma:
+    """Histograma acumulativo por combinación de etiquetas, seguro entre hilos."""
+
+    def __init__(self, nombre, ayuda, etiquetas, buckets):
+        self.nombre, self.ayuda, self.etiquetas, self.buckets = nombre, ayuda, tuple(etiquetas), tuple(buckets)
+        # Valores de las etiquetas -> [observaciones por bucket, suma, cantidad].
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        """Registra una observación para la combinación de etiquetas indicada."""
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * len(self.buckets), 0.0, 0]
+            if indice < len(self.buckets):
+                serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        """Devuelve las líneas del histograma en formato de texto de Prometheus."""
+        with self._lock:
+            series = sorted((etiquetas, list(conteos), suma, total) for etiquetas, (conteos, suma, total) in self._series.items())
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for etiquetas, conteos, suma, total in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, 'le=' + _LE.format(limite))} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, 'le=' + _LE.format('+Inf'))} {total}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {total}")
+        return lineas
+
+class Contador:
+    """Contador monótono por combinación de etiquetas, seguro entre hilos."""
+
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def sumar(self, valor, *etiquetas):
+        """Incrementa el contador de la combinación de etiquetas indicada."""
+        with self._lock:
+            self._series[etiquetas] = self._series.get(etiquetas, 0) + valor
+
+    def exponer(self):
+        """Devuelve las líneas del contador en formato de texto de Prometheus."""
+        with self._lock:
+            series = sorted(self._series.items())
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        lineas.extend(f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}" for etiquetas, valor in series)
+        return lineas
+
+PETICIONES = Histograma('boletas_peticion_segundos', "Duración de las peticiones a la API.", ('metodo', 'ruta', 'estado'), BUCKETS_PETICION)
+CONSULTAS_POR_PETICION = Histograma('boletas_peticion_consultas_sql', "Consultas SQL ejecutadas por cada petición a la API.", ('ruta',), BUCKETS_CONSULTAS)
+CONSULTAS_SQL = Contador('boletas_sql_consultas_total', "Consultas SQL ejecutadas durante peticiones a la API.", ('ruta',))
+TIEMPO_SQL = Contador('boletas_sql_segundos_total', "Segundos de consultas SQL durante peticiones a la API.", ('ruta',))
+ETAPAS = Histograma('boletas_etapa_segundos', "Duración de las etapas del OCR y de otras operaciones costosas.", ('etapa',), BUCKETS_ETAPA)
+CACHE_PAGINAS = Contador('boletas_cache_paginas_total', "Respuestas de lectura según la caché de páginas: no_modificado (304), acierto o fallo.", ('ruta', 'resultado'))
+
+def _en_peticion_medida():
+    """Indica si el código corre dentro de una petición a la API que se está midiendo."""
+    return has_request_context() and 'metricas_inicio' in g
+
+@contextmanager
+def medir(etapa):
+    """Mide la duración del bloque y la registra como una etapa.
+
+    Funciona también fuera de una petición (hilos de preprocesamiento, trabajadores de
+    OCR); dentro de una, la etapa se agrega además a su cabecera 'Server-Timing'.
+
+    Ejemplo:
+        with metricas.medir('preprocesar'):
+            imagen = preprocesar(imagen)
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        ETAPAS.observar(duracion, etapa)
+        if _en_peticion_medida():
+            g.metricas_etapas.append((etapa, duracion))
+
+def medida(etapa, funcion):
+    """Envuelve 'funcion' para que cada llamada se registre como la etapa indicada."""
+    def envoltorio(*args, **kwargs):
+        with medir(etapa):
+            return funcion(*args, **kwargs)
+    return envoltorio
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if _en_peticion_medida():
+        context.metricas_inicio = time.perf_counter()
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, 'metricas_inicio', None)
+    if inicio is not None and _en_peticion_medida():
+        g.metricas_sql_segundos += time.perf_counter() - inicio
+        g.metricas_sql_consultas += 1
+
+def _iniciar_peticion():
+    if request.blueprint != 'api':
+        return
+    g.metricas_inicio = time.perf_counter()
+    g.metricas_sql_consultas, g.metricas_sql_segundos, g.metricas_etapas = 0, 0.0, []
+
+def _cabecera_server_timing(response):
+    if 'metricas_inicio' not in g:
+        return response
+    g.metricas_estado = response.status_code
+    if response.direct_passthrough or not current_app.config['METRICAS_SERVER_TIMING']:
+        return response
+    # En una respuesta transmitida por partes el total solo cubre hasta este punto.
+    partes = [f"app;dur={(time.perf_counter() - g.metricas_inicio) * 1000:.1f}",
+              f'sql;dur={g.metricas_sql_segundos * 1000:.1f};desc="{g.metricas_sql_consultas} consultas"']
+    partes.extend(f"{etapa};dur={duracion * 1000:.1f}" for etapa, duracion in g.metricas_etapas)
+    response.headers['Server-Timing'] = ', '.join(partes)
+    return response
+
+def _terminar_peticion(error=None):
+    """Registra la petición al cerrar su contexto, también tras transmitir una respuesta por partes."""
+    if 'metricas_inicio' not in g:
+        return
+    duracion = time.perf_counter() - g.pop('metricas_inicio')
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    estado = g.get('metricas_estado', 500)
+    PETICIONES.observar(duracion, request.method, ruta, str(estado))
+    CONSULTAS_POR_PETICION.observar(g.metricas_sql_consultas, ruta)
+    CONSULTAS_SQL.sumar(g.metricas_sql_consultas, ruta)
+    TIEMPO_SQL.sumar(g.metricas_sql_segundos, ruta)
+
+def init_app(app):
+    """Activa la medición de las peticiones a la API y de sus consultas SQL.
+
+    Los hooks se registran en la aplicación y se filtran por el Blueprint 'api'.
+    Se llama dentro de un contexto de aplicación, para acceder al motor de 'db'.
+    """
+    if not app.config['METRICAS_ACTIVAS']:
+        return
+    app.before_request(_iniciar_peticion)
+    app.after_request(_cabecera_server_timing)
+    app.teardown_request(_terminar_peticion)
+    event.listen(db.engine, 'before_cursor_execute', _antes_de_consulta)
+    event.listen(db.engine, 'after_cursor_execute', _despues_de_consulta)
+
+def _segundos_ocupados():
+    """Suma los segundos entre el inicio y el fin de los trabajos de OCR terminados, o None."""
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == 'sqlite':
+        duracion = (func.julianday(OcrJob.finalizado_en) - func.julianday(OcrJob.iniciado_en)) * 86400
+    elif dialecto in ('mysql', 'mariadb'):
+        duracion = func.timestampdiff(literal_column('MICROSECOND'), OcrJob.iniciado_en, OcrJob.finalizado_en) / 1e6
+    else:
+        return None
+    return db.session.execute(
+        db.select(func.coalesce(func.sum(duracion), 0)).where(OcrJob.finalizado_en.isnot(None), OcrJob.iniciado_en.isnot(None))
+    ).scalar_one()
+
+def _metricas_cola():
+    """Calcula desde 'ocr_jobs' el estado de la cola de OCR asíncrona."""
+    por_estado = dict(db.session.execute(db.select(OcrJob.estado, func.count()).group_by(OcrJob.estado)).all())
+    lineas = ["# HELP boletas_ocr_cola_trabajos Trabajos de OCR en la tabla 'ocr_jobs', por estado.",
+              "# TYPE boletas_ocr_cola_trabajos gauge"]
+    for estado in ('pendiente', 'procesando', 'completado', 'error'):
+        lineas.append(f'boletas_ocr_cola_trabajos{{estado="{estado}"}} {por_estado.get(estado, 0)}')
+    lineas += ["# HELP boletas_ocr_trabajadores_ocupados Trabajos de OCR que se están procesando en este momento.",
+               "# TYPE boletas_ocr_trabajadores_ocupados gauge",
+               f"boletas_ocr_trabajadores_ocupados {por_estado.get('procesando', 0)}"]
+    mas_antiguo = db.session.execute(db.select(func.min(OcrJob.creado_en)).where(OcrJob.estado == 'pendiente')).scalar_one()
+    espera = (_ahora() - mas_antiguo).total_seconds() if mas_antiguo else 0
+    lineas += ["# HELP boletas_ocr_cola_espera_segundos Antigüedad del trabajo pendiente más antiguo.",
+               "# TYPE boletas_ocr_cola_espera_segundos gauge",
+               f"boletas_ocr_cola_espera_segundos {_numero(float(espera))}"]
+    ocupados = _segundos_ocupados()
+    if ocupados is not None:
+        # Es un gauge y no un contador: baja cuando se eliminan trabajos viejos de la tabla.
+        lineas += ["# HELP boletas_ocr_trabajo_segundos Segundos que los trabajadores de OCR dedicaron a los trabajos terminados que siguen en 'ocr_jobs'.",
+                   "# TYPE boletas_ocr_trabajo_segundos gauge",
+                   f"boletas_ocr_trabajo_segundos {_numero(float(ocupados))}"]
+    return lineas
+
+def exponer():
+    """Devuelve todas las métricas del proceso en el formato de texto de Prometheus."""
+    lineas = []
+    for metrica in (PETICIONES, CONSULTAS_POR_PETICION, CONSULTAS_SQL, TIEMPO_SQL, ETAPAS, CACHE_PAGINAS):
+        lineas.extend(metrica.exponer())
+    lineas.extend(_metricas_cola())
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,83 @@
+# project/miniaturas.py
+"""Generación y caché en disco de versiones reducidas de las imágenes subidas.
+
+Para cada imagen se pueden servir dos variantes además del original: 'thumb'
+(miniatura para listados) y 'preview' (vista previa de tamaño medio). Se generan
+con Pillow la primera vez que se piden y quedan guardadas en THUMBNAIL_FOLDER,
+replicando la ruta de la imagen original, por lo que las siguientes peticiones
+solo leen el archivo ya generado.
+"""
+import os
+import tempfile
+from flask import current_app
+from PIL import Image, ImageOps, features
+from werkzeug.security import safe_join
+
+def tamanos_disponibles():
+    """Devuelve las variantes configuradas: nombre -> lado mayor en píxeles."""
+    return {'thumb': current_app.config['THUMBNAIL_SIZE'], 'preview': current_app.config['PREVIEW_SIZE']}
+
+def formato_variantes():
+    """Devuelve el formato de Pillow y la extensión usados para las variantes.
+
+    Se prefiere WebP; si la instalación de Pillow no lo soporta, se usa JPEG.
+    """
+    if current_app.config['THUMBNAIL_FORMAT'].upper() == 'WEBP' and features.check('webp'):
+        return 'WEBP', '.webp'
+    return 'JPEG', '.jpg'
+
+def ruta_variante(nombre, tamano):
+    """Calcula la ruta absoluta en la caché de la variante de una imagen.
+
+    Returns:
+        str | None: La ruta, o None si el nombre intenta salir de la carpeta de caché.
+    """
+    _, extension = formato_variantes()
+    return safe_join(current_app.config['THUMBNAIL_FOLDER'], tamano, os.path.splitext(nombre)[0] + extension)
+
+def generar_variante(origen, destino, lado_maximo):
+    """Genera una versión reducida de 'origen' en 'destino' con el lado mayor indicado.
+
+    Corrige la orientación EXIF y escribe primero a un temporal que luego se
+    renombra, para que una petición simultánea nunca lea un archivo a medio escribir.
+    """
+    formato, _ = formato_variantes()
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with Image.open(origen) as imagen:
+        imagen = ImageOps.exif_transpose(imagen)
+        imagen.thumbnail((lado_maximo, lado_maximo))
+        if imagen.mode not in ('RGB', 'L'):
+            imagen = imagen.convert('RGB')
+        fd, temporal = tempfile.mkstemp(prefix='.variante-', dir=os.path.dirname(destino))
+        try:
+            with os.fdopen(fd, 'wb') as salida:
+                imagen.save(salida, format=formato, quality=current_app.config['THUMBNAIL_QUALITY'])
+            os.replace(temporal, destino)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+def obtener_variante(nombre, tamano):
+    """Devuelve la ruta de la variante pedida, generándola si aún no existe en la caché.
+
+    Args:
+        nombre (str): Ruta de la imagen relativa a UPLOAD_FOLDER (el 'imagen_url' de la boleta).
+        tamano (str): 'thumb' o 'preview'.
+
+    Returns:
+        str | None: Ruta absoluta de la variante, o None si la imagen original no existe.
+    """
+    origen = safe_join(current_app.config['UPLOAD_FOLDER'], nombre)
+    destino = ruta_variante(nombre, tamano)
+    if origen is None or destino is None or not os.path.isfile(origen):
+        return None
+    # Si el original se reemplazó después de generar la variante, se vuelve a generar.
+    if not os.path.exists(destino) or os.path.getmtime(destino) < os.path.getmtime(origen):
+        generar_variante(origen, destino, tamanos_disponibles()[tamano])
+    return destino
+
+def generar_todas(nombre):
+    """Genera por adelantado todas las variantes de una imagen recién subida."""
+    for tamano in tamanos_disponibles():
+        obtener_variante(nombre, tamano)
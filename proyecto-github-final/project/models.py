@@ -5,12 +5,30 @@ Este archivo contiene las clases que representan las tablas de la base de datos
 utilizando el ORM de SQLAlchemy. Cada clase corresponde a una tabla y sus
 atributos a las columnas de esa tabla.
 """
+import re
+import hashlib
 import secrets
+from datetime import date, datetime, timezone
 from . import db
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Text, ForeignKey, Boolean
+from sqlalchemy import Integer, BigInteger, String, Text, ForeignKey, Boolean, Date, DateTime, Index
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# Prefijo que distingue los hashes de las claves antiguas guardadas en texto plano.
+API_KEY_HASH_PREFIX = 'sha256$'
+
+def hash_api_key(api_key: str) -> str:
+    """Calcula el hash con el que se guarda y se busca una API Key.
+
+    Basta un SHA-256 sin sal: la clave ya es un valor aleatorio de 256 bits, por lo
+    que no es vulnerable a diccionarios, y el hash determinista permite buscarla por índice.
+    """
+    return API_KEY_HASH_PREFIX + hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+def _ahora():
+    """Devuelve la fecha y hora actual en UTC (sin zona, como la guarda SQLite)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class User(db.Model):
     """Representa a un usuario en la base de datos."""
     __tablename__ = 'users'
@@ -19,7 +37,11 @@ class User(db.Model):
     username: Mapped[str] = mapped_column(String(80), unique=True, nullable=False)
     password_hash: Mapped[str] = mapped_column(String(256), nullable=False)
     role: Mapped[str] = mapped_column(String(20), nullable=False, default='user')
-    api_key: Mapped[str] = mapped_column(String(128), unique=True, nullable=True)
+    # Clave de versiones anteriores, que admitían una sola por usuario (en texto plano o
+    # con hash). Al usarse se pasa a 'api_keys' y la columna queda vacía (ver auth.py).
+    api_key_hash: Mapped[str] = mapped_column('api_key', String(128), unique=True, nullable=True)
+    # Claves vigentes, una por cada inicio de sesión (ver generate_api_key).
+    api_keys: Mapped[list["ApiKey"]] = relationship("ApiKey", back_populates="user", cascade="all, delete-orphan", order_by="ApiKey.id")
     
     # Define la relación uno-a-muchos: un usuario puede tener muchas boletas.
     # 'cascade="all, delete-orphan"' asegura que si un usuario es eliminado,
@@ -34,9 +56,38 @@ class User(db.Model):
         """Verifica si la contraseña proporcionada coincide con el hash almacenado."""
         return check_password_hash(self.password_hash, password)
     
-    def generate_api_key(self):
-        """Genera una clave de API única y segura para la autenticación sin estado."""
-        self.api_key = secrets.token_hex(32)
+    def generate_api_key(self, rotar: bool = False, maximo: int | None = None) -> str:
+        """Genera una clave de API única y segura para la autenticación sin estado.
+
+        La clave en texto plano solo se devuelve aquí, para entregarla al cliente;
+        en la base de datos se guarda su hash. Las claves anteriores siguen siendo
+        válidas (cada dispositivo conserva la suya), salvo las más antiguas que
+        excedan 'maximo'.
+
+        Args:
+            rotar (bool): Si es True, revoca todas las claves anteriores del usuario.
+            maximo (int | None): Cantidad máxima de claves vigentes.
+        """
+        api_key = secrets.token_hex(32)
+        if rotar:
+            self.api_keys.clear()
+            self.api_key_hash = None
+        self.api_keys.append(ApiKey(key_hash=hash_api_key(api_key)))
+        if maximo:
+            del self.api_keys[:-maximo]
+        return api_key
+
+class ApiKey(db.Model):
+    """Representa una API Key entregada al iniciar sesión (solo se guarda su hash)."""
+    __tablename__ = 'api_keys'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False, index=True)
+    # La restricción UNIQUE sirve de índice para buscar la clave de cada petición.
+    key_hash: Mapped[str] = mapped_column(String(128), unique=True, nullable=False)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=_ahora)
+
+    user: Mapped["User"] = relationship("User", back_populates="api_keys")
 
 class Categoria(db.Model):
     """Representa una categoría de gasto en la base de datos."""
@@ -52,12 +103,41 @@ class Categoria(db.Model):
         """Devuelve una representación de la categoría en formato de diccionario."""
         return {"id": self.id, "nombre": self.nombre}
 
+# Fecha AAAA-MM-DD, aceptando también mes y día sin cero a la izquierda (ej. '2024-3-5').
+_PATRON_FECHA = re.compile(r'\s*(\d{4})-(\d{1,2})-(\d{1,2})\s*')
+
+def convertir_fecha(valor):
+    """Convierte una fecha recibida como texto 'AAAA-MM-DD' (o un objeto date) en un date.
+
+    Raises:
+        ValueError: Si el texto no tiene ese formato o no es una fecha del calendario.
+    """
+    if isinstance(valor, date):
+        return valor
+    m = _PATRON_FECHA.fullmatch(valor) if isinstance(valor, str) else None
+    try:
+        return date(*map(int, m.groups()))
+    except (AttributeError, ValueError):
+        raise ValueError("La fecha debe tener el formato AAAA-MM-DD.") from None
+
 class Boleta(db.Model):
     """Representa una boleta o recibo de gasto en la base de datos."""
     __tablename__ = 'boletas'
+    # Índices compuestos para el listado ordenado por (fecha, id): el primero cubre la
+    # vista de un usuario normal (sus boletas no eliminadas) y el segundo la de un admin.
+    # Como empiezan por 'user_id' y por 'fecha', también resuelven los filtros por usuario
+    # y por rango de fechas. Los demás cubren los filtros por categoría y razón, y la
+    # búsqueda de las boletas que usan una imagen. Ver benchmarks/planes_boletas.py.
+    __table_args__ = (
+        Index('ix_boletas_user_deleted_fecha_id', 'user_id', 'is_deleted', 'fecha', 'id'),
+        Index('ix_boletas_fecha_id', 'fecha', 'id'),
+        Index('ix_boletas_categoria_id', 'categoria_id'),
+        Index('ix_boletas_razon_modificacion', 'razon_modificacion'),
+        Index('ix_boletas_imagen_url', 'imagen_url'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    fecha: Mapped[str] = mapped_column(String(10), nullable=False)
+    fecha: Mapped[date] = mapped_column(Date, nullable=False)
     monto_total: Mapped[int] = mapped_column(Integer, nullable=False)
     notas: Mapped[str] = mapped_column(Text, nullable=True)
     razon_modificacion: Mapped[str] = mapped_column(String(50), nullable=True)
@@ -81,7 +161,7 @@ class Boleta(db.Model):
         """
         return {
             "id": self.id,
-            "fecha": self.fecha,
+            "fecha": self.fecha.isoformat(),
             "monto_total": self.monto_total,
             "categoria": self.categoria.nombre,
             "notas": self.notas,
@@ -90,4 +170,142 @@ class Boleta(db.Model):
             "razon_modificacion": self.razon_modificacion,
             "imagen_url": self.imagen_url,
             "is_deleted": self.is_deleted
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def select_serializado(cls):
+        """Construye una consulta por columnas con los mismos campos que 'to_dict'.
+
+        Trae el nombre de la categoría y del creador en la misma consulta (JOIN),
+        en lugar de una carga diferida por cada boleta, y no construye objetos
+        del ORM. Cada fila se convierte a diccionario con 'fila_a_dict'.
+        """
+        return db.select(
+            cls.id, cls.fecha, cls.monto_total, Categoria.nombre.label('categoria'), cls.notas,
+            cls.user_id, User.username.label('creador'), cls.razon_modificacion, cls.imagen_url, cls.is_deleted
+        ).join(Categoria, cls.categoria_id == Categoria.id).join(User, cls.user_id == User.id)
+
+    @staticmethod
+    def fila_a_dict(fila):
+        """Convierte una fila de 'select_serializado' al mismo diccionario que 'to_dict'."""
+        data = dict(fila._mapping)
+        data['fecha'] = data['fecha'].isoformat()
+        return data
+
+    @classmethod
+    def obtener_dict(cls, boleta_id):
+        """Devuelve la representación en diccionario de una boleta con una sola consulta."""
+        fila = db.session.execute(cls.select_serializado().where(cls.id == boleta_id)).one_or_none()
+        return cls.fila_a_dict(fila) if fila else None
+
+class ResumenMensual(db.Model):
+    """Acumulado de boletas por usuario, categoría y mes (tabla de resumen).
+
+    Se mantiene de forma incremental en la misma transacción que crea, modifica o
+    elimina cada boleta (ver resumen.py), de modo que los reportes mensuales leen
+    una fila por grupo en lugar de recorrer toda la tabla 'boletas'. Las boletas
+    eliminadas no se incluyen.
+    """
+    __tablename__ = 'resumen_mensual'
+
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), primary_key=True)
+    categoria_id: Mapped[int] = mapped_column(ForeignKey('categorias.id'), primary_key=True)
+    # Mes en formato AAAA-MM.
+    mes: Mapped[str] = mapped_column(String(7), primary_key=True)
+    cantidad: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    suma: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class VersionDatos(db.Model):
+    """Contador de cambios de un ámbito de datos ('categorias', 'boletas:<user_id>', 'todo').
+
+    Se incrementa en la misma transacción que modifica esos datos (ver versiones.py),
+    de modo que '/api/boletas' y '/api/categorias' pueden calcular su ETag y reutilizar
+    páginas ya serializadas sin consultar la tabla 'boletas'.
+    """
+    __tablename__ = 'versiones_datos'
+
+    ambito: Mapped[str] = mapped_column(String(40), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class BoletaBusqueda(db.Model):
+    """Texto de cada boleta para la búsqueda de texto completo ('?q=' en '/api/boletas').
+
+    Reúne las notas, el nombre de la categoría y el texto leído por OCR de su imagen.
+    Se mantiene en la misma transacción que crea o modifica la boleta (ver busqueda.py).
+    En MySQL la columna 'texto' tiene un índice FULLTEXT; en SQLite la indexa una
+    tabla virtual FTS5 que se crea junto con esta tabla.
+    """
+    __tablename__ = 'boletas_busqueda'
+    __table_args__ = (Index('ix_boletas_busqueda_texto', 'texto', mysql_prefix='FULLTEXT').ddl_if(dialect=('mysql', 'mariadb')),)
+
+    boleta_id: Mapped[int] = mapped_column(ForeignKey('boletas.id'), primary_key=True, autoincrement=False)
+    texto: Mapped[str] = mapped_column(Text, nullable=False, default='')
+
+class OcrJob(db.Model):
+    """Representa un trabajo de OCR encolado para su procesamiento asíncrono.
+
+    La tabla funciona como cola compartida: los workers web insertan trabajos
+    en estado 'pendiente' y los procesos de ocr_worker.py los reclaman con un
+    UPDATE condicional, por lo que no se necesita ningún servicio adicional.
+    """
+    __tablename__ = 'ocr_jobs'
+    # Índice para que la búsqueda del siguiente trabajo pendiente sea un rango.
+    __table_args__ = (Index('ix_ocr_jobs_estado_id', 'estado', 'id'),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    # Estados posibles: 'pendiente', 'procesando', 'completado' y 'error'.
+    estado: Mapped[str] = mapped_column(String(20), nullable=False, default='pendiente')
+    imagen_path: Mapped[str] = mapped_column(String(512), nullable=False)
+    fecha: Mapped[str] = mapped_column(String(10), nullable=True)
+    monto: Mapped[int] = mapped_column(Integer, nullable=True)
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    intentos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    worker: Mapped[str] = mapped_column(String(64), nullable=True)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=_ahora)
+    iniciado_en: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finalizado_en: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def to_dict(self):
+        """Devuelve el estado del trabajo y, si ya terminó, el resultado del OCR.
+
+        Cuando el trabajo está completado se incluyen los mismos campos que
+        devuelve el modo síncrono de '/api/boletas/upload'.
+        """
+        from .ocr import construir_respuesta_ocr
+        data = {"job_id": self.id, "estado": self.estado}
+        if self.estado == 'completado':
+            data.update(construir_respuesta_ocr(self.fecha, self.monto or 0))
+        elif self.estado == 'error':
+            data.update({"success": False, "message": "No se pudo procesar la imagen. Por favor, ingrese los datos manualmente.", "error": self.error})
+        return data
+
+class OcrLectura(db.Model):
+    """Lectura de OCR de una imagen, identificada por el SHA-256 de sus bytes.
+
+    Guarda la salida cruda de EasyOCR (cajas, textos y confianzas) y la fecha y el
+    monto que se obtuvieron de ella. Sus filas nunca se expulsan ni se purgan: son la
+    fuente del texto buscable (busqueda.py) y de 'flask reparse-ocr' (reproceso_ocr.py).
+    """
+    __tablename__ = 'ocr_lecturas'
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    resultado_json: Mapped[str] = mapped_column(Text, nullable=False)
+    fecha: Mapped[str] = mapped_column(String(10), nullable=True)
+    monto: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=_ahora)
+
+class OcrResultado(db.Model):
+    """Entrada de la caché de OCR: la imagen con ese SHA-256 no se vuelve a leer.
+
+    Permite responder al instante cuando se vuelve a subir la misma foto, sin repetir
+    la inferencia. Los datos están en su OcrLectura; esta tabla solo lleva la cuenta
+    de uso, para expulsar las entradas usadas hace más tiempo. Ver ocr_cache.py.
+    """
+    __tablename__ = 'ocr_resultados'
+    # Índice para expulsar primero las entradas usadas hace más tiempo (LRU).
+    __table_args__ = (Index('ix_ocr_resultados_usado_en', 'usado_en'),)
+
+    sha256: Mapped[str] = mapped_column(String(64), ForeignKey('ocr_lecturas.sha256'), primary_key=True)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=_ahora)
+    usado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=_ahora)
@@ -0,0 +1,118 @@
+# project/motor_bd.py
+"""Ajustes del motor de base de datos según el tipo de base (SQLite o MySQL).
+
+Las instalaciones pequeñas usan SQLite también en producción. Con su configuración
+por defecto (journal 'DELETE') un escritor bloquea a todos los lectores, y varias
+subidas concurrentes terminan en "database is locked". Este módulo aplica, en cada
+conexión nueva:
+
+* SQLite: journal WAL (los lectores nunca esperan a un escritor), 'synchronous'
+  NORMAL (seguro con WAL y mucho más rápido que FULL), 'busy_timeout' (un escritor
+  espera su turno en vez de fallar), 'mmap_size' y 'cache_size'.
+* MySQL: tamaño del pool, 'pool_pre_ping' y reciclado de conexiones, para no usar
+  conexiones que el servidor cerró por 'wait_timeout'.
+
+Además, en SQLite las transacciones de escritura se serializan con 'BEGIN IMMEDIATE':
+toman el bloqueo de escritura al empezar y, si otro proceso lo tiene, esperan hasta
+'busy_timeout'. Con el 'BEGIN' diferido de siempre, una transacción que primero lee
+y luego escribe falla de inmediato si otro proceso escribió entre medio, y ahí
+'busy_timeout' no sirve. Se consideran de escritura las peticiones POST, PUT, PATCH
+y DELETE, y el código que corre dentro de 'escritura()' (trabajadores, comandos).
+Por eso esas transacciones deben ser cortas: no se debe leer el cuerpo de la
+petición, calcular el hash de una contraseña o esperar al OCR con una transacción
+abierta. La autenticación, que consulta la base antes de que la ruta lea el cuerpo,
+termina su transacción con 'terminar_lectura()'.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from . import db
+
+# Métodos HTTP cuyas transacciones empiezan con 'BEGIN IMMEDIATE' en SQLite.
+METODOS_ESCRITURA = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+_escritura = ContextVar('escritura', default=False)
+
+def _dialecto(uri):
+    return make_url(uri).get_backend_name() if uri else None
+
+def opciones_motor(config):
+    """Devuelve las opciones de 'create_engine' que corresponden a la base configurada.
+
+    Se usan como SQLALCHEMY_ENGINE_OPTIONS; las que ya estén definidas en la
+    configuración tienen prioridad.
+    """
+    dialecto = _dialecto(config.get('SQLALCHEMY_DATABASE_URI'))
+    if dialecto == 'sqlite':
+        # 'timeout' es el 'busy_timeout' de la conexión, en segundos, desde que se abre.
+        return {"connect_args": {"timeout": config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    if dialecto in ('mysql', 'mariadb'):
+        return {
+            "pool_size": config['MYSQL_POOL_SIZE'], "max_overflow": config['MYSQL_MAX_OVERFLOW'],
+            "pool_timeout": config['MYSQL_POOL_TIMEOUT'], "pool_recycle": config['MYSQL_POOL_RECYCLE'],
+            "pool_pre_ping": True,
+        }
+    return {}
+
+def configurar(app):
+    """Agrega las opciones del motor a la configuración. Se llama antes de 'db.init_app'."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**opciones_motor(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+@contextmanager
+def escritura():
+    """Hace que las transacciones que empiecen dentro del bloque sean de escritura.
+
+    Fuera de una petición (trabajadores de OCR, comandos de terminal) no hay un método
+    HTTP que lo indique. En SQLite, una transacción que lee y luego escribe debe
+    empezar dentro de este bloque para no fallar si otro proceso escribe entre medio.
+    """
+    token = _escritura.set(True)
+    try:
+        yield
+    finally:
+        _escritura.reset(token)
+
+def terminar_lectura():
+    """Termina la transacción de solo lectura de la sesión, si hay una abierta.
+
+    En una petición de escritura esa transacción empezó con 'BEGIN IMMEDIATE', así que
+    tiene el bloqueo de escritura de SQLite aunque solo haya leído. Al terminarla, la
+    siguiente consulta abre una transacción nueva, que vuelve a pedir el bloqueo.
+    """
+    db.session.rollback()
+
+def es_escritura():
+    """Indica si la transacción que empieza ahora debe tomar el bloqueo de escritura."""
+    return _escritura.get() or (has_request_context() and request.method in METODOS_ESCRITURA)
+
+def init_app(app):
+    """Registra los PRAGMAs y el inicio de transacciones sobre el motor de SQLite.
+
+    Se llama dentro de un contexto de aplicación, antes de la primera conexión.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    config = app.config
+    pragmas = [f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+               f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+               f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+               # Un valor negativo indica el tamaño en KiB en vez de en páginas.
+               f"PRAGMA cache_size = {-int(config['SQLITE_CACHE_KB'])}"]
+    if config['SQLITE_WAL']:
+        pragmas.insert(0, "PRAGMA journal_mode = WAL")
+    serializar = config['SQLITE_SERIALIZAR_ESCRITURAS']
+
+    @event.listens_for(db.engine, 'connect')
+    def _al_conectar(conexion_dbapi, registro):
+        # El driver no debe abrir transacciones por su cuenta: las abre '_al_comenzar'.
+        conexion_dbapi.isolation_level = None
+        cursor = conexion_dbapi.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(db.engine, 'begin')
+    def _al_comenzar(conexion):
+        conexion.exec_driver_sql("BEGIN IMMEDIATE" if serializar and es_escritura() else "BEGIN")
@@ -0,0 +1,338 @@
+# project/ocr.py
+"""Lógica de reconocimiento óptico de caracteres (OCR) de las boletas.
+
+Este archivo agrupa el lector de EasyOCR y el análisis del texto extraído,
+de modo que tanto las rutas de la API como los procesos trabajadores de la
+cola de OCR (ver ocr_worker.py) compartan exactamente la misma lógica.
+
+El modelo de EasyOCR (y torch) se carga de forma diferida en el primer uso, no al
+importar el módulo, para que los workers web y los comandos de terminal arranquen
+rápido. Si la configuración define OCR_SERVER_SOCKET, la inferencia se delega al
+proceso de ocr_server.py, que mantiene una única copia del modelo por servidor.
+"""
+import re
+import threading
+from bisect import bisect_right
+from flask import current_app, has_app_context
+from . import metricas
+
+# El lector se crea en el primer uso (ver get_reader). El candado evita que dos hilos
+# del mismo proceso carguen el modelo a la vez.
+_reader = None
+_reader_lock = threading.Lock()
+
+def get_reader():
+    """Devuelve el lector de EasyOCR del proceso, cargándolo la primera vez.
+
+    Se configura para español y para usar CPU, con el motor de inferencia elegido
+    en OCR_BACKEND (ver ocr_backends.py). La importación de easyocr también se
+    difiere aquí, ya que arrastra la carga de torch.
+    """
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                from .ocr_backends import crear_reader
+                if has_app_context():
+                    reader = crear_reader(current_app.config['OCR_BACKEND'], current_app.config['OCR_ONNX_FOLDER'])
+                else:
+                    reader = crear_reader()
+                # 'readtext' llama a 'self.detect' y 'self.recognize', así que envolverlos en
+                # la instancia mide las dos etapas también dentro de una lectura completa.
+                reader.detect = metricas.medida('detectar', reader.detect)
+                reader.recognize = metricas.medida('reconocer', reader.recognize)
+                _reader = reader
+    return _reader
+
+def ejecutar_lectura(reader, imagen, modo='completo', **kwargs):
+    """Ejecuta la lectura con el modo indicado sobre un lector ya cargado.
+
+    Con modo 'completo' se llama a 'readtext'; con 'anclado', a la lectura en dos
+    fases de ocr_anclado.py, que siempre devuelve cajas y confianzas. La usan tanto
+    'leer_texto' como el servidor de OCR.
+    """
+    if modo == 'anclado':
+        from .ocr_anclado import leer_anclado
+        return leer_anclado(reader, imagen, batch_size=kwargs.get('batch_size', 1), workers=kwargs.get('workers', 0))
+    return reader.readtext(imagen, **kwargs)
+
+def leer_texto(imagen, modo='completo', **kwargs):
+    """Ejecuta 'readtext' de EasyOCR, localmente o a través del servidor de OCR.
+
+    Args:
+        imagen (bytes | str | numpy.ndarray): Los bytes de la imagen, la ruta al archivo
+            en disco o la imagen ya preprocesada.
+        modo (str): 'completo' o 'anclado' (ver 'ejecutar_lectura').
+        **kwargs: Argumentos que se pasan tal cual a 'reader.readtext'.
+
+    Returns:
+        list: El resultado de 'readtext' (con tipos nativos de Python si viene del servidor).
+    """
+    socket_path = current_app.config.get('OCR_SERVER_SOCKET') if has_app_context() else None
+    if socket_path:
+        from .ocr_server import ServidorOcrNoDisponible, leer_texto_remoto
+        # Una imagen preprocesada se envía como PNG: el protocolo solo transporta bytes.
+        if hasattr(imagen, 'shape'):
+            from .preprocesamiento import a_png
+            imagen_remota = a_png(imagen)
+        else:
+            imagen_remota = imagen
+        try:
+            with metricas.medir('ocr_remoto'):
+                return leer_texto_remoto(socket_path, imagen_remota, kwargs, timeout=current_app.config['OCR_SERVER_TIMEOUT'], modo=modo)
+        except ServidorOcrNoDisponible:
+            if not current_app.config['OCR_SERVER_FALLBACK_LOCAL']:
+                raise
+            current_app.logger.warning("Servidor de OCR no disponible en %s; se usa el modelo local.", socket_path)
+    return ejecutar_lectura(get_reader(), imagen, modo, **kwargs)
+
+# --- Análisis del texto extraído ---
+# Los cuatro formatos de fecha se combinan en una sola expresión con grupos con
+# nombre. En una misma posición solo puede coincidir uno de ellos, así que
+# 'match' en cada posición equivale a buscar cada patrón por separado.
+_MESES_LARGOS = {'enero': '01', 'febrero': '02', 'marzo': '03', 'abril': '04', 'mayo': '05', 'junio': '06', 'julio': '07', 'agosto': '08', 'septiembre': '09', 'octubre': '10', 'noviembre': '11', 'diciembre': '12'}
+_MESES_CORTOS = {'ene': '01', 'feb': '02', 'mar': '03', 'abr': '04', 'may': '05', 'jun': '06', 'jul': '07', 'ago': '08', 'sep': '09', 'oct': '10', 'nov': '11', 'dic': '12'}
+_PATRON_FECHA = re.compile(
+    r'(?P<larga>(?P<l_dia>\d{1,2})\s+de\s+(?P<l_mes>' + '|'.join(_MESES_LARGOS) + r')\s+del?\s+(?P<l_anio>\d{4}))'
+    r'|(?P<corta>(?P<c_dia>\d{1,2})\s+(?P<c_mes>' + '|'.join(_MESES_CORTOS) + r')\s+(?P<c_anio>\d{4}))'
+    r'|(?P<iso>(?P<i_anio>\d{4})[-/](?P<i_mes>\d{1,2})[-/](?P<i_dia>\d{1,2}))'
+    r'|(?P<dma>(?P<d_dia>\d{1,2})[-/](?P<d_mes>\d{1,2})[-/](?P<d_anio>\d{4}))'
+)
+# Prioridad de cada formato: ante varias fechas gana el formato más específico y,
+# dentro del mismo formato, la que aparece primero.
+_PRIORIDAD_FECHA = {'larga': 0, 'corta': 1, 'iso': 2, 'dma': 3}
+# Los únicos caracteres que IGNORECASE iguala a una letra de los meses pero que
+# 'lower()' no convierte a ella (y 'İ'.lower() ocupa dos caracteres).
+_PLEGADO = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+# Números con separador de miles (ej. 1.234) o simples (ej. 238).
+_PATRON_MONTO = re.compile(r'\d{1,3}(?:[.,]\d{3})*')
+# Un número así tiene 1 a 3 dígitos iniciales y un separador por cada grupo de tres,
+# por lo que su largo determina cuántos dígitos tiene. Estos son los largos con
+# entre 3 y 7 dígitos ('123', '1.234' a '123.456', '1.234.567'): los demás se
+# descartan sin convertirlos.
+_LARGOS_MONTO = frozenset((3, 5, 6, 7, 9))
+
+def _normalizar_fecha(m, formato):
+    """Convierte una coincidencia de _PATRON_FECHA al formato AAAA-MM-DD."""
+    if formato == 'larga':
+        return f"{m['l_anio']}-{_MESES_LARGOS[m['l_mes']]}-{m['l_dia'].zfill(2)}"
+    if formato == 'corta':
+        return f"{m['c_anio']}-{_MESES_CORTOS[m['c_mes']]}-{m['c_dia'].zfill(2)}"
+    if formato == 'iso':
+        return f"{m['i_anio']}-{m['i_mes'].zfill(2)}-{m['i_dia'].zfill(2)}"
+    return f"{m['d_anio']}-{m['d_mes'].zfill(2)}-{m['d_dia'].zfill(2)}"
+
+def _posibles_inicios_fecha(texto):
+    """Devuelve, ordenadas, las posiciones donde podría empezar una fecha.
+
+    En vez de intentar la expresión en cada carácter, se parte de lo que toda fecha
+    contiene: un separador '-' o '/' (que está 1, 2 o 4 dígitos después del inicio)
+    o una abreviatura de mes (todos los nombres largos empiezan por la corta), antes
+    de la cual hay espacios, opcionalmente 'de', y el día.
+    """
+    inicios = set()
+    for separador in '-/':
+        i = texto.find(separador)
+        while i != -1:
+            inicios.update((i - 4, i - 2, i - 1))
+            i = texto.find(separador, i + 1)
+    for mes in _MESES_CORTOS:
+        i = texto.find(mes)
+        while i != -1:
+            j = i
+            while j > 0 and texto[j - 1].isspace():
+                j -= 1
+            inicios.update((j - 2, j - 1))
+            if j != i and texto[j - 2:j] == 'de':
+                k = j - 2
+                while k > 0 and texto[k - 1].isspace():
+                    k -= 1
+                inicios.update((k - 2, k - 1))
+            i = texto.find(mes, i + 1)
+    inicios.discard(-1); inicios.discard(-2); inicios.discard(-3); inicios.discard(-4)
+    return sorted(inicios)
+
+def _plegar(full_text):
+    """Pasa el texto a minúsculas para buscar fechas sin IGNORECASE, conservando las posiciones."""
+    return (full_text if full_text.isascii() else full_text.translate(_PLEGADO)).lower()
+
+def _fechas(texto):
+    """Recorre las fechas de un texto ya plegado, de izquierda a derecha.
+
+    Una fecha que empieza dentro de otra ya encontrada ('8-09-2020' dentro de
+    '28-09-2020') solo se entrega si es de un formato de mayor prioridad.
+
+    Yields:
+        tuple: (coincidencia, formato, prioridad).
+    """
+    fin_anterior, prioridad_anterior = -1, None
+    for posicion in _posibles_inicios_fecha(texto):
+        m = _PATRON_FECHA.match(texto, posicion)
+        if m is None:
+            continue
+        formato = m.lastgroup
+        prioridad = _PRIORIDAD_FECHA[formato]
+        if posicion < fin_anterior and prioridad >= prioridad_anterior:
+            continue
+        fin_anterior, prioridad_anterior = max(fin_anterior, m.end()), prioridad
+        yield m, formato, prioridad
+
+def _mejor_fecha(texto):
+    """Devuelve la fecha normalizada del formato más específico, o None."""
+    mejor = None
+    for m, formato, prioridad in _fechas(texto):
+        if mejor is None or prioridad < mejor[1]:
+            mejor = (m, prioridad, formato)
+            if prioridad == 0:
+                break
+    return _normalizar_fecha(mejor[0], mejor[2]) if mejor else None
+
+def analizar_texto(text_list, confianzas=None):
+    """Analiza el texto de una boleta y devuelve la fecha, el monto y sus candidatos.
+
+    Aplica los mismos criterios que 'parse_ocr_text', pero además informa todas las
+    fechas y montos posibles que encontró, para poder revisar o depurar la elección.
+
+    Args:
+        text_list (list): Los textos extraídos por EasyOCR, en orden.
+        confianzas (list | None): La confianza de EasyOCR de cada texto, si se conoce.
+
+    Returns:
+        dict: 'fecha', 'monto' y las listas 'candidatos_fecha' y 'candidatos_monto'.
+              Cada candidato indica su 'valor', el 'indice' del texto donde empieza,
+              su posición 'inicio'/'fin' dentro de ese texto y la 'confianza' del
+              texto (o None). Los de fecha incluyen además su 'formato' y su
+              'prioridad' (0 es el formato más específico).
+    """
+    full_text = "\n".join(text_list)
+    # Posición de inicio de cada texto dentro de 'full_text', para ubicar los candidatos.
+    inicios, posicion = [], 0
+    for texto in text_list:
+        inicios.append(posicion)
+        posicion += len(texto) + 1
+
+    def ubicar(inicio, fin):
+        indice = bisect_right(inicios, inicio) - 1
+        return {"indice": indice, "inicio": inicio - inicios[indice], "fin": fin - inicios[indice], "confianza": confianzas[indice] if confianzas else None}
+
+    candidatos_fecha, fecha, mejor_prioridad = [], None, None
+    for m, formato, prioridad in _fechas(_plegar(full_text)):
+        valor = _normalizar_fecha(m, formato)
+        candidatos_fecha.append({"valor": valor, "formato": formato, "prioridad": prioridad, **ubicar(m.start(), m.end())})
+        if fecha is None or prioridad < mejor_prioridad:
+            fecha, mejor_prioridad = valor, prioridad
+
+    candidatos_monto, monto = [], 0
+    for m in _PATRON_MONTO.finditer(full_text):
+        inicio, fin = m.span()
+        if fin - inicio in _LARGOS_MONTO:
+            valor = int(m.group().replace('.', '').replace(',', ''))
+            candidatos_monto.append({"valor": valor, **ubicar(inicio, fin)})
+            if valor > monto:
+                monto = valor
+
+    return {"fecha": fecha, "monto": monto, "candidatos_fecha": candidatos_fecha, "candidatos_monto": candidatos_monto}
+
+def parse_ocr_text(text_list):
+    """
+    Analiza el texto extraído de una imagen para encontrar la fecha y el monto total.
+
+    La fecha elegida es la del formato más específico ('D de mes del AAAA', 'DD mes
+    AAAA', 'AAAA-MM-DD', 'DD-MM-AAAA') y, dentro del mismo formato, la primera. El
+    monto es el número más grande de entre 3 y 7 dígitos, para descartar cantidades
+    y RUTs. Las expresiones están precompiladas y el texto se recorre una vez por
+    cada una; 'analizar_texto' aplica los mismos criterios e informa los candidatos.
+
+    Args:
+        text_list (list): Una lista de strings extraídos de la imagen por EasyOCR.
+
+    Returns:
+        tuple: Una tupla conteniendo la fecha (str) y el monto (int) encontrados.
+    """
+    full_text = "\n".join(text_list)
+    # Se filtra por largo antes de convertir, sin crear un objeto por coincidencia.
+    montos = [int(n.replace('.', '').replace(',', '')) for n in _PATRON_MONTO.findall(full_text) if len(n) in _LARGOS_MONTO]
+    return _mejor_fecha(_plegar(full_text)), max(montos, default=0)
+
+def a_tipos_nativos(valor):
+    """Convierte recursivamente los tipos de numpy del resultado de EasyOCR a tipos JSON."""
+    if isinstance(valor, (list, tuple)):
+        return [a_tipos_nativos(v) for v in valor]
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    return valor
+
+def preparar_imagen(imagen, opciones=None):
+    """Aplica el preprocesamiento configurado (ver preprocesamiento.py) a una imagen.
+
+    Fuera de un contexto de aplicación, o con OCR_PREPROCESO_ACTIVO desactivado,
+    la imagen se devuelve sin cambios.
+
+    Args:
+        imagen (bytes | str | numpy.ndarray): La imagen original.
+        opciones (dict | None): Resultado de 'opciones_desde_config'. Permite llamar
+            a esta función desde hilos sin contexto de aplicación.
+
+    Returns:
+        bytes | str | numpy.ndarray: La imagen lista para 'leer_texto'.
+    """
+    from .preprocesamiento import opciones_desde_config, preprocesar
+    if opciones is None:
+        if not has_app_context():
+            return imagen
+        opciones = opciones_desde_config(current_app.config)
+    if not opciones['activo'] or not opciones['etapas']:
+        return imagen
+    with metricas.medir('preprocesar'):
+        arreglo, _ = preprocesar(imagen, opciones['etapas'], opciones['lado_maximo'])
+    return arreglo
+
+def reconocer(imagen, preprocesar=True, **kwargs):
+    """Ejecuta el OCR completo y devuelve el resultado crudo con cajas y confianzas.
+
+    Args:
+        imagen (bytes | str | numpy.ndarray): La imagen a leer.
+        preprocesar (bool): Si es False, se asume que la imagen ya pasó por 'preparar_imagen'.
+        **kwargs: Argumentos adicionales para 'readtext' (ej. batch_size, workers).
+
+    Returns:
+        list: Elementos [caja, texto, confianza], con tipos nativos de Python para
+              poder guardarlos como JSON.
+    """
+    if preprocesar:
+        imagen = preparar_imagen(imagen)
+    modo = current_app.config['OCR_MODO'] if has_app_context() else 'completo'
+    return a_tipos_nativos(leer_texto(imagen, modo=modo, detail=1, paragraph=False, **kwargs))
+
+def textos_de(resultado):
+    """Extrae la lista de textos de un resultado crudo de 'reconocer'."""
+    return [texto for _, texto, _ in resultado]
+
+def extraer_datos(resultado):
+    """Obtiene la fecha y el monto de un resultado crudo de 'reconocer'.
+
+    En modo 'anclado' el monto se busca solo en las líneas de total (ver
+    ocr_anclado.py); en modo 'completo' se analiza todo el texto con 'parse_ocr_text'.
+
+    Returns:
+        tuple: (fecha, monto).
+    """
+    if has_app_context() and current_app.config['OCR_MODO'] == 'anclado':
+        from .ocr_anclado import extraer_anclado
+        with metricas.medir('extraer_anclado'):
+            return extraer_anclado(resultado)
+    with metricas.medir('parse_ocr_text'):
+        return parse_ocr_text(textos_de(resultado))
+
+def construir_respuesta_ocr(fecha, monto):
+    """Construye el diccionario de respuesta con los datos sugeridos por el OCR.
+
+    Se comparte entre el modo síncrono de subida y la consulta de trabajos
+    asíncronos para que el frontend reciba siempre el mismo formato.
+    """
+    success = True
+    message = "Datos extraídos con éxito."
+    if not fecha or monto == 0:
+        success = False
+        message = "No se pudieron leer los datos clave (fecha y monto). La calidad de la imagen puede ser baja. Por favor, ingrese los datos manualmente."
+    return {"fecha_sugerida": fecha, "monto_sugerido": int(monto) if monto else 0, "success": success, "message": message}
@@ -0,0 +1,162 @@
+# project/ocr_anclado.py
+"""Lectura en dos fases centrada en las líneas de "TOTAL" y "FECHA".
+
+'parse_ocr_text' solo necesita la fecha y el monto total, pero 'readtext' reconoce
+todas las cajas de texto de la boleta (detalle de productos, RUT, folio, dirección).
+El modo anclado (OCR_MODO = 'anclado') separa la detección del reconocimiento:
+
+1. Se detectan todas las cajas de texto y se agrupan en líneas según su altura.
+2. Se reconoce solo la primera caja (la de más a la izquierda) de cada línea, que es
+   donde las boletas imprimen las etiquetas: "TOTAL", "MONTO", "FECHA", "EMISIÓN",
+   o directamente una fecha.
+3. Se reconocen las cajas restantes de las líneas ancla y de la línea siguiente,
+   donde suele quedar el valor cuando la impresora lo baja de línea.
+
+Si las líneas ancla no entregan una fecha y un monto, se reconocen todas las
+cajas que faltan, con lo que el resultado equivale al de 'readtext'.
+
+Al extraer los datos, el monto se busca solo en las líneas de total, de modo que
+números como el RUT o el folio no se confunden con el monto.
+"""
+import re
+from .ocr import parse_ocr_text
+
+ANCLA_TOTAL = re.compile(r'total|monto|a\s*pagar', re.IGNORECASE)
+ANCLA_FECHA = re.compile(r'fecha|emisi[oó]n|\d{1,4}[-/.]\d{1,2}[-/.]\d{2,4}', re.IGNORECASE)
+
+def _limites(caja):
+    """Devuelve (x_min, x_max, y_min, y_max) de una caja de 4 puntos."""
+    xs = [p[0] for p in caja]
+    ys = [p[1] for p in caja]
+    return min(xs), max(xs), min(ys), max(ys)
+
+def agrupar_lineas(rectangulos):
+    """Agrupa rectángulos (x_min, x_max, y_min, y_max) en líneas de texto.
+
+    Dos cajas pertenecen a la misma línea si el centro vertical de una cae dentro
+    de la mitad central de la otra.
+
+    Returns:
+        list: Listas de índices de 'rectangulos', de arriba hacia abajo y, dentro de
+              cada línea, de izquierda a derecha.
+    """
+    orden = sorted(range(len(rectangulos)), key=lambda i: (rectangulos[i][2] + rectangulos[i][3]) / 2)
+    lineas = []
+    for i in orden:
+        _, _, y0, y1 = rectangulos[i]
+        centro, alto = (y0 + y1) / 2, y1 - y0
+        if lineas:
+            centro_linea, alto_linea = lineas[-1][0]
+            if abs(centro - centro_linea) <= max(alto, alto_linea) / 2:
+                lineas[-1][1].append(i)
+                continue
+        lineas.append(((centro, alto), [i]))
+    return [sorted(indices, key=lambda i: rectangulos[i][0]) for _, indices in lineas]
+
+def _lineas_ancla(lineas, textos):
+    """Clasifica las líneas según su texto reconocido.
+
+    Returns:
+        tuple: (índices de líneas de total, índices de líneas de fecha).
+    """
+    totales, fechas = [], []
+    for n, linea in enumerate(lineas):
+        texto = " ".join(textos[i] for i in linea if i in textos)
+        if ANCLA_TOTAL.search(texto):
+            totales.append(n)
+        if ANCLA_FECHA.search(texto):
+            fechas.append(n)
+    return totales, fechas
+
+def _con_siguiente(indices, cantidad):
+    """Agrega a cada línea ancla la línea que la sigue."""
+    return sorted({m for n in indices for m in (n, n + 1) if m < cantidad})
+
+def extraer_anclado(resultado):
+    """Obtiene la fecha y el monto de un resultado crudo usando las líneas ancla.
+
+    Funciona con cualquier resultado con cajas (de 'readtext' o de 'leer_anclado').
+    La fecha se busca en las líneas de fecha y el monto en las de total (más la línea
+    siguiente de cada una). Si falta alguna ancla, o no entrega su dato, se usa
+    'parse_ocr_text' sobre todo el texto.
+
+    Returns:
+        tuple: (fecha, monto), igual que 'parse_ocr_text'.
+    """
+    lineas = agrupar_lineas([_limites(caja) for caja, _, _ in resultado])
+    textos = {i: texto for i, (_, texto, _) in enumerate(resultado)}
+    totales, fechas = _lineas_ancla(lineas, textos)
+
+    def textos_de_lineas(indices):
+        return [" ".join(textos[i] for i in lineas[n]) for n in _con_siguiente(indices, len(lineas))]
+
+    completo = None
+    if fechas:
+        fecha, _ = parse_ocr_text(textos_de_lineas(fechas))
+    if not fechas or not fecha:
+        completo = parse_ocr_text(list(textos.values()))
+        fecha = completo[0]
+    monto = 0
+    if totales:
+        # Se ignoran las líneas de total que a la vez son de fecha, porque el año
+        # ("2023") se tomaría como un monto.
+        _, monto = parse_ocr_text(textos_de_lineas([n for n in totales if n not in fechas] or totales))
+    if not monto:
+        monto = (completo or parse_ocr_text(list(textos.values())))[1]
+    return fecha, monto
+
+def leer_anclado(reader, imagen, batch_size=1, workers=0):
+    """Detecta todas las cajas de texto y reconoce solo las necesarias.
+
+    Args:
+        reader (easyocr.Reader): El lector ya cargado.
+        imagen (bytes | str | numpy.ndarray): La imagen a leer.
+        batch_size (int): Recortes por pasada del reconocedor.
+        workers (int): Procesos auxiliares del reconocedor.
+
+    Returns:
+        list: Elementos (caja, texto, confianza), con el mismo formato que
+              'readtext(detail=1)' pero solo de las cajas reconocidas.
+    """
+    from easyocr.utils import reformat_input
+    img, img_gris = reformat_input(imagen)
+    horizontales, libres = reader.detect(img, reformat=False)
+    horizontales, libres = horizontales[0], libres[0]
+    if not horizontales:
+        return reader.recognize(img_gris, horizontal_list=[], free_list=libres, batch_size=batch_size, workers=workers, reformat=False) if libres else []
+
+    lineas = agrupar_lineas([(h[0], h[1], h[2], h[3]) for h in horizontales])
+    textos, resultado = {}, {}
+
+    def reconocer_indices(indices, libres_extra=()):
+        pendientes = [i for i in indices if i not in textos]
+        if not pendientes and not libres_extra:
+            return []
+        lectura = reader.recognize(img_gris, horizontal_list=[horizontales[i] for i in pendientes], free_list=list(libres_extra), batch_size=batch_size, workers=workers, reformat=False)
+        # 'recognize' ordena las cajas por altura y recorta sus coordenadas negativas a 0;
+        # se asocian de vuelta por su esquina superior izquierda.
+        por_esquina = {(max(0, int(horizontales[i][0])), max(0, int(horizontales[i][2]))): i for i in pendientes}
+        extras = []
+        for caja, texto, confianza in lectura:
+            i = por_esquina.get((int(caja[0][0]), int(caja[0][1])))
+            if i is None:
+                extras.append((caja, texto, confianza))
+            else:
+                textos[i] = texto
+                resultado[i] = (caja, texto, confianza)
+        return extras
+
+    # Fase 1: la primera caja de cada línea.
+    reconocer_indices([linea[0] for linea in lineas])
+    totales, fechas = _lineas_ancla(lineas, textos)
+    orden = [i for linea in lineas for i in linea]
+    # Fase 2: el resto de las líneas ancla y la línea siguiente a cada una.
+    if totales and fechas:
+        reconocer_indices([i for n in _con_siguiente(totales + fechas, len(lineas)) for i in lineas[n]])
+        parcial = [resultado[i] for i in orden if i in resultado]
+        fecha, monto = extraer_anclado(parcial)
+        if fecha and monto:
+            return parcial
+    # Respaldo: se reconoce todo lo que falta, incluidas las cajas inclinadas.
+    extras = reconocer_indices(orden, libres)
+    return [resultado[i] for i in orden if i in resultado] + extras
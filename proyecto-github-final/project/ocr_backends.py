@@ -0,0 +1,129 @@
+# project/ocr_backends.py
+"""Variantes del motor de inferencia de EasyOCR para CPU.
+
+La aplicación corre sin GPU y el tiempo de cada lectura lo dominan el detector
+CRAFT y el reconocedor. OCR_BACKEND elige cómo se ejecutan:
+
+* 'int8': modelos de PyTorch con cuantización dinámica a int8 de las capas
+  lineales y LSTM. Es lo que hace EasyOCR por defecto en CPU ('quantize=True').
+* 'fp32': modelos de PyTorch sin cuantizar, como referencia de precisión.
+* 'onnx': detector y reconocedor exportados a ONNX y ejecutados con onnxruntime
+  (dependencia opcional: 'pip install onnxruntime'). La exportación se hace una
+  vez, a partir de los pesos fp32, y se guarda en OCR_ONNX_FOLDER.
+
+En los tres casos el resto de EasyOCR (preprocesado, cajas, decodificación) es el
+mismo, así que el resultado de 'readtext' tiene el mismo formato. La paridad de
+'parse_ocr_text' entre motores se comprueba con benchmarks/backends_ocr.py.
+"""
+import os
+import threading
+
+BACKENDS = ('int8', 'fp32', 'onnx')
+
+# Alto fijo de los recortes que recibe el reconocedor de EasyOCR.
+_ALTO_RECONOCEDOR = 64
+
+_candado_exportacion = threading.Lock()
+
+def crear_reader(backend='int8', carpeta_onnx=None, idiomas=('es',)):
+    """Crea un lector de EasyOCR para CPU con el motor indicado.
+
+    Args:
+        backend (str): Uno de BACKENDS.
+        carpeta_onnx (str | None): Dónde guardar/leer los modelos exportados ('onnx').
+        idiomas (tuple): Idiomas del reconocedor.
+
+    Returns:
+        easyocr.Reader: El lector listo para 'readtext'.
+
+    Raises:
+        ValueError: Si el motor no existe.
+        ImportError: Si se pide 'onnx' y onnxruntime no está instalado.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Motor de OCR desconocido: {backend}. Opciones: {', '.join(BACKENDS)}.")
+    import easyocr
+    if backend == 'onnx':
+        # Se verifica antes de cargar los modelos para fallar rápido.
+        import onnxruntime  # noqa: F401
+    reader = easyocr.Reader(list(idiomas), gpu=False, quantize=(backend == 'int8'))
+    if backend == 'onnx':
+        convertir_a_onnx(reader, carpeta_onnx)
+    return reader
+
+class _SesionOnnx:
+    """Sesión de onnxruntime en CPU con todas las optimizaciones de grafo activas."""
+
+    def __init__(self, ruta):
+        import onnxruntime
+        opciones = onnxruntime.SessionOptions()
+        opciones.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.sesion = onnxruntime.InferenceSession(ruta, opciones, providers=['CPUExecutionProvider'])
+        self.entradas = [e.name for e in self.sesion.get_inputs()]
+
+    def ejecutar(self, *tensores):
+        # El exportador puede descartar entradas que el modelo no usa (el texto del
+        # reconocedor), así que solo se envían las que el grafo declara.
+        return self.sesion.run(None, {nombre: t.detach().cpu().numpy() for nombre, t in zip(self.entradas, tensores)})
+
+def _modulo_onnx(ruta, n_salidas):
+    """Crea un nn.Module que reemplaza a un modelo de EasyOCR por su versión ONNX.
+
+    EasyOCR llama a sus modelos como 'net(x)' (detector) o 'model(x, texto)'
+    (reconocedor) y espera tensores de torch, así que el envoltorio conserva esa forma.
+    """
+    import torch
+
+    class ModuloOnnx(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.sesion = _SesionOnnx(ruta)
+
+        def forward(self, *tensores):
+            salidas = [torch.from_numpy(s) for s in self.sesion.ejecutar(*tensores)]
+            return salidas[0] if n_salidas == 1 else tuple(salidas)
+
+    return ModuloOnnx()
+
+def _sin_envoltorio(modelo):
+    """Devuelve el modelo interno si EasyOCR lo envolvió en DataParallel."""
+    return getattr(modelo, 'module', modelo)
+
+def exportar_onnx(reader, carpeta):
+    """Exporta el detector y el reconocedor de un lector fp32 a archivos ONNX.
+
+    Returns:
+        tuple: Rutas (detector, reconocedor).
+    """
+    import torch
+    os.makedirs(carpeta, exist_ok=True)
+    ruta_detector = os.path.join(carpeta, 'detector.onnx')
+    ruta_reconocedor = os.path.join(carpeta, f"reconocedor_{'_'.join(reader.lang_list)}.onnx")
+    with _candado_exportacion, torch.no_grad():
+        if not os.path.exists(ruta_detector):
+            detector = _sin_envoltorio(reader.detector).eval()
+            torch.onnx.export(
+                detector, torch.zeros(1, 3, 640, 640), ruta_detector + '.tmp',
+                input_names=['imagen'], output_names=['mapas', 'caracteristicas'],
+                dynamic_axes={'imagen': {0: 'lote', 2: 'alto', 3: 'ancho'}, 'mapas': {0: 'lote', 1: 'alto', 2: 'ancho'}, 'caracteristicas': {0: 'lote', 2: 'alto', 3: 'ancho'}},
+                opset_version=17,
+            )
+            os.replace(ruta_detector + '.tmp', ruta_detector)
+        if not os.path.exists(ruta_reconocedor):
+            reconocedor = _sin_envoltorio(reader.recognizer).eval()
+            imagen = torch.zeros(1, 1, _ALTO_RECONOCEDOR, 256)
+            texto = torch.zeros(1, 1, dtype=torch.long)
+            torch.onnx.export(
+                reconocedor, (imagen, texto), ruta_reconocedor + '.tmp',
+                input_names=['imagen', 'texto'], output_names=['predicciones'],
+                dynamic_axes={'imagen': {0: 'lote', 3: 'ancho'}, 'predicciones': {0: 'lote', 1: 'pasos'}},
+                opset_version=17,
+            )
+            os.replace(ruta_reconocedor + '.tmp', ruta_reconocedor)
+    return ruta_detector, ruta_reconocedor
+
+def convertir_a_onnx(reader, carpeta):
+    """Reemplaza en el lector los modelos de PyTorch por sesiones de onnxruntime."""
+    ruta_detector, ruta_reconocedor = exportar_onnx(reader, carpeta)
+    reader.detector = _modulo_onnx(ruta_detector, n_salidas=2)
+    reader.recognizer = _modulo_onnx(ruta_reconocedor, n_salidas=1)
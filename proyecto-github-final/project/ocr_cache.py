@@ -0,0 +1,153 @@
+# project/ocr_cache.py
+"""Caché persistente de resultados de OCR por contenido de la imagen.
+
+Los usuarios suelen reintentar la lectura con la misma foto. Cada lectura se guarda
+en la tabla 'ocr_lecturas', indexada por el SHA-256 de los bytes de la imagen, y la
+caché ('ocr_resultados') apunta a ella, así que repetir la subida devuelve los datos
+sin volver a ejecutar EasyOCR.
+
+La caché tiene un máximo de entradas (OCR_CACHE_MAX_ENTRADAS): al superarlo se
+eliminan las usadas hace más tiempo. Expulsar, purgar o desactivar la caché
+(OCR_CACHE_ACTIVO) solo hace que la imagen se vuelva a leer; las lecturas se
+conservan siempre, porque de ellas salen el texto buscable y 'flask reparse-ocr'.
+"""
+import json
+import hashlib
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from . import db, motor_bd
+from .models import OcrLectura, OcrResultado, _ahora
+from .ocr import reconocer, extraer_datos
+
+TAMANO_BLOQUE = 64 * 1024
+
+# Un acierto solo actualiza 'usado_en' si el valor guardado es más antiguo que esto,
+# para no convertir cada lectura repetida en una escritura.
+_INTERVALO_TOQUE = timedelta(minutes=5)
+
+def hash_stream(stream):
+    """Calcula el SHA-256 de un flujo binario por bloques y lo deja de nuevo al inicio."""
+    sha = hashlib.sha256()
+    for bloque in iter(lambda: stream.read(TAMANO_BLOQUE), b''):
+        sha.update(bloque)
+    stream.seek(0)
+    return sha.hexdigest()
+
+def hash_bytes(datos):
+    """Calcula el SHA-256 de una imagen que ya está en memoria."""
+    return hashlib.sha256(datos).hexdigest()
+
+def hash_archivo(ruta):
+    """Calcula el SHA-256 de un archivo en disco."""
+    with open(ruta, 'rb') as stream:
+        return hash_stream(stream)
+
+def obtener(sha256):
+    """Busca la lectura de una imagen en la caché y marca la entrada como usada.
+
+    Returns:
+        OcrLectura | None: La lectura (con 'fecha' y 'monto'), o None si la imagen no
+            está en la caché.
+    """
+    if not current_app.config['OCR_CACHE_ACTIVO']:
+        return None
+    fila = db.session.execute(
+        db.select(OcrResultado, OcrLectura).join(OcrLectura, OcrResultado.sha256 == OcrLectura.sha256).where(OcrResultado.sha256 == sha256)
+    ).first()
+    if fila is None:
+        return None
+    entrada, lectura = fila
+    # Desconectada, la lectura conserva 'fecha' y 'monto' después del commit, sin otra consulta.
+    db.session.expunge(lectura)
+    ahora = _ahora()
+    if ahora - entrada.usado_en > _INTERVALO_TOQUE:
+        entrada.usado_en = ahora
+        db.session.commit()
+    return lectura
+
+def guardar(sha256, resultado, fecha, monto, en_cache=True):
+    """Guarda la lectura de una imagen y, si la caché está activa, su entrada en ella.
+
+    Si la imagen ya tenía una lectura (se volvió a leer tras salir de la caché), se
+    reemplaza por la nueva. Al agregar una entrada se recorta la caché si supera su
+    tamaño máximo.
+
+    Args:
+        en_cache (bool): Si es False solo se guarda la lectura (ej. 'flask reparse-ocr --releer').
+    """
+    en_cache = en_cache and current_app.config['OCR_CACHE_ACTIVO']
+    with motor_bd.escritura():
+        db.session.merge(OcrLectura(sha256=sha256, resultado_json=json.dumps(resultado, ensure_ascii=False), fecha=fecha, monto=monto or 0))
+        if en_cache:
+            # Sin consultar antes la caché: quien llama ya lo hizo (ver 'extraer_y_guardar').
+            try:
+                with db.session.begin_nested():
+                    db.session.add(OcrResultado(sha256=sha256))
+            except IntegrityError:
+                pass
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Otra petición con la misma imagen terminó primero; su lectura es equivalente.
+            db.session.rollback()
+            return
+    if en_cache:
+        recortar(current_app.config['OCR_CACHE_MAX_ENTRADAS'])
+
+def recortar(max_entradas):
+    """Elimina las entradas menos usadas recientemente hasta dejar como máximo 'max_entradas'.
+
+    Las lecturas de esas imágenes se conservan (ver 'OcrLectura').
+
+    Returns:
+        int: La cantidad de entradas eliminadas.
+    """
+    total = db.session.execute(db.select(db.func.count()).select_from(OcrResultado)).scalar_one()
+    sobrantes = total - max_entradas
+    if sobrantes <= 0:
+        return 0
+    antiguas = db.select(OcrResultado.sha256).order_by(OcrResultado.usado_en).limit(sobrantes).scalar_subquery()
+    eliminadas = db.session.execute(db.delete(OcrResultado).where(OcrResultado.sha256.in_(antiguas)).execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return eliminadas
+
+def purgar():
+    """Vacía la caché de OCR por completo y devuelve la cantidad de entradas eliminadas.
+
+    Cada imagen se vuelve a leer la próxima vez que se suba; las lecturas se conservan.
+    """
+    eliminadas = db.session.execute(db.delete(OcrResultado)).rowcount
+    db.session.commit()
+    return eliminadas
+
+def extraer_con_cache(imagen, sha256):
+    """Devuelve la fecha y el monto de una imagen, usando la caché si ya se leyó antes.
+
+    Args:
+        imagen (bytes | str): Los bytes de la imagen o la ruta al archivo en disco.
+        sha256 (str): El hash del contenido de la imagen.
+
+    Returns:
+        tuple: (fecha, monto, desde_cache), donde 'desde_cache' indica si hubo acierto.
+    """
+    entrada = obtener(sha256)
+    if entrada is not None:
+        return entrada.fecha, entrada.monto, True
+    return (*extraer_y_guardar(imagen, sha256), False)
+
+def extraer_y_guardar(imagen, sha256):
+    """Lee una imagen que no está en la caché y guarda su resultado.
+
+    Para quien ya consultó la caché con 'obtener' y no encontró la imagen.
+
+    Returns:
+        tuple: (fecha, monto).
+    """
+    # La lectura tarda segundos: no se deja abierta la transacción de la consulta, que en
+    # SQLite puede tener el bloqueo de escritura (ver motor_bd.py).
+    db.session.commit()
+    resultado = reconocer(imagen)
+    fecha, monto = extraer_datos(resultado)
+    guardar(sha256, resultado, fecha, monto)
+    return fecha, monto
@@ -0,0 +1,68 @@
+# project/ocr_lote.py
+"""Lectura por lotes de muchas imágenes de boletas en una sola petición.
+
+A fin de mes se fotografían decenas de boletas de una vez. En lugar de una
+petición a '/api/boletas/upload' por imagen, '/api/boletas/upload/batch' recibe
+todas juntas y este módulo:
+
+* responde desde la caché de OCR las imágenes que ya se leyeron antes;
+* preprocesa las demás en un pool de hilos (Pillow y NumPy liberan el GIL), de
+  modo que las imágenes siguientes ya están listas cuando EasyOCR termina la actual;
+* ejecuta 'readtext' con 'batch_size' y 'workers' mayores, para que el reconocedor
+  procese varios recortes de texto por pasada en vez de uno a la vez.
+
+Los resultados se entregan en el mismo orden de entrada, a medida que cada imagen
+termina, para transmitirlos como NDJSON.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from . import db, ocr_cache
+from .ocr import reconocer, preparar_imagen, extraer_datos, construir_respuesta_ocr
+from .preprocesamiento import opciones_desde_config
+
+def leer_lote(imagenes):
+    """Lee un lote de imágenes y produce un resultado por imagen, en el orden de entrada.
+
+    Args:
+        imagenes (list): Tuplas (nombre_archivo, ImagenRecibida) en el orden en que se
+            recibieron (ver subidas.py).
+
+    Yields:
+        dict: Los datos sugeridos de cada imagen, con 'indice' y 'archivo'. Si una
+              imagen falla, su resultado incluye 'error' y el lote continúa.
+    """
+    config = current_app.config
+    opciones = opciones_desde_config(config)
+    opciones_readtext = {"batch_size": config['OCR_LOTE_BATCH_SIZE'], "workers": config['OCR_LOTE_WORKERS']}
+
+    # Las consultas a la caché se hacen aquí, en el hilo de la petición, que es el único
+    # con sesión de base de datos; solo las imágenes sin resultado pasan al pool. Los
+    # hashes ya se calcularon al recibir los archivos.
+    en_cache = {i: ocr_cache.obtener(recibida.sha256) for i, (_, recibida) in enumerate(imagenes)}
+    # No se retiene la transacción de esas consultas mientras dura el OCR (ver motor_bd.py).
+    db.session.commit()
+
+    with ThreadPoolExecutor(max_workers=max(1, config['OCR_LOTE_HILOS'])) as pool:
+        # Los hilos abren cada imagen desde su archivo recibido (ver subidas.py).
+        preparadas = {i: pool.submit(preparar_imagen, recibida.ruta, opciones) for i, (_, recibida) in enumerate(imagenes) if en_cache[i] is None}
+        for i, (nombre, recibida) in enumerate(imagenes):
+            base = {"indice": i, "archivo": nombre}
+            entrada = en_cache[i]
+            if entrada is not None:
+                yield {**base, **construir_respuesta_ocr(entrada.fecha, entrada.monto), "desde_cache": True}
+                continue
+            try:
+                resultado = reconocer(preparadas.pop(i).result(), preprocesar=False, **opciones_readtext)
+            except Exception as e:
+                current_app.logger.warning("Falló el OCR de '%s' dentro de un lote: %s", nombre, e)
+                yield {**base, **construir_respuesta_ocr(None, 0), "desde_cache": False, "error": str(e)}
+                continue
+            fecha, monto = extraer_datos(resultado)
+            ocr_cache.guardar(recibida.sha256, resultado, fecha, monto)
+            yield {**base, **construir_respuesta_ocr(fecha, monto), "desde_cache": False}
+
+def generar_ndjson(imagenes):
+    """Serializa los resultados de 'leer_lote' como NDJSON, una línea por imagen."""
+    for resultado in leer_lote(imagenes):
+        yield json.dumps(resultado, ensure_ascii=False) + "\n"
@@ -0,0 +1,154 @@
+# project/ocr_server.py
+"""Servidor local de OCR que comparte un único modelo entre varios procesos.
+
+Cada worker de Gunicorn o Passenger que carga EasyOCR paga varios segundos de
+arranque y cientos de MB de memoria. Este módulo permite cargar el modelo una
+sola vez por servidor en un proceso dedicado ('flask ocr-server') al que los
+workers web se conectan mediante un socket Unix local.
+
+Protocolo: cada mensaje es un entero de 4 bytes (big-endian) con el largo de una
+cabecera JSON, seguido de la cabecera y, si la imagen se envía en memoria, de sus
+bytes. La respuesta usa el mismo formato de cabecera, sin datos adicionales.
+
+Una imagen enviada por ruta solo se lee si está dentro de las carpetas de imágenes
+de la aplicación (OCR_SPOOL_FOLDER y UPLOAD_FOLDER): el servidor no debe leer, en
+nombre de quien puede escribir en el socket, archivos que este no puede leer.
+"""
+import os
+import json
+import socket
+import struct
+import threading
+import socketserver
+from flask import current_app
+from .ocr import a_tipos_nativos, ejecutar_lectura, get_reader
+
+_LARGO = struct.Struct('>I')
+
+class ServidorOcrNoDisponible(Exception):
+    """Se lanza cuando no es posible conectarse al servidor de OCR."""
+
+def _recibir_exacto(conexion, n):
+    """Lee exactamente 'n' bytes del socket o lanza ConnectionError si se cierra."""
+    partes = []
+    while n > 0:
+        parte = conexion.recv(min(n, 1 << 20))
+        if not parte:
+            raise ConnectionError("La conexión se cerró antes de tiempo.")
+        partes.append(parte)
+        n -= len(parte)
+    return b''.join(partes)
+
+def _enviar_mensaje(conexion, cabecera, datos=b''):
+    """Envía una cabecera JSON seguida de datos binarios opcionales."""
+    cabecera_bytes = json.dumps(cabecera).encode('utf-8')
+    conexion.sendall(_LARGO.pack(len(cabecera_bytes)) + cabecera_bytes)
+    if datos:
+        conexion.sendall(datos)
+
+def _recibir_cabecera(conexion):
+    """Recibe y decodifica una cabecera JSON."""
+    (largo,) = _LARGO.unpack(_recibir_exacto(conexion, _LARGO.size))
+    return json.loads(_recibir_exacto(conexion, largo).decode('utf-8'))
+
+def leer_texto_remoto(socket_path, imagen, opciones, timeout=120, modo='completo'):
+    """Pide al servidor de OCR que lea una imagen con 'readtext' o en modo anclado.
+
+    Args:
+        socket_path (str): Ruta del socket Unix del servidor.
+        imagen (bytes | str): Bytes de la imagen o ruta a un archivo legible por el servidor,
+            dentro de OCR_SPOOL_FOLDER o UPLOAD_FOLDER.
+        opciones (dict): Argumentos para 'reader.readtext' (ej. detail, paragraph).
+        timeout (float): Segundos máximos de espera por la respuesta.
+        modo (str): 'completo' o 'anclado' (ver ocr.ejecutar_lectura).
+
+    Returns:
+        list: El resultado de 'readtext' con tipos nativos de Python.
+
+    Raises:
+        ServidorOcrNoDisponible: Si el socket no existe o rechaza la conexión.
+        RuntimeError: Si el servidor respondió con un error al procesar la imagen.
+    """
+    conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conexion.settimeout(timeout)
+    try:
+        try:
+            conexion.connect(socket_path)
+        except OSError as e:
+            raise ServidorOcrNoDisponible(str(e)) from e
+        if isinstance(imagen, str):
+            _enviar_mensaje(conexion, {"ruta": os.path.abspath(imagen), "opciones": opciones, "modo": modo})
+        else:
+            datos = bytes(imagen)
+            _enviar_mensaje(conexion, {"largo": len(datos), "opciones": opciones, "modo": modo}, datos)
+        respuesta = _recibir_cabecera(conexion)
+    finally:
+        conexion.close()
+    if not respuesta.get('ok'):
+        raise RuntimeError(f"El servidor de OCR devolvió un error: {respuesta.get('error')}")
+    return respuesta['resultado']
+
+class _ManejadorOcr(socketserver.BaseRequestHandler):
+    """Atiende una petición de OCR por conexión."""
+
+    def handle(self):
+        try:
+            cabecera = _recibir_cabecera(self.request)
+            imagen = self.server.ruta_permitida(cabecera['ruta']) if 'ruta' in cabecera else _recibir_exacto(self.request, cabecera['largo'])
+            # La inferencia se serializa: el modelo no es seguro entre hilos y torch
+            # ya paraleliza internamente cada llamada.
+            with self.server.candado:
+                resultado = ejecutar_lectura(self.server.reader, imagen, cabecera.get('modo', 'completo'), **cabecera.get('opciones', {}))
+            _enviar_mensaje(self.request, {"ok": True, "resultado": a_tipos_nativos(resultado)})
+        except Exception as e:
+            try:
+                _enviar_mensaje(self.request, {"ok": False, "error": str(e)})
+            except OSError:
+                pass
+
+class ServidorOcr(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor de sockets Unix que mantiene el modelo de EasyOCR en memoria."""
+    daemon_threads = True
+
+    def __init__(self, socket_path, reader, carpetas):
+        self.reader = reader
+        self.candado = threading.Lock()
+        self.carpetas = [os.path.realpath(c) for c in carpetas]
+        super().__init__(socket_path, _ManejadorOcr)
+
+    def ruta_permitida(self, ruta):
+        """Resuelve la ruta pedida (también sus enlaces simbólicos) y la devuelve si está
+        dentro de alguna de las carpetas permitidas.
+
+        Raises:
+            PermissionError: Si la ruta queda fuera de esas carpetas.
+        """
+        real = os.path.realpath(ruta)
+        if not any(os.path.commonpath([real, carpeta]) == carpeta for carpeta in self.carpetas):
+            raise PermissionError("La imagen no está en una carpeta de imágenes de la aplicación.")
+        return real
+
+def servir(socket_path, carpetas=None):
+    """Carga el modelo de OCR y atiende peticiones en el socket indicado hasta ser detenido.
+
+    Args:
+        socket_path (str): Ruta del socket Unix donde escuchar.
+        carpetas (list | None): Carpetas desde las que se aceptan imágenes por ruta; por
+            defecto OCR_SPOOL_FOLDER y UPLOAD_FOLDER de la aplicación actual.
+    """
+    carpetas = carpetas or [current_app.config['OCR_SPOOL_FOLDER'], current_app.config['UPLOAD_FOLDER']]
+    reader = get_reader()
+    # Un socket huérfano de una ejecución anterior impediría el 'bind'.
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    servidor = ServidorOcr(socket_path, reader, carpetas)
+    # Solo el usuario del servidor (y su grupo) pueden enviar imágenes al socket.
+    os.chmod(socket_path, 0o660)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,151 @@
+# project/ocr_worker.py
+"""Procesos trabajadores que consumen la cola de OCR asíncrona.
+
+La cola vive en la tabla 'ocr_jobs' de la misma base de datos de la aplicación,
+por lo que varios workers web (Gunicorn, Passenger) pueden encolar trabajos y
+varios procesos de OCR pueden consumirlos sin servicios externos. Cada trabajo
+se reclama con un UPDATE condicional sobre su estado, de modo que dos procesos
+nunca procesan el mismo trabajo.
+
+Se inicia con el comando de terminal 'flask ocr-worker' definido en run.py.
+"""
+import os
+import time
+import socket
+import multiprocessing
+from datetime import timedelta
+from flask import current_app
+from . import db, create_app, motor_bd
+from .models import OcrJob, _ahora
+from .ocr import get_reader
+from .ocr_cache import extraer_con_cache, hash_archivo
+
+def reencolar_trabajos_abandonados():
+    """Devuelve a la cola los trabajos cuyo trabajador murió a mitad de proceso.
+
+    Un trabajo que lleva más de OCR_JOB_TIMEOUT segundos en estado 'procesando'
+    se vuelve a marcar como 'pendiente', salvo que ya haya agotado sus intentos,
+    en cuyo caso se marca como 'error'.
+
+    Returns:
+        int: La cantidad de trabajos reencolados o marcados como fallidos.
+    """
+    limite = _ahora() - timedelta(seconds=current_app.config['OCR_JOB_TIMEOUT'])
+    max_intentos = current_app.config['OCR_JOB_MAX_INTENTOS']
+    base = db.update(OcrJob).where(OcrJob.estado == 'procesando', OcrJob.iniciado_en < limite).execution_options(synchronize_session=False)
+    fallidos = db.session.execute(base.where(OcrJob.intentos >= max_intentos).values(estado='error', error='Se agotaron los intentos de procesamiento.', finalizado_en=_ahora())).rowcount
+    reencolados = db.session.execute(base.where(OcrJob.intentos < max_intentos).values(estado='pendiente', worker=None)).rowcount
+    db.session.commit()
+    return fallidos + reencolados
+
+def reclamar_trabajo(worker_id):
+    """Reclama de forma atómica el trabajo pendiente más antiguo de la cola.
+
+    Args:
+        worker_id (str): Identificador del proceso que reclama el trabajo.
+
+    Returns:
+        OcrJob | None: El trabajo reclamado o None si la cola está vacía.
+    """
+    while True:
+        job_id = db.session.execute(db.select(OcrJob.id).filter_by(estado='pendiente').order_by(OcrJob.id).limit(1)).scalar_one_or_none()
+        if job_id is None:
+            db.session.rollback()
+            return None
+        # El UPDATE solo afecta la fila si sigue pendiente; si otro proceso la tomó
+        # primero, 'rowcount' será 0 y se intenta con el siguiente trabajo.
+        reclamo = db.update(OcrJob).where(OcrJob.id == job_id, OcrJob.estado == 'pendiente').values(
+            estado='procesando', worker=worker_id, iniciado_en=_ahora(), intentos=OcrJob.intentos + 1
+        ).execution_options(synchronize_session=False)
+        reclamado = db.session.execute(reclamo).rowcount == 1
+        db.session.commit()
+        if reclamado:
+            return db.session.get(OcrJob, job_id)
+
+def procesar_trabajo(job):
+    """Ejecuta el OCR de un trabajo reclamado y guarda el resultado.
+
+    La imagen temporal se elimina de la carpeta de cola una vez procesada,
+    tanto si el OCR tuvo éxito como si falló.
+    """
+    ruta = os.path.join(current_app.config['OCR_SPOOL_FOLDER'], job.imagen_path)
+    try:
+        job.fecha, job.monto, _ = extraer_con_cache(ruta, hash_archivo(ruta))
+        job.estado = 'completado'
+    except Exception as e:
+        current_app.logger.exception("Error al procesar el trabajo de OCR %s", job.id)
+        job.estado = 'error'
+        job.error = str(e)[:500]
+    job.finalizado_en = _ahora()
+    db.session.commit()
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+def bucle_trabajador(config_class_name, max_trabajos=None):
+    """Bucle principal de un proceso trabajador de OCR.
+
+    Crea su propia instancia de la aplicación (y por lo tanto su propia conexión
+    a la base de datos) y procesa trabajos hasta ser detenido.
+
+    Args:
+        config_class_name (str): Clase de configuración a usar en create_app.
+        max_trabajos (int | None): Si se indica, el proceso termina tras procesar
+                                   esa cantidad de trabajos (útil para reciclar memoria).
+    """
+    app = create_app(config_class_name)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    procesados = 0
+    with app.app_context():
+        intervalo = app.config['OCR_WORKER_POLL_INTERVAL']
+        # Sin servidor de OCR compartido, el modelo se carga antes de reclamar trabajos
+        # para que la latencia del primer trabajo no incluya la carga de torch.
+        if not app.config['OCR_SERVER_SOCKET']:
+            get_reader()
+        app.logger.info("Trabajador de OCR %s iniciado", worker_id)
+        while max_trabajos is None or procesados < max_trabajos:
+            # Reclamar y procesar leen y luego escriben: en SQLite sus transacciones
+            # deben tomar el bloqueo de escritura al empezar (ver motor_bd.py).
+            with motor_bd.escritura():
+                job = reclamar_trabajo(worker_id)
+            if job is None:
+                reencolar_trabajos_abandonados()
+                time.sleep(intervalo)
+                continue
+            with motor_bd.escritura():
+                procesar_trabajo(job)
+            procesados += 1
+
+def iniciar_pool(config_class_name, procesos=1, max_trabajos=None):
+    """Inicia un conjunto de procesos trabajadores y espera a que terminen.
+
+    Se usa el método 'spawn' para que cada proceso cargue el modelo de OCR por su
+    cuenta, evitando compartir hilos internos de torch a través de un 'fork'.
+    Los procesos que terminan (por ejemplo, al alcanzar max_trabajos) se reemplazan.
+
+    Args:
+        config_class_name (str): Clase de configuración a usar en cada proceso.
+        procesos (int): Número de procesos trabajadores.
+        max_trabajos (int | None): Trabajos a procesar por cada proceso antes de reciclarse.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    def lanzar():
+        proceso = ctx.Process(target=bucle_trabajador, args=(config_class_name, max_trabajos), daemon=True)
+        proceso.start()
+        return proceso
+
+    pool = [lanzar() for _ in range(procesos)]
+    try:
+        while True:
+            for i, proceso in enumerate(pool):
+                proceso.join(timeout=1)
+                if not proceso.is_alive():
+                    pool[i] = lanzar()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proceso in pool:
+            proceso.terminate()
+        for proceso in pool:
+            proceso.join()
@@ -0,0 +1,157 @@
+# project/preprocesamiento.py
+"""Preprocesamiento de imágenes de boletas antes de ejecutar el OCR.
+
+El tiempo de detección de EasyOCR crece con la cantidad de píxeles, y una foto de
+12 megapíxeles de una boleta térmica angosta es casi toda fondo. Las etapas de
+este módulo reducen la imagen a lo que importa antes de la detección:
+
+1. 'exif':      corrige la orientación según la etiqueta EXIF de la cámara.
+2. 'escalar':   reduce la imagen hasta que su lado mayor mida OCR_LADO_MAXIMO.
+3. 'grises':    convierte a escala de grises (EasyOCR trabaja en grises igualmente).
+4. 'recortar':  recorta la región clara del papel, descartando el fondo.
+5. 'enderezar': corrige una rotación leve del texto (opcional, usa OpenCV).
+6. 'binarizar': umbral adaptativo a blanco y negro (opcional, usa OpenCV).
+
+Cada etapa se activa en 'Config' y se mide por separado, lo que permite compararlas
+con benchmarks/preprocesamiento_ocr.py.
+"""
+import io
+import time
+import numpy as np
+from PIL import Image, ImageOps
+
+ETAPAS = ('exif', 'escalar', 'grises', 'recortar', 'enderezar', 'binarizar')
+
+# Variables de configuración que activan cada etapa.
+_CLAVES_CONFIG = {
+    'exif': 'OCR_PRE_EXIF',
+    'escalar': 'OCR_PRE_ESCALAR',
+    'grises': 'OCR_PRE_GRISES',
+    'recortar': 'OCR_PRE_RECORTAR',
+    'enderezar': 'OCR_PRE_ENDEREZAR',
+    'binarizar': 'OCR_PRE_BINARIZAR',
+}
+
+def opciones_desde_config(config):
+    """Lee de la configuración de la app qué etapas aplicar y sus parámetros."""
+    return {
+        'activo': config['OCR_PREPROCESO_ACTIVO'],
+        'etapas': [etapa for etapa in ETAPAS if config[_CLAVES_CONFIG[etapa]]],
+        'lado_maximo': config['OCR_LADO_MAXIMO'],
+    }
+
+def _abrir(imagen):
+    """Abre una imagen desde bytes, una ruta o un arreglo de NumPy."""
+    if isinstance(imagen, np.ndarray):
+        return Image.fromarray(imagen)
+    if isinstance(imagen, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(imagen))
+    return Image.open(imagen)
+
+def _umbral_otsu(gris):
+    """Calcula el umbral de Otsu de una imagen en escala de grises (arreglo uint8)."""
+    histograma = np.bincount(gris.ravel(), minlength=256).astype(np.float64)
+    total = gris.size
+    suma_total = np.dot(np.arange(256), histograma)
+    peso_fondo = np.cumsum(histograma)
+    suma_fondo = np.cumsum(np.arange(256) * histograma)
+    peso_frente = total - peso_fondo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media_fondo = suma_fondo / peso_fondo
+        media_frente = (suma_total - suma_fondo) / peso_frente
+        varianza = peso_fondo * peso_frente * (media_fondo - media_frente) ** 2
+    return int(np.nanargmax(varianza))
+
+def recortar_papel(gris, margen=0.02, fraccion_minima=0.2):
+    """Recorta la región clara (el papel de la boleta) de una imagen en grises.
+
+    Se consideran parte del papel las filas y columnas donde predominan los píxeles
+    más claros que el umbral de Otsu. Si la región resultante es muy pequeña, se
+    asume que la detección falló y se devuelve la imagen sin recortar.
+    """
+    claro = gris > _umbral_otsu(gris)
+    filas = np.flatnonzero(claro.mean(axis=1) > 0.5)
+    columnas = np.flatnonzero(claro.mean(axis=0) > 0.5)
+    if filas.size == 0 or columnas.size == 0:
+        return gris
+    alto, ancho = gris.shape
+    y0, y1 = filas[0], filas[-1] + 1
+    x0, x1 = columnas[0], columnas[-1] + 1
+    if (y1 - y0) * (x1 - x0) < fraccion_minima * alto * ancho:
+        return gris
+    my, mx = int(alto * margen), int(ancho * margen)
+    return gris[max(0, y0 - my):min(alto, y1 + my), max(0, x0 - mx):min(ancho, x1 + mx)]
+
+def enderezar(gris, angulo_maximo=15):
+    """Corrige la inclinación del texto estimando el ángulo del rectángulo que lo contiene."""
+    import cv2
+    tinta = np.column_stack(np.where(gris < _umbral_otsu(gris)))
+    if len(tinta) < 50:
+        return gris
+    angulo = cv2.minAreaRect(tinta[:, ::-1].astype(np.float32))[-1]
+    # OpenCV devuelve el ángulo en (0, 90]; se lleva al rango (-45, 45].
+    if angulo > 45:
+        angulo -= 90
+    if abs(angulo) < 0.5 or abs(angulo) > angulo_maximo:
+        return gris
+    alto, ancho = gris.shape
+    matriz = cv2.getRotationMatrix2D((ancho / 2, alto / 2), angulo, 1.0)
+    return cv2.warpAffine(gris, matriz, (ancho, alto), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def binarizar(gris):
+    """Convierte a blanco y negro con un umbral adaptativo, útil con iluminación despareja."""
+    import cv2
+    return cv2.adaptiveThreshold(gris, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+
+def preprocesar(imagen, etapas, lado_maximo=1600):
+    """Aplica las etapas indicadas y devuelve la imagen lista para EasyOCR.
+
+    Args:
+        imagen (bytes | str | numpy.ndarray): La imagen original.
+        etapas (list): Nombres de las etapas a aplicar, en el orden de ETAPAS.
+        lado_maximo (int): Lado mayor, en píxeles, para la etapa 'escalar'.
+
+    Returns:
+        tuple: (arreglo de NumPy uint8 en RGB o en grises, dict etapa -> segundos).
+    """
+    tiempos = {}
+    inicio = time.perf_counter()
+    pil = _abrir(imagen)
+    # 'draft' permite a Pillow decodificar un JPEG directamente a una escala menor.
+    if 'escalar' in etapas and pil.format == 'JPEG':
+        pil.draft('RGB', (lado_maximo, lado_maximo))
+    pil.load()
+    tiempos['decodificar'] = time.perf_counter() - inicio
+
+    def medir(nombre, funcion, valor):
+        t = time.perf_counter()
+        resultado = funcion(valor)
+        tiempos[nombre] = time.perf_counter() - t
+        return resultado
+
+    if 'exif' in etapas:
+        pil = medir('exif', ImageOps.exif_transpose, pil)
+    if 'escalar' in etapas:
+        def escalar(p):
+            p = p.copy()
+            p.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+            return p
+        pil = medir('escalar', escalar, pil)
+    if 'grises' in etapas or {'recortar', 'enderezar', 'binarizar'} & set(etapas):
+        # Recortar, enderezar y binarizar trabajan sobre la imagen en grises.
+        arreglo = medir('grises', lambda p: np.asarray(p.convert('L')), pil)
+    else:
+        arreglo = np.asarray(pil.convert('RGB'))
+    if 'recortar' in etapas:
+        arreglo = medir('recortar', recortar_papel, arreglo)
+    if 'enderezar' in etapas:
+        arreglo = medir('enderezar', enderezar, arreglo)
+    if 'binarizar' in etapas:
+        arreglo = medir('binarizar', binarizar, arreglo)
+    return np.ascontiguousarray(arreglo), tiempos
+
+def a_png(arreglo):
+    """Codifica un arreglo de NumPy como PNG (para enviarlo al servidor de OCR)."""
+    buffer = io.BytesIO()
+    Image.fromarray(arreglo).save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
@@ -0,0 +1,227 @@
+# project/reproceso_ocr.py
+"""Vuelve a extraer la fecha y el monto de imágenes ya leídas, sin repetir la inferencia.
+
+La tabla 'ocr_lecturas' guarda la salida cruda de EasyOCR (cajas, textos y
+confianzas) de cada imagen, y nunca pierde filas (la caché de OCR solo apunta a
+ella). Cuando cambian las reglas de 'parse_ocr_text' basta con volver a analizar
+ese texto guardado, lo que toma milisegundos por boleta en lugar de segundos. Este
+módulo, usado por el comando 'flask reparse-ocr':
+
+* recorre las lecturas por bloques y las analiza en varios procesos, informando
+  las que cambian de fecha o monto. Si se pide, guarda el cambio en la lectura y
+  en las boletas que tomaron sus datos de ella sin modificarlos (ver '_aplicar');
+  las corregidas a mano no se tocan;
+* busca las imágenes de boletas que nunca pasaron por el OCR y las lee en un pool
+  de procesos. Cada lectura se guarda apenas termina, así que una ejecución
+  interrumpida continúa donde quedó.
+"""
+import os
+import json
+import multiprocessing
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from sqlalchemy import or_
+from . import db, motor_bd, ocr_cache, resumen, versiones
+from .models import Boleta, OcrLectura, convertir_fecha
+from .almacenamiento import hash_de_ruta, ruta_para_hash
+from .ocr_cache import hash_archivo
+
+Diferencia = namedtuple('Diferencia', ['sha256', 'fecha_guardada', 'monto_guardado', 'fecha_nueva', 'monto_nuevo'])
+
+# Filas que se envían juntas a cada proceso; amortiza el costo de serializarlas.
+FILAS_POR_BLOQUE = 500
+
+def _analizar_bloque(filas, modo):
+    """Analiza un bloque de resultados guardados. Se ejecuta en un proceso del pool.
+
+    Args:
+        filas (list): Tuplas (sha256, resultado_json, fecha, monto) tal como están en 'ocr_lecturas'.
+        modo (str): El OCR_MODO con que se interpreta el resultado.
+
+    Returns:
+        list: Las Diferencia de las filas cuyo resultado cambió.
+    """
+    from .ocr import parse_ocr_text, textos_de
+    from .ocr_anclado import extraer_anclado
+    diferencias = []
+    for sha256, resultado_json, fecha, monto in filas:
+        resultado = json.loads(resultado_json)
+        fecha_nueva, monto_nuevo = extraer_anclado(resultado) if modo == 'anclado' else parse_ocr_text(textos_de(resultado))
+        monto_nuevo = monto_nuevo or 0
+        if (fecha_nueva, monto_nuevo) != (fecha, monto):
+            diferencias.append(Diferencia(sha256, fecha, monto, fecha_nueva, monto_nuevo))
+    return diferencias
+
+def _bloques_guardados(tamano):
+    """Lee la tabla 'ocr_lecturas' por bloques, paginando por la clave primaria."""
+    ultimo = ''
+    while True:
+        filas = db.session.execute(
+            db.select(OcrLectura.sha256, OcrLectura.resultado_json, OcrLectura.fecha, OcrLectura.monto)
+            .where(OcrLectura.sha256 > ultimo).order_by(OcrLectura.sha256).limit(tamano)
+        ).all()
+        db.session.rollback()
+        if not filas:
+            return
+        ultimo = filas[-1][0]
+        yield [tuple(fila) for fila in filas]
+
+def contar_guardados():
+    """Devuelve la cantidad de lecturas de OCR guardadas."""
+    return db.session.execute(db.select(db.func.count()).select_from(OcrLectura)).scalar_one()
+
+def reanalizar(procesos=None, aplicar=False, tamano_bloque=FILAS_POR_BLOQUE):
+    """Vuelve a analizar todas las lecturas guardadas en un pool de procesos.
+
+    Como máximo hay dos bloques por proceso en vuelo, para no cargar la tabla
+    completa en memoria.
+
+    Args:
+        procesos (int | None): Procesos del pool; por defecto, uno por CPU.
+        aplicar (bool): Si es True, guarda la nueva fecha y monto de las lecturas que
+            cambian y de sus boletas (ver '_aplicar').
+        tamano_bloque (int): Filas por bloque.
+
+    Yields:
+        tuple: (filas_del_bloque, diferencias_del_bloque, boletas_actualizadas), a medida
+            que termina cada bloque.
+    """
+    modo = current_app.config['OCR_MODO']
+    procesos = procesos or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        en_vuelo = deque()
+        for bloque in _bloques_guardados(tamano_bloque):
+            en_vuelo.append((len(bloque), pool.submit(_analizar_bloque, bloque, modo)))
+            if len(en_vuelo) >= 2 * procesos:
+                yield _recibir(en_vuelo.popleft(), aplicar)
+        while en_vuelo:
+            yield _recibir(en_vuelo.popleft(), aplicar)
+
+def _recibir(pendiente, aplicar):
+    """Espera el resultado de un bloque y, si corresponde, guarda sus cambios."""
+    cantidad, futuro = pendiente
+    diferencias = futuro.result()
+    actualizadas = _aplicar(diferencias) if aplicar and diferencias else 0
+    return cantidad, diferencias, actualizadas
+
+def _boletas_de_lectura(d):
+    """Boletas cuyos datos son los que sugirió la lectura 'd' y que el usuario no modificó.
+
+    Deben usar la imagen (guardada por contenido), no estar eliminadas, no tener
+    razón de modificación (el formulario la indica cuando el usuario cambia lo que
+    sugirió el OCR o la lectura falla) y conservar la fecha y el monto anteriores.
+    """
+    try: fecha = convertir_fecha(d.fecha_guardada or '')
+    except ValueError: return []
+    return db.session.execute(db.select(Boleta).where(
+        Boleta.imagen_url.startswith(ruta_para_hash(d.sha256)), Boleta.is_deleted == False,
+        or_(Boleta.razon_modificacion.is_(None), Boleta.razon_modificacion == ''),
+        Boleta.fecha == fecha, Boleta.monto_total == d.monto_guardado,
+    )).scalars().all()
+
+def _aplicar(diferencias):
+    """Guarda la nueva fecha y monto de las lecturas y de las boletas que los tomaron de ellas.
+
+    Las boletas solo cambian si la nueva lectura tiene fecha y monto válidos. Se
+    ajustan el resumen mensual y la versión de las boletas de cada usuario.
+
+    Returns:
+        int: La cantidad de boletas actualizadas.
+    """
+    actualizadas = 0
+    with motor_bd.escritura():
+        db.session.execute(db.update(OcrLectura), [{"sha256": d.sha256, "fecha": d.fecha_nueva, "monto": d.monto_nuevo} for d in diferencias])
+        for d in diferencias:
+            try: fecha_nueva = convertir_fecha(d.fecha_nueva or '')
+            except ValueError: continue
+            if not d.monto_nuevo:
+                continue
+            for boleta in _boletas_de_lectura(d):
+                antes = resumen.clave_boleta(boleta)
+                boleta.fecha, boleta.monto_total = fecha_nueva, d.monto_nuevo
+                resumen.actualizar_por_cambio(antes, resumen.clave_boleta(boleta))
+                versiones.boletas_modificadas(boleta.user_id)
+                actualizadas += 1
+        db.session.commit()
+    return actualizadas
+
+def imagenes_sin_resultado():
+    """Busca las imágenes de boletas que no tienen una lectura de OCR guardada.
+
+    El hash de las imágenes guardadas por contenido se toma de su nombre; el de las
+    antiguas (sin migrar) se calcula leyendo el archivo.
+
+    Returns:
+        tuple: (pendientes, faltantes). 'pendientes' es una lista de tuplas
+               (sha256, ruta_absoluta) sin repetir contenido; 'faltantes' son los
+               'imagen_url' cuyo archivo no existe.
+    """
+    carpeta = current_app.config['UPLOAD_FOLDER']
+    nombres = db.session.execute(db.select(Boleta.imagen_url).filter(Boleta.imagen_url.isnot(None)).distinct()).scalars().all()
+    por_hash, faltantes = {}, []
+    for nombre in nombres:
+        ruta = os.path.join(carpeta, nombre)
+        if not os.path.isfile(ruta):
+            faltantes.append(nombre)
+            continue
+        sha256 = hash_de_ruta(nombre) or hash_archivo(ruta)
+        por_hash.setdefault(sha256, ruta)
+    hashes = list(por_hash)
+    for i in range(0, len(hashes), FILAS_POR_BLOQUE):
+        guardados = db.session.execute(db.select(OcrLectura.sha256).where(OcrLectura.sha256.in_(hashes[i:i + FILAS_POR_BLOQUE]))).scalars()
+        for sha256 in guardados:
+            del por_hash[sha256]
+    return sorted(por_hash.items()), faltantes
+
+# Contexto de aplicación de cada proceso del pool de relectura; vive lo mismo que el proceso.
+_contexto_proceso = None
+
+def _iniciar_proceso_lectura(config_class_name):
+    """Prepara un proceso del pool de relectura: crea la aplicación y carga el modelo."""
+    global _contexto_proceso
+    from . import create_app
+    from .ocr import get_reader
+    app = create_app(config_class_name)
+    _contexto_proceso = app.app_context()
+    _contexto_proceso.push()
+    if not app.config['OCR_SERVER_SOCKET']:
+        get_reader()
+
+def _leer_imagen(pendiente):
+    """Ejecuta el OCR de una imagen en un proceso del pool.
+
+    Returns:
+        tuple: (sha256, resultado, fecha, monto, error). Si la lectura falla, solo
+               'sha256' y 'error' tienen valor.
+    """
+    from .ocr import reconocer, extraer_datos
+    sha256, ruta = pendiente
+    try:
+        resultado = reconocer(ruta)
+    except Exception as e:
+        return sha256, None, None, 0, str(e)
+    fecha, monto = extraer_datos(resultado)
+    return sha256, resultado, fecha, monto, None
+
+def releer(pendientes, config_class_name, procesos=1):
+    """Lee con OCR las imágenes pendientes en un pool de procesos y guarda cada lectura.
+
+    Cada lectura se confirma por separado en 'ocr_lecturas', sin agregarla a la
+    caché, para que una interrupción no pierda lo ya leído: la siguiente ejecución
+    de 'imagenes_sin_resultado' ya no incluirá esas imágenes.
+
+    Args:
+        pendientes (list): Tuplas (sha256, ruta_absoluta) de 'imagenes_sin_resultado'.
+        config_class_name (str): Clase de configuración que usa cada proceso.
+        procesos (int): Procesos del pool; cada uno carga su propia copia del modelo.
+
+    Yields:
+        tuple: (sha256, error) por cada imagen terminada, en el orden en que terminan.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes=procesos, initializer=_iniciar_proceso_lectura, initargs=(config_class_name,)) as pool:
+        for sha256, resultado, fecha, monto, error in pool.imap_unordered(_leer_imagen, pendientes):
+            if error is None:
+                ocr_cache.guardar(sha256, resultado, fecha, monto, en_cache=False)
+            yield sha256, error
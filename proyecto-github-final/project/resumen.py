@@ -0,0 +1,115 @@
+# project/resumen.py
+"""Mantenimiento de la tabla de resumen mensual ('resumen_mensual').
+
+Las rutas que crean, modifican o eliminan boletas llaman a estas funciones antes
+de su 'commit', por lo que el resumen y las boletas se guardan en la misma
+transacción. También se incluyen la reconstrucción completa y la verificación
+contra la tabla de boletas que usa el comando 'flask rebuild-resumen'.
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from . import db
+from .models import Boleta, ResumenMensual
+
+def mes_de(fecha):
+    """Devuelve el mes (AAAA-MM) de una fecha, ya sea texto 'AAAA-MM-DD' o un objeto date."""
+    return str(fecha)[:7]
+
+def aplicar_delta(user_id, categoria_id, mes, cantidad, suma):
+    """Suma 'cantidad' y 'suma' (que pueden ser negativas) al grupo indicado.
+
+    Usa un 'upsert' atómico del motor de base de datos para que dos peticiones
+    simultáneas que crean el mismo grupo no choquen entre sí.
+    """
+    valores = {"user_id": user_id, "categoria_id": categoria_id, "mes": mes, "cantidad": cantidad, "suma": suma}
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == 'sqlite':
+        stmt = sqlite_insert(ResumenMensual).values(**valores)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'categoria_id', 'mes'],
+            set_={"cantidad": ResumenMensual.cantidad + stmt.excluded.cantidad, "suma": ResumenMensual.suma + stmt.excluded.suma},
+        )
+    elif dialecto in ('mysql', 'mariadb'):
+        stmt = mysql_insert(ResumenMensual).values(**valores)
+        stmt = stmt.on_duplicate_key_update(cantidad=ResumenMensual.cantidad + stmt.inserted.cantidad, suma=ResumenMensual.suma + stmt.inserted.suma)
+    else:
+        # Otros motores: actualización y, si el grupo no existía, inserción.
+        actualizados = db.session.execute(
+            db.update(ResumenMensual)
+            .where(ResumenMensual.user_id == user_id, ResumenMensual.categoria_id == categoria_id, ResumenMensual.mes == mes)
+            .values(cantidad=ResumenMensual.cantidad + cantidad, suma=ResumenMensual.suma + suma)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if actualizados:
+            return
+        stmt = db.insert(ResumenMensual).values(**valores)
+    db.session.execute(stmt)
+
+def registrar_boleta(user_id, categoria_id, fecha, monto_total, signo=1):
+    """Agrega (signo=1) o descuenta (signo=-1) una boleta de su grupo en el resumen."""
+    aplicar_delta(user_id, categoria_id, mes_de(fecha), signo, signo * monto_total)
+
+def clave_boleta(boleta):
+    """Devuelve los datos de una boleta que determinan su aporte al resumen.
+
+    Se usa para comparar el estado de una boleta antes y después de modificarla.
+    Devuelve None si la boleta está eliminada, ya que entonces no aporta nada.
+    """
+    if boleta.is_deleted:
+        return None
+    return (boleta.user_id, boleta.categoria_id, boleta.fecha, boleta.monto_total)
+
+def actualizar_por_cambio(antes, despues):
+    """Ajusta el resumen cuando una boleta pasa del estado 'antes' al estado 'despues'.
+
+    Ambos argumentos son el resultado de 'clave_boleta'. Un cambio de fecha o de
+    categoría mueve el monto entre grupos; una eliminación solo lo descuenta.
+    """
+    if antes == despues:
+        return
+    if antes is not None:
+        registrar_boleta(*antes, signo=-1)
+    if despues is not None:
+        registrar_boleta(*despues, signo=1)
+
+def _consulta_desde_boletas():
+    """Agrupa la tabla de boletas con la misma forma que la tabla de resumen."""
+    mes = func.substr(Boleta.fecha, 1, 7)
+    return db.select(
+        Boleta.user_id, Boleta.categoria_id, mes.label('mes'),
+        func.count(Boleta.id).label('cantidad'), func.sum(Boleta.monto_total).label('suma'),
+    ).filter(Boleta.is_deleted == False).group_by(Boleta.user_id, Boleta.categoria_id, mes)
+
+def reconstruir():
+    """Borra y vuelve a calcular la tabla de resumen completa a partir de las boletas.
+
+    Returns:
+        int: La cantidad de grupos generados.
+    """
+    db.session.execute(db.delete(ResumenMensual))
+    db.session.execute(
+        db.insert(ResumenMensual).from_select(['user_id', 'categoria_id', 'mes', 'cantidad', 'suma'], _consulta_desde_boletas())
+    )
+    db.session.commit()
+    return db.session.execute(db.select(func.count()).select_from(ResumenMensual)).scalar_one()
+
+def verificar():
+    """Compara la tabla de resumen con el cálculo directo sobre las boletas.
+
+    Returns:
+        list: Tuplas (user_id, categoria_id, mes, esperado, guardado) de los grupos
+              que no coinciden, donde cada valor es (cantidad, suma) o None si falta.
+    """
+    esperado = {(f.user_id, f.categoria_id, f.mes): (f.cantidad, int(f.suma)) for f in db.session.execute(_consulta_desde_boletas())}
+    guardado = {
+        (r.user_id, r.categoria_id, r.mes): (r.cantidad, r.suma)
+        for r in db.session.execute(db.select(ResumenMensual)).scalars()
+        # Los grupos que quedaron en cero tras eliminar boletas equivalen a no tener fila.
+        if r.cantidad != 0 or r.suma != 0
+    }
+    diferencias = []
+    for clave in sorted(set(esperado) | set(guardado)):
+        if esperado.get(clave) != guardado.get(clave):
+            diferencias.append((*clave, esperado.get(clave), guardado.get(clave)))
+    return diferencias
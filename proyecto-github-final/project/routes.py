@@ -6,107 +6,53 @@ Contiene la lógica para el registro, login, OCR y las operaciones
 CRUD (Crear, Leer, Actualizar, Eliminar) para las boletas, así como
 la gestión de usuarios y categorías por parte del administrador.
 """
-import re
 import os
+import json
+import math
+import base64
+import binascii
+import shutil
 import secrets
-import easyocr
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+import calendar
+import tempfile
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, send_from_directory, stream_with_context, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-from .models import User, Boleta, Categoria
-from . import db
+from sqlalchemy import func, or_, null
+from .models import User, Boleta, Categoria, OcrJob, ResumenMensual, convertir_fecha
+from .almacenamiento import es_ruta_direccionada
+from .auth import autenticar_api_key
+from .importar import importar, detectar_formato, ErrorImportacion, FORMATOS_IMPORTACION
+from .ocr import construir_respuesta_ocr
+from .subidas import ImagenRechazada
+from . import db, busqueda, exportar, metricas, miniaturas, motor_bd, ocr_cache, ocr_lote, resumen, subidas, versiones
 from functools import wraps
 
 # Crea un Blueprint, que es como una mini-aplicación para agrupar rutas.
 api_bp = Blueprint('api', __name__)
 
-# Se inicializa el lector de OCR una sola vez al cargar la aplicación para mejorar el rendimiento.
-# Se configura para español y para usar CPU.
-reader = easyocr.Reader(['es'], gpu=False)
-
-def parse_ocr_text(text_list):
-    """
-    Analiza el texto extraído de una imagen para encontrar la fecha y el monto total.
-
-    Esta función utiliza una serie de expresiones regulares y lógicas de prioridad
-    para identificar los datos más probables, manejando múltiples formatos de fecha
-    y filtrando números irrelevantes para encontrar el monto correcto.
-
-    Args:
-        text_list (list): Una lista de strings extraídos de la imagen por EasyOCR.
-
-    Returns:
-        tuple: Una tupla conteniendo la fecha (str) y el monto (int) encontrados.
-    """
-    full_text = "\n".join(text_list)
-    fecha = None
-    monto = 0
-
-    # --- LÓGICA DE FECHA UNIFICADA Y FINAL ---
-    # Se definen los patrones de fecha en orden de especificidad para probarlos secuencialmente.
-    date_patterns = [
-        # Formato largo: 4 de marzo del 2020
-        r'(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+del?\s+(\d{4})',
-        # Formato corto: 07 jul 2023
-        r'(\d{1,2})\s+(ene|feb|mar|abr|may|jun|jul|ago|sep|oct|nov|dic)\s+(\d{4})',
-        # Formato AAAA-MM-DD: 2020-09-28
-        r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})',
-        # Formato DD-MM-AAAA: 28-09-2020
-        r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})'
-    ]
-    
-    month_map_full = {'enero':'01','febrero':'02','marzo':'03','abril':'04','mayo':'05','junio':'06','julio':'07','agosto':'08','septiembre':'09','octubre':'10','noviembre':'11','diciembre':'12'}
-    month_map_short = {'ene':'01','feb':'02','mar':'03','abr':'04','may':'05','jun':'06','jul':'07','ago':'08','sep':'09','oct':'10','nov':'11','dic':'12'}
-
-    for i, pattern in enumerate(date_patterns):
-        match = re.search(pattern, full_text, re.IGNORECASE)
-        if match:
-            groups = match.groups()
-            try:
-                # Se normaliza la fecha encontrada al formato AAAA-MM-DD
-                if i == 0: day, month_text, year = groups; month = month_map_full.get(month_text.lower()); fecha = f"{year}-{month}-{day.zfill(2)}"
-                elif i == 1: day, month_text, year = groups; month = month_map_short.get(month_text.lower()); fecha = f"{year}-{month}-{day.zfill(2)}"
-                elif i == 2: year, month, day = groups; fecha = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                elif i == 3: day, month, year = groups; fecha = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                if fecha:
-                    break # Si se encuentra y procesa una fecha, se detiene la búsqueda
-            except:
-                continue # Si hay un error de formato, se prueba el siguiente patrón
-
-    # --- LÓGICA DE MONTO FINAL: EL NÚMERO MÁS GRANDE ES EL TOTAL ---
-    # Patrón para encontrar todos los números con formato de miles (ej. 1.234) o simples (ej. 238)
-    amount_pattern = r'(\d{1,3}(?:[.,]\d{3})*)'
-    
-    amounts = re.findall(amount_pattern, full_text)
-    
-    if amounts:
-        cleaned_amounts = []
-        for a in amounts:
-            num_str = a.replace('.', '').replace(',', '').replace(' ', '')
-            # Filtro de seguridad: ignorar números muy largos (RUTs) o cortos (cantidades)
-            if num_str.isdigit() and len(num_str) < 8 and len(num_str) > 2:
-                cleaned_amounts.append(int(num_str))
-        
-        if cleaned_amounts:
-            # Se elige el número más alto de la lista filtrada
-            monto = max(cleaned_amounts)
-
-    return fecha, monto
-
 def api_key_required(fn):
     """Decorador personalizado para proteger rutas con una API Key.
 
     Verifica la presencia y validez de la cabecera 'X-Api-Key' en la petición.
-    Si es válida, pasa el objeto 'User' correspondiente a la ruta.
+    Si es válida, pasa a la ruta un 'Principal' (id, username, role) del usuario,
+    resuelto normalmente desde la caché de auth.py sin consultar la base de datos.
     """
     @wraps(fn)
     def decorated_function(*args, **kwargs):
         api_key = request.headers.get('X-Api-Key')
         if not api_key: return jsonify({"msg": "Falta la cabecera X-Api-Key"}), 401
-        user = db.session.execute(db.select(User).filter_by(api_key=api_key)).scalar_one_or_none()
+        user = autenticar_api_key(api_key)
         if not user: return jsonify({"msg": "API Key inválida"}), 401
         return fn(current_user=user, *args, **kwargs)
     return decorated_function
 
+@api_bp.errorhandler(RequestEntityTooLarge)
+def peticion_demasiado_grande(e):
+    """Responde en JSON cuando la petición supera su límite (MAX_CONTENT_LENGTH o el de subidas.preparar)."""
+    maximo = request.max_content_length / (1024 * 1024)
+    return jsonify({"msg": f"La petición supera el máximo de {maximo:.1f} MB."}), 413
+
 # --- Rutas de Autenticación y Usuarios ---
 
 @api_bp.route('/register', methods=['POST'])
@@ -114,12 +60,14 @@ def register():
     """Registra un nuevo usuario. El primer usuario registrado es un administrador."""
     data = request.get_json()
     if not data or not data.get('username') or not data.get('password'): return jsonify({"msg": "Faltan campos requeridos"}), 400
+    # El hash de la contraseña se calcula antes de consultar la base, para no tener
+    # tomado el bloqueo de escritura de SQLite mientras tanto (ver motor_bd.py).
+    user = User(username=data['username'])
+    with metricas.medir('hash_clave'):
+        user.set_password(data['password'])
     if db.session.execute(db.select(User).filter_by(username=data['username'])).scalar_one_or_none(): return jsonify({"msg": "El nombre de usuario ya existe"}), 409
     
     is_first_user = db.session.execute(db.select(User)).first() is None
-    user = User(username=data['username'])
-    user.set_password(data['password'])
-    user.generate_api_key()
     if is_first_user: user.role = 'admin'
     
     db.session.add(user)
@@ -129,11 +77,28 @@ def register():
 
 @api_bp.route('/login', methods=['POST'])
 def login():
-    """Autentica a un usuario y devuelve su API Key y rol."""
+    """Autentica a un usuario y devuelve una nueva API Key y su rol.
+
+    Como solo se guarda el hash de la clave, no se puede devolver una entregada antes:
+    cada inicio de sesión genera una clave nueva y conserva las anteriores (las de
+    otros dispositivos), hasta API_KEYS_POR_USUARIO. Con '"rotar": true' en el cuerpo
+    se revocan todas las demás.
+    """
     data = request.get_json()
     user = db.session.execute(db.select(User).filter_by(username=data['username'])).scalar_one_or_none()
-    if user and user.check_password(data['password']):
-        return jsonify(api_key=user.api_key, role=user.role)
+    # La contraseña se verifica (scrypt) fuera de la transacción, sin el bloqueo de
+    # escritura de SQLite tomado; el usuario queda desconectado con sus datos cargados.
+    if user is not None:
+        db.session.expunge(user)
+    motor_bd.terminar_lectura()
+    with metricas.medir('hash_clave'):
+        clave_correcta = user is not None and user.check_password(data['password'])
+    if clave_correcta:
+        db.session.add(user)
+        api_key = user.generate_api_key(rotar=bool(data.get('rotar')), maximo=current_app.config['API_KEYS_POR_USUARIO'])
+        role = user.role
+        db.session.commit()
+        return jsonify(api_key=api_key, role=role)
     return jsonify({"msg": "Credenciales incorrectas"}), 401
 
 @api_bp.route('/users', methods=['POST'])
@@ -146,10 +111,10 @@ def create_user_by_admin(current_user):
     password = data.get('password')
     role = 'admin' if data.get('is_admin') else 'user'
     if not username or not password: return jsonify({"msg": "Faltan campos requeridos"}), 400
-    if db.session.execute(db.select(User).filter_by(username=username)).scalar_one_or_none(): return jsonify({"msg": "El nombre de usuario ya existe"}), 409
     user = User(username=username, role=role)
-    user.set_password(password)
-    user.generate_api_key()
+    with metricas.medir('hash_clave'):
+        user.set_password(password)
+    if db.session.execute(db.select(User).filter_by(username=username)).scalar_one_or_none(): return jsonify({"msg": "El nombre de usuario ya existe"}), 409
     db.session.add(user)
     db.session.commit()
     return jsonify({"msg": f"Usuario '{username}' creado con rol '{role}'."}), 201
@@ -160,74 +125,288 @@ def create_user_by_admin(current_user):
 @api_key_required
 def create_boleta(current_user):
     """Crea una nueva boleta a partir de datos de formulario y una imagen."""
+    subidas.preparar(current_app.config['UPLOAD_FOLDER'])
     fecha = request.form.get('fecha')
     monto_total = request.form.get('monto_total')
     categoria_id = request.form.get('categoria_id')
     razon_modificacion = request.form.get('razon_modificacion')
     if not fecha or not monto_total or not categoria_id: return jsonify({"msg": "Los campos fecha, monto y categoría son obligatorios."}), 400
+    try: fecha = convertir_fecha(fecha)
+    except ValueError as e: return jsonify({"msg": str(e)}), 400
     try: monto_procesado = int(float(monto_total))
-    except (ValueError, TypeError): return jsonify({"msg": "El monto total debe ser un número válido."}), 400
+    except (ValueError, TypeError, OverflowError): return jsonify({"msg": "El monto total debe ser un número válido."}), 400
     
     imagen_nombre_archivo = None
     if 'boleta_image' in request.files:
         file = request.files['boleta_image']
         if file and file.filename != '':
-            filename = secure_filename(file.filename)
-            unique_filename = f"{secrets.token_hex(8)}_{filename}"
-            save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-            os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
-            file.save(save_path)
-            imagen_nombre_archivo = unique_filename
+            # La imagen se guarda bajo su hash; si ya existía, se reutiliza el mismo archivo.
+            try:
+                with metricas.medir('guardar_archivo'):
+                    imagen_nombre_archivo = subidas.guardar_imagen(file)
+            except ImagenRechazada as e: return jsonify({"msg": str(e)}), e.estado
+            if current_app.config['THUMBNAILS_AL_SUBIR']:
+                try: miniaturas.generar_todas(imagen_nombre_archivo)
+                except Exception: current_app.logger.warning("No se pudieron generar las miniaturas de %s", imagen_nombre_archivo, exc_info=True)
 
     new_boleta = Boleta(fecha=fecha, monto_total=monto_procesado, categoria_id=int(categoria_id), notas=request.form.get('notas'), razon_modificacion=razon_modificacion, imagen_url=imagen_nombre_archivo, user_id=current_user.id)
     db.session.add(new_boleta)
+    resumen.registrar_boleta(current_user.id, int(categoria_id), fecha, monto_procesado)
+    versiones.boletas_modificadas(current_user.id)
+    # Se toma el id tras el 'flush' para no recargar el objeto expirado después del commit.
+    db.session.flush()
+    boleta_id = new_boleta.id
+    busqueda.indexar_boleta(boleta_id)
     db.session.commit()
-    return jsonify(new_boleta.to_dict()), 201
+    return jsonify(Boleta.obtener_dict(boleta_id)), 201
+
+def fechas_de_filtro(args):
+    """Lee los filtros 'fecha_inicio' y 'fecha_fin' de la petición como objetos date.
+
+    Returns:
+        tuple: (fecha_inicio, fecha_fin), cada una None si no se indicó.
+
+    Raises:
+        ValueError: Si alguna no es una fecha AAAA-MM-DD.
+    """
+    fecha_inicio = args.get('fecha_inicio', None, type=str)
+    fecha_fin = args.get('fecha_fin', None, type=str)
+    return (convertir_fecha(fecha_inicio) if fecha_inicio else None, convertir_fecha(fecha_fin) if fecha_fin else None)
+
+def filtrar_boletas(query, current_user, args):
+    """Aplica a una consulta de boletas los filtros de la petición y la visibilidad del usuario.
+
+    La consulta debe incluir ya los JOIN con User y Categoria (ver 'Boleta.select_serializado').
+    Los usuarios normales solo ven sus propias boletas no eliminadas.
+
+    Raises:
+        ValueError: Si 'fecha_inicio' o 'fecha_fin' no son fechas AAAA-MM-DD.
+    """
+    creador_username = args.get('creador', None, type=str)
+    fecha_inicio, fecha_fin = fechas_de_filtro(args)
+    categoria_nombre = args.get('categoria', None, type=str)
+    razon = args.get('razon', None, type=str)
+    
+    if creador_username: query = query.filter(User.username.ilike(f"%{creador_username}%"))
+    if fecha_inicio: query = query.filter(Boleta.fecha >= fecha_inicio)
+    if fecha_fin: query = query.filter(Boleta.fecha <= fecha_fin)
+    if categoria_nombre: query = query.filter(Categoria.nombre == categoria_nombre)
+    if razon: query = query.filter(Boleta.razon_modificacion == razon)
+    if current_user.role != 'admin': query = query.filter(Boleta.user_id == current_user.id, Boleta.is_deleted == False)
+    return query
+
+def codificar_cursor(fecha, boleta_id):
+    """Codifica la posición (fecha, id) de la última boleta de una página como un token opaco."""
+    return base64.urlsafe_b64encode(json.dumps([fecha, boleta_id]).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decodificar_cursor(token):
+    """Decodifica un token de 'codificar_cursor'. Devuelve (fecha, id) o lanza ValueError."""
+    try:
+        fecha, boleta_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Cursor inválido")
+    if not isinstance(fecha, str) or not isinstance(boleta_id, int):
+        raise ValueError("Cursor inválido")
+    return convertir_fecha(fecha), boleta_id
 
 @api_bp.route('/boletas', methods=['GET'])
 @api_key_required
+@versiones.respuesta_versionada(versiones.version_boletas)
 def get_boletas(current_user):
-    """Obtiene una lista paginada y filtrada de boletas."""
+    """Obtiene una lista paginada y filtrada de boletas.
+
+    Antes de leer las boletas se consulta la versión de los datos del usuario (ver
+    versiones.py, una consulta; dos para un administrador). Si el ETag coincide con
+    'If-None-Match' o la página ya está en la caché, no se hace nada más. Si no, las
+    boletas se leen con una consulta por columnas que ya incluye el nombre de la
+    categoría y del creador, de modo que una página cuesta dos consultas más (el
+    conteo y la página) con paginación por número, o una con cursor, sin importar
+    'per_page'. La búsqueda con 'q' no agrega consultas: se une al índice de texto
+    dentro de esas mismas.
+
+    Si la petición incluye el parámetro 'cursor' (vacío para la primera página) se
+    usa paginación por cursor: se continúa a partir de la última (fecha, id) vista,
+    sin OFFSET ni conteo total, y la respuesta incluye 'next_cursor'.
+
+    El parámetro 'q' busca palabras en las notas, la categoría y el texto leído por
+    OCR (ver busqueda.py). Con paginación por número, los resultados se ordenan por
+    relevancia; con cursor, se mantiene el orden por (fecha, id).
+
+    La respuesta lleva un ETag según la versión de los datos del usuario: con
+    'If-None-Match' se responde 304 sin consultar las boletas, y las páginas ya
+    generadas se reutilizan hasta que los datos cambian (ver versiones.py).
+    """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    creador_username = request.args.get('creador', None, type=str)
-    fecha_inicio = request.args.get('fecha_inicio', None, type=str)
-    fecha_fin = request.args.get('fecha_fin', None, type=str)
-    categoria_nombre = request.args.get('categoria', None, type=str)
-    razon = request.args.get('razon', None, type=str)
+    if page < 1: page = 1
+    if per_page < 1: per_page = 10
     
-    query = db.select(Boleta)
-    if creador_username: query = query.join(User).filter(User.username.ilike(f"%{creador_username}%"))
-    if fecha_inicio: query = query.filter(Boleta.fecha >= fecha_inicio)
-    if fecha_fin: query = query.filter(Boleta.fecha <= fecha_fin)
-    if categoria_nombre: query = query.join(Categoria).filter(Categoria.nombre == categoria_nombre)
-    if razon: query = query.filter(Boleta.razon_modificacion == razon)
-    if current_user.role != 'admin': query = query.filter(Boleta.user_id == current_user.id, Boleta.is_deleted == False)
+    try: query = filtrar_boletas(Boleta.select_serializado(), current_user, request.args)
+    except ValueError as e: return jsonify({"msg": str(e)}), 400
+    orden = (Boleta.fecha.desc(), Boleta.id.desc())
+    relevancia = None
+    q = request.args.get('q', '', type=str).strip()
+    if q: query, relevancia = busqueda.filtrar(query, q)
+    
+    if 'cursor' in request.args:
+        cursor = request.args.get('cursor')
+        if cursor:
+            try: fecha, boleta_id = decodificar_cursor(cursor)
+            except ValueError: return jsonify({"msg": "El parámetro cursor no es válido."}), 400
+            # Equivale a (fecha, id) < (:fecha, :id), escrito con una cota directa sobre
+            # 'fecha' para que el motor lo resuelva como un rango del índice.
+            query = query.filter(Boleta.fecha <= fecha, or_(Boleta.fecha < fecha, Boleta.id < boleta_id))
+        # Se pide una fila de más para saber si existe una página siguiente.
+        filas = db.session.execute(query.order_by(*orden).limit(per_page + 1)).all()
+        has_next = len(filas) > per_page
+        boletas = [Boleta.fila_a_dict(fila) for fila in filas[:per_page]]
+        next_cursor = codificar_cursor(boletas[-1]['fecha'], boletas[-1]['id']) if has_next else None
+        return jsonify({"boletas": boletas, "next_cursor": next_cursor, "has_next": has_next})
     
-    query = query.order_by(Boleta.fecha.desc())
-    pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
-    boletas = pagination.items
-    return jsonify({"boletas": [b.to_dict() for b in boletas], "total_pages": pagination.pages, "current_page": pagination.page, "has_next": pagination.has_next, "has_prev": pagination.has_prev})
+    total = db.session.execute(db.select(func.count()).select_from(query.subquery())).scalar_one()
+    if relevancia is not None: orden = (relevancia, *orden)
+    query = query.order_by(*orden).limit(per_page).offset((page - 1) * per_page)
+    boletas = [Boleta.fila_a_dict(fila) for fila in db.session.execute(query)]
+    total_pages = math.ceil(total / per_page)
+    return jsonify({"boletas": boletas, "total_pages": total_pages, "current_page": page, "has_next": page < total_pages, "has_prev": page > 1})
+
+@api_bp.route('/boletas/export', methods=['GET'])
+@api_key_required
+def export_boletas(current_user):
+    """Exporta todas las boletas que cumplen los filtros como CSV o NDJSON.
+
+    Acepta los mismos filtros y la misma visibilidad que '/api/boletas'. La respuesta
+    se transmite por bloques a medida que se leen las filas (ver exportar.py).
+    """
+    formato = request.args.get('format', 'csv', type=str).lower()
+    if formato not in exportar.FORMATOS: return jsonify({"msg": f"Formato no soportado. Opciones: {', '.join(exportar.FORMATOS)}."}), 400
+    try: query = filtrar_boletas(Boleta.select_serializado(), current_user, request.args)
+    except ValueError as e: return jsonify({"msg": str(e)}), 400
+    headers = {"Content-Disposition": f"attachment; filename=boletas.{formato}"}
+    return Response(stream_with_context(exportar.generar_exportacion(query, formato)), mimetype=exportar.FORMATOS[formato], headers=headers)
+
+@api_bp.route('/boletas/bulk', methods=['POST'])
+@api_key_required
+def bulk_import_boletas(current_user):
+    """Importa muchas boletas de una vez desde un CSV, un NDJSON o un ZIP con imágenes.
+
+    El archivo puede enviarse en el campo 'archivo' de un formulario multipart o como
+    cuerpo de la petición (con Content-Type text/csv, application/x-ndjson o
+    application/zip). Si alguna fila tiene errores no se importa nada, salvo que se
+    indique '?parcial=1'. Ver importar.py para el formato de las filas.
+    """
+    parcial = request.args.get('parcial', '0').lower() in ('1', 'true', 'si')
+    archivo = request.files.get('archivo')
+    formato = request.args.get('format') or detectar_formato(archivo.filename if archivo else None, archivo.mimetype if archivo else request.mimetype)
+    if formato not in FORMATOS_IMPORTACION: return jsonify({"msg": f"Formato no soportado. Opciones: {', '.join(FORMATOS_IMPORTACION)}."}), 400
+    
+    if archivo:
+        stream = archivo.stream
+    elif formato == 'zip':
+        # ZipFile necesita un archivo con 'seek', por lo que el cuerpo se copia a un temporal.
+        stream = tempfile.TemporaryFile()
+        shutil.copyfileobj(request.stream, stream)
+        stream.seek(0)
+    else:
+        stream = request.stream
+    
+    try: resultado = importar(stream, formato, current_user.id, parcial=parcial)
+    except ErrorImportacion as e: return jsonify({"msg": str(e)}), 400
+    
+    if resultado["errores"] and not parcial:
+        resultado["msg"] = "No se importó ninguna boleta porque hay filas con errores."
+        return jsonify(resultado), 400
+    return jsonify(resultado), 201
 
 @api_bp.route('/boletas/upload', methods=['POST'])
 @api_key_required
 def upload_boleta(current_user):
-    """Procesa una imagen de boleta con OCR y devuelve los datos sugeridos."""
+    """Procesa una imagen de boleta con OCR y devuelve los datos sugeridos.
+
+    En modo asíncrono (parámetro '?async=1' o la opción OCR_ASYNC de la
+    configuración) la imagen se encola como un OcrJob y se responde de
+    inmediato con el identificador del trabajo, sin ocupar el worker web
+    durante la inferencia.
+    """
+    # La imagen se recibe en la carpeta de cola y se valida allí mientras se calcula su
+    # hash (ver subidas.py); el OCR la lee desde ese archivo.
+    spool = current_app.config['OCR_SPOOL_FOLDER']
+    subidas.preparar(spool)
     if 'boleta_image' not in request.files: return jsonify({"msg": "No se encontró el archivo de imagen"}), 400
     file = request.files['boleta_image']
     if file.filename == '': return jsonify({"msg": "No se seleccionó ningún archivo"}), 400
     
-    image_bytes = file.read()
-    result = reader.readtext(image_bytes, detail=0, paragraph=False)
-    fecha, monto = parse_ocr_text(result)
+    try:
+        with metricas.medir('guardar_archivo'):
+            recibida = subidas.recibir(file.stream, spool)
+    except ImagenRechazada as e: return jsonify({"msg": str(e)}), e.estado
     
-    success = True
-    message = "Datos extraídos con éxito."
-    if not fecha or monto == 0:
-        success = False
-        message = "No se pudieron leer los datos clave (fecha y monto). La calidad de la imagen puede ser baja. Por favor, ingrese los datos manualmente."
-    
-    return jsonify({"fecha_sugerida": fecha, "monto_sugerido": int(monto) if monto else 0, "success": success, "message": message})
+    try:
+        # Si la misma imagen ya se leyó antes, se responde desde la caché en ambos modos.
+        entrada = ocr_cache.obtener(recibida.sha256)
+        if entrada is not None:
+            return jsonify({**construir_respuesta_ocr(entrada.fecha, entrada.monto), "desde_cache": True})
+        
+        modo_async = request.args.get('async', '1' if current_app.config['OCR_ASYNC'] else '0').lower() in ('1', 'true', 'si')
+        if modo_async:
+            # La imagen queda en la carpeta de cola; el trabajador la borra al terminar.
+            unique_filename = f"{secrets.token_hex(8)}_{secure_filename(file.filename)}"
+            os.replace(recibida.ruta, os.path.join(spool, unique_filename))
+            job = OcrJob(user_id=current_user.id, imagen_path=unique_filename)
+            db.session.add(job)
+            db.session.flush()
+            job_id = job.id
+            db.session.commit()
+            return jsonify({"job_id": job_id, "estado": 'pendiente', "status_url": url_for('api.get_ocr_job', job_id=job_id)}), 202
+        
+        # La caché ya se consultó arriba; solo queda leer la imagen y guardar el resultado.
+        fecha, monto = ocr_cache.extraer_y_guardar(recibida.ruta, recibida.sha256)
+        return jsonify({**construir_respuesta_ocr(fecha, monto), "desde_cache": False})
+    finally:
+        subidas.eliminar(recibida.ruta)
+
+@api_bp.route('/boletas/upload/batch', methods=['POST'])
+@api_key_required
+def upload_boletas_batch(current_user):
+    """Lee muchas imágenes de boletas en una sola petición (ver ocr_lote.py).
+
+    Recibe las imágenes en el campo 'boleta_image' repetido de un formulario multipart.
+    La respuesta es NDJSON: una línea con los datos sugeridos por imagen, en el mismo
+    orden de entrada, que se envía en cuanto esa imagen termina de procesarse.
+    """
+    maximo = current_app.config['OCR_LOTE_MAX_ARCHIVOS']
+    subidas.preparar(current_app.config['OCR_SPOOL_FOLDER'], archivos=maximo)
+    archivos = [f for f in request.files.getlist('boleta_image') if f.filename]
+    if not archivos: return jsonify({"msg": "No se encontraron archivos de imagen"}), 400
+    if len(archivos) > maximo: return jsonify({"msg": f"Se aceptan como máximo {maximo} imágenes por lote."}), 400
+
+    # Los archivos se reciben antes de empezar a responder, mientras el formulario sigue
+    # disponible; si alguno no es válido se rechaza el lote completo.
+    imagenes = []
+    def eliminar_recibidas():
+        for _, recibida in imagenes: subidas.eliminar(recibida.ruta)
+    try:
+        for f in archivos:
+            imagenes.append((f.filename, subidas.recibir(f.stream, current_app.config['OCR_SPOOL_FOLDER'])))
+    except ImagenRechazada as e:
+        eliminar_recibidas()
+        return jsonify({"msg": f"'{f.filename}': {e}"}), e.estado
+    except BaseException:
+        eliminar_recibidas()
+        raise
+    respuesta = Response(stream_with_context(ocr_lote.generar_ndjson(imagenes)), mimetype='application/x-ndjson')
+    # Los archivos se eliminan al cerrar la respuesta, aunque el cliente se desconecte antes.
+    respuesta.call_on_close(eliminar_recibidas)
+    return respuesta
+
+@api_bp.route('/ocr-jobs/<int:job_id>', methods=['GET'])
+@api_key_required
+def get_ocr_job(current_user, job_id):
+    """Devuelve el estado de un trabajo de OCR y, si terminó, los datos sugeridos."""
+    job = db.session.get(OcrJob, job_id)
+    if not job: return jsonify({"msg": "Trabajo de OCR no encontrado"}), 404
+    if job.user_id != current_user.id and current_user.role != 'admin': return jsonify({"msg": "No autorizado"}), 403
+    return jsonify(job.to_dict()), 200
 
 @api_bp.route('/boletas/<int:boleta_id>', methods=['PUT'])
 @api_key_required
@@ -240,14 +419,22 @@ def update_boleta(current_user, boleta_id):
     data = request.get_json()
     if not data: return jsonify({"msg": "No se recibieron datos JSON en la petición."}), 400
     
-    boleta.fecha = data.get('fecha', boleta.fecha)
+    try: fecha = convertir_fecha(data['fecha']) if 'fecha' in data else boleta.fecha
+    except ValueError as e: return jsonify({"msg": str(e)}), 400
+    
+    antes = resumen.clave_boleta(boleta)
+    boleta.fecha = fecha
     boleta.monto_total = int(float(data.get('monto_total', boleta.monto_total)))
     boleta.categoria_id = int(data.get('categoria_id', boleta.categoria_id))
     boleta.notas = data.get('notas', boleta.notas)
     boleta.razon_modificacion = 'Corrección Manual'
+    resumen.actualizar_por_cambio(antes, resumen.clave_boleta(boleta))
+    versiones.boletas_modificadas(boleta.user_id)
+    db.session.flush()
+    busqueda.indexar_boleta(boleta_id)
     
     db.session.commit()
-    return jsonify(boleta.to_dict()), 200
+    return jsonify(Boleta.obtener_dict(boleta_id)), 200
 
 @api_bp.route('/boletas/<int:boleta_id>', methods=['DELETE'])
 @api_key_required
@@ -257,6 +444,8 @@ def delete_boleta(current_user, boleta_id):
     if not boleta: return jsonify({"msg": "Boleta no encontrada"}), 404
     if boleta.user_id != current_user.id and current_user.role != 'admin': return jsonify({"msg": "No autorizado para eliminar"}), 403
     
+    resumen.actualizar_por_cambio(resumen.clave_boleta(boleta), None)
+    versiones.boletas_modificadas(boleta.user_id)
     boleta.is_deleted = True
     db.session.commit()
     return jsonify({"msg": "Boleta marcada como eliminada"}), 200
@@ -264,18 +453,48 @@ def delete_boleta(current_user, boleta_id):
 @api_bp.route('/uploads/<path:filename>')
 @api_key_required
 def get_uploaded_file(current_user, filename):
-    """Sirve un archivo de imagen guardado de forma segura."""
-    boleta = db.session.execute(db.select(Boleta).filter_by(imagen_url=filename)).scalar_one_or_none()
-    if not boleta: return "Archivo no encontrado", 404
-    if current_user.role != 'admin' and boleta.user_id != current_user.id: return "No autorizado", 403
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    """Sirve un archivo de imagen guardado de forma segura.
+
+    Como una misma imagen puede pertenecer a varias boletas, un usuario normal
+    puede verla si al menos una de esas boletas es suya.
+
+    El parámetro 'size' elige la variante: 'original' (por defecto), 'preview' o
+    'thumb' (ver miniaturas.py). Las respuestas llevan ETag y Last-Modified para
+    responder 304 a las peticiones condicionales. Las imágenes guardadas por
+    contenido nunca cambian, así que el navegador puede guardarlas un año.
+    """
+    size = request.args.get('size', 'original', type=str)
+    if size != 'original' and size not in miniaturas.tamanos_disponibles(): return jsonify({"msg": "Tamaño no válido. Opciones: original, preview, thumb."}), 400
+    usuarios = db.session.execute(db.select(Boleta.user_id).filter_by(imagen_url=filename).distinct()).scalars().all()
+    if not usuarios: return "Archivo no encontrado", 404
+    if current_user.role != 'admin' and current_user.id not in usuarios: return "No autorizado", 403
+    
+    inmutable = es_ruta_direccionada(filename)
+    # Con almacenamiento por contenido el hash del nombre ya identifica los bytes.
+    etag = f"{os.path.basename(filename).split('.')[0]}-{size}" if inmutable else True
+    max_age = current_app.config['UPLOADS_CACHE_MAX_AGE'] if inmutable else 0
+    if size == 'original':
+        response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, etag=etag, max_age=max_age)
+    else:
+        ruta = miniaturas.obtener_variante(filename, size)
+        if not ruta: return "Archivo no encontrado", 404
+        response = send_file(ruta, etag=etag, max_age=max_age)
+    # Las imágenes requieren autenticación: solo el navegador del usuario puede guardarlas.
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if inmutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
 
 # --- Rutas de Gestión de Categorías (Solo Admins) ---
 
 @api_bp.route('/categorias', methods=['GET'])
 @api_key_required
+@versiones.respuesta_versionada(versiones.version_categorias)
 def get_categorias(current_user):
-    """Obtiene una lista de todas las categorías disponibles."""
+    """Obtiene una lista de todas las categorías disponibles, con ETag (ver versiones.py)."""
     categorias = db.session.execute(db.select(Categoria).order_by(Categoria.nombre)).scalars().all()
     return jsonify([c.to_dict() for c in categorias])
 
@@ -290,6 +509,7 @@ def create_categoria(current_user):
     
     nueva_categoria = Categoria(nombre=data['nombre'])
     db.session.add(nueva_categoria)
+    versiones.categorias_modificadas()
     db.session.commit()
     return jsonify(nueva_categoria.to_dict()), 201
 
@@ -303,5 +523,155 @@ def delete_categoria(current_user, categoria_id):
     if categoria.boletas: return jsonify({"msg": "No se puede eliminar la categoría porque está siendo usada en boletas existentes."}), 400
     
     db.session.delete(categoria)
+    versiones.categorias_modificadas()
     db.session.commit()
-    return jsonify({"msg": "Categoría eliminada exitosamente"}), 200
\ No newline at end of file
+    return jsonify({"msg": "Categoría eliminada exitosamente"}), 200
+
+# --- Rutas de Reportes ---
+
+# Agrupaciones disponibles en el resumen: nombre en la respuesta -> expresión SQL del grupo,
+# según se calcule sobre la tabla de boletas o sobre la tabla de resumen mensual.
+AGRUPACIONES_RESUMEN = {
+    'mes': func.substr(Boleta.fecha, 1, 7).label('mes'),
+    'categoria': Categoria.nombre.label('categoria'),
+    'creador': User.username.label('creador'),
+}
+AGRUPACIONES_RESUMEN_MENSUAL = {
+    'mes': ResumenMensual.mes.label('mes'),
+    'categoria': Categoria.nombre.label('categoria'),
+    'creador': User.username.label('creador'),
+}
+
+def _metricas_monto():
+    """Devuelve las columnas agregadas que se calculan para cada grupo desde las boletas."""
+    return (
+        func.count(Boleta.id).label('cantidad'),
+        func.coalesce(func.sum(Boleta.monto_total), 0).label('suma'),
+        func.avg(Boleta.monto_total).label('promedio'),
+        func.max(Boleta.monto_total).label('maximo'),
+    )
+
+def _metricas_resumen_mensual():
+    """Columnas agregadas equivalentes calculadas desde la tabla de resumen.
+
+    El resumen solo guarda cantidad y suma, por lo que el máximo no está disponible.
+    """
+    return (
+        func.coalesce(func.sum(ResumenMensual.cantidad), 0).label('cantidad'),
+        func.coalesce(func.sum(ResumenMensual.suma), 0).label('suma'),
+        (func.sum(ResumenMensual.suma) * 1.0 / func.nullif(func.sum(ResumenMensual.cantidad), 0)).label('promedio'),
+        null().label('maximo'),
+    )
+
+def _fila_metricas(fila):
+    """Convierte una fila agregada a diccionario con tipos serializables a JSON."""
+    data = dict(fila._mapping)
+    data['cantidad'] = int(data['cantidad'])
+    data['suma'] = int(data['suma'])
+    data['promedio'] = round(float(data['promedio']), 2) if data['promedio'] is not None else None
+    return data
+
+def _rango_meses(fecha_inicio, fecha_fin):
+    """Traduce un rango de fechas a un rango de meses (AAAA-MM) si coincide con meses completos.
+
+    Returns:
+        tuple | None: (mes_inicio, mes_fin), donde cada extremo puede ser None, o None
+                      si alguna fecha no cae en el borde de un mes y el resumen no sirve.
+    """
+    mes_inicio = mes_fin = None
+    try:
+        if fecha_inicio:
+            inicio = convertir_fecha(fecha_inicio)
+            if inicio.day != 1: return None
+            mes_inicio = resumen.mes_de(inicio)
+        if fecha_fin:
+            fin = convertir_fecha(fecha_fin)
+            if fin.day != calendar.monthrange(fin.year, fin.month)[1]: return None
+            mes_fin = resumen.mes_de(fin)
+    except ValueError:
+        return None
+    return mes_inicio, mes_fin
+
+def _consulta_resumen_mensual(current_user, args, rango):
+    """Construye la consulta base del reporte sobre la tabla de resumen mensual.
+
+    Aplica los mismos filtros y la misma visibilidad que 'filtrar_boletas', traducidos
+    a las columnas del resumen.
+    """
+    def consulta(*columnas):
+        query = db.select(*columnas).select_from(ResumenMensual).join(Categoria, ResumenMensual.categoria_id == Categoria.id).join(User, ResumenMensual.user_id == User.id)
+        creador_username = args.get('creador', None, type=str)
+        categoria_nombre = args.get('categoria', None, type=str)
+        mes_inicio, mes_fin = rango
+        if creador_username: query = query.filter(User.username.ilike(f"%{creador_username}%"))
+        if categoria_nombre: query = query.filter(Categoria.nombre == categoria_nombre)
+        if mes_inicio: query = query.filter(ResumenMensual.mes >= mes_inicio)
+        if mes_fin: query = query.filter(ResumenMensual.mes <= mes_fin)
+        if current_user.role != 'admin': query = query.filter(ResumenMensual.user_id == current_user.id)
+        return query
+    return consulta
+
+@api_bp.route('/reports/summary', methods=['GET'])
+@api_key_required
+def get_reports_summary(current_user):
+    """Devuelve totales de gasto calculados en la base de datos con GROUP BY.
+
+    Acepta los mismos filtros que '/api/boletas' y respeta la misma visibilidad
+    (un usuario normal solo ve sus boletas). Las boletas eliminadas nunca suman.
+    El parámetro 'agrupar' (ej. 'mes,categoria') limita los grupos calculados;
+    por defecto se calculan todos.
+
+    Si los filtros lo permiten (sin 'razon' y con fechas en bordes de mes) se lee la
+    tabla de resumen mensual, cuyo costo depende de la cantidad de grupos y no de
+    boletas; en ese caso 'maximo' es null. Con '?exacto=1' siempre se leen las
+    boletas. El campo 'fuente' indica qué tabla se usó.
+    """
+    agrupar = request.args.get('agrupar', ','.join(AGRUPACIONES_RESUMEN), type=str)
+    grupos = [g.strip() for g in agrupar.split(',') if g.strip()]
+    invalidos = [g for g in grupos if g not in AGRUPACIONES_RESUMEN]
+    if invalidos: return jsonify({"msg": f"Agrupación no válida: {', '.join(invalidos)}. Opciones: {', '.join(AGRUPACIONES_RESUMEN)}."}), 400
+    
+    exacto = request.args.get('exacto', '0').lower() in ('1', 'true', 'si')
+    try: fechas_de_filtro(request.args)
+    except ValueError as e: return jsonify({"msg": str(e)}), 400
+    rango = _rango_meses(request.args.get('fecha_inicio'), request.args.get('fecha_fin'))
+    if not exacto and rango is not None and not request.args.get('razon'):
+        fuente, agrupaciones, columnas = 'resumen', AGRUPACIONES_RESUMEN_MENSUAL, _metricas_resumen_mensual
+        consulta = _consulta_resumen_mensual(current_user, request.args, rango)
+    else:
+        fuente, agrupaciones, columnas = 'boletas', AGRUPACIONES_RESUMEN, _metricas_monto
+        def consulta(*columnas):
+            query = db.select(*columnas).select_from(Boleta).join(Categoria, Boleta.categoria_id == Categoria.id).join(User, Boleta.user_id == User.id)
+            return filtrar_boletas(query, current_user, request.args).filter(Boleta.is_deleted == False)
+    
+    resumen_data = {"fuente": fuente, "total": _fila_metricas(db.session.execute(consulta(*columnas())).one())}
+    for nombre in grupos:
+        grupo = agrupaciones[nombre]
+        # Los grupos que quedaron en cero tras eliminar boletas no se informan.
+        filas = db.session.execute(consulta(grupo, *columnas()).group_by(grupo).order_by(grupo))
+        resumen_data[f"por_{nombre}"] = [_fila_metricas(fila) for fila in filas if fila.cantidad]
+    return jsonify(resumen_data)
+
+# --- Métricas ---
+
+def _puede_ver_metricas():
+    """Indica si la petición trae el token de métricas o la API Key de un administrador."""
+    token = current_app.config['METRICAS_TOKEN']
+    if token and secrets.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return True
+    api_key = request.headers.get('X-Api-Key')
+    user = autenticar_api_key(api_key) if api_key else None
+    return user is not None and user.role == 'admin'
+
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expone las métricas del proceso en el formato de texto de Prometheus (ver metricas.py).
+
+    Las métricas revelan rutas, volumen de uso y el estado de la cola, así que se exige
+    la cabecera 'Authorization: Bearer <METRICAS_TOKEN>' (que Prometheus envía con la
+    opción 'authorization' del trabajo de scraping) o la API Key de un administrador,
+    salvo que METRICAS_PUBLICAS esté activo.
+    """
+    if not current_app.config['METRICAS_ACTIVAS']: return jsonify({"msg": "Las métricas están desactivadas"}), 404
+    if not current_app.config['METRICAS_PUBLICAS'] and not _puede_ver_metricas(): return jsonify({"msg": "No autorizado"}), 401
+    return Response(metricas.exponer(), mimetype='text/plain; version=0.0.4')
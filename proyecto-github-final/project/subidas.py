@@ -0,0 +1,239 @@
+# project/subidas.py
+"""Recepción de imágenes subidas, por bloques y con límites de tamaño.
+
+Antes, '/api/boletas/upload' y '/api/boletas/upload/batch' leían cada imagen
+completa a memoria con 'file.read()' (y el OCR hacía después su propia copia),
+sin ningún límite: una foto enorme, o un PNG pequeño que declara 40000x40000
+píxeles (una "bomba de descompresión"), podía agotar la memoria de un worker.
+
+Aquí cada imagen se lee por bloques mientras se calcula su SHA-256 y se reconoce su
+tipo por los primeros bytes. La lectura se corta en cuanto supera SUBIDA_MAX_BYTES,
+y la cantidad de píxeles se comprueba leyendo solo la cabecera de la imagen, antes
+de decodificarla. Al OCR se le entrega la ruta del archivo en vez de los bytes.
+
+Werkzeug guarda cada archivo del formulario en un temporal anónimo mientras lee la
+petición. Las rutas de subida llaman antes a 'preparar', que hace dos cosas:
+
+* limita la petición a lo que pueden ocupar sus imágenes (no a MAX_CONTENT_LENGTH,
+  pensado para los ZIP de la importación masiva), así que una imagen demasiado
+  grande se rechaza con 413 antes de recibirla completa;
+* hace que Werkzeug escriba cada archivo en un temporal con nombre dentro de la
+  carpeta de destino (ver 'PeticionSubidas'). 'recibir' valida ese archivo y lo
+  entrega tal cual, sin escribir una segunda copia.
+"""
+import os
+import tempfile
+import hashlib
+from collections import namedtuple
+from flask import Request, current_app, has_request_context, request
+from PIL import Image, UnidentifiedImageError
+from .almacenamiento import EXTENSIONES_POR_TIPO, TAMANO_BLOQUE, ubicar_por_contenido
+
+# Firmas (primeros bytes) de los formatos de imagen aceptados.
+FIRMAS = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+)
+# Bytes del inicio del archivo que se usan para reconocer el tipo.
+TAMANO_CABECERA = 16
+# Bytes que se admiten por imagen además de la imagen misma: cabeceras multipart y
+# los demás campos del formulario.
+MARGEN_FORMULARIO = 64 * 1024
+
+ImagenRecibida = namedtuple('ImagenRecibida', ['ruta', 'sha256', 'tipo', 'tamano'])
+
+class ImagenRechazada(Exception):
+    """La imagen subida no es válida o supera los límites; 'estado' es el código HTTP."""
+    def __init__(self, msg, estado=400):
+        super().__init__(msg)
+        self.estado = estado
+
+def detectar_tipo(cabecera):
+    """Devuelve el tipo MIME según los primeros bytes del archivo, o None si no es una imagen aceptada."""
+    if cabecera[:4] == b'RIFF' and cabecera[8:12] == b'WEBP':
+        return 'image/webp'
+    for firma, tipo in FIRMAS:
+        if cabecera.startswith(firma):
+            return tipo
+    return None
+
+def verificar_pixeles(ruta, max_pixeles):
+    """Comprueba las dimensiones de la imagen leyendo solo su cabecera.
+
+    'Image.open' no decodifica los píxeles hasta que se usan, por lo que una imagen
+    que declara dimensiones enormes se rechaza sin reservar memoria para ella.
+    """
+    try:
+        with Image.open(ruta) as imagen:
+            ancho, alto = imagen.size
+    except Image.DecompressionBombError:
+        raise ImagenRechazada("La imagen tiene demasiados píxeles.", 413)
+    except (UnidentifiedImageError, OSError):
+        raise ImagenRechazada("El archivo no es una imagen válida.", 415)
+    if ancho * alto > max_pixeles:
+        raise ImagenRechazada(f"La imagen mide {ancho}x{alto} píxeles; se aceptan como máximo {max_pixeles}.", 413)
+
+class PeticionSubidas(Request):
+    """Petición cuyos archivos de formulario se escriben en una carpeta elegida por la ruta.
+
+    Mientras no se llame a 'preparar', se comporta igual que la de Flask. Después,
+    cada archivo del formulario se guarda en un temporal con nombre dentro de
+    'carpeta_subidas'; los que la ruta no movió se eliminan al cerrar la petición.
+    """
+    carpeta_subidas = None
+    temporales_subidas = ()
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.carpeta_subidas is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        os.makedirs(self.carpeta_subidas, exist_ok=True)
+        archivo = tempfile.NamedTemporaryFile(prefix='.subida-', dir=self.carpeta_subidas, delete=False)
+        self.temporales_subidas.append(archivo.name)
+        return archivo
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for ruta in self.temporales_subidas:
+                eliminar(ruta)
+
+def init_app(app):
+    """Hace que la aplicación use 'PeticionSubidas' como clase de sus peticiones."""
+    app.request_class = PeticionSubidas
+
+def preparar(carpeta, archivos=1):
+    """Prepara la petición actual para recibir hasta 'archivos' imágenes en 'carpeta'.
+
+    Debe llamarse antes de leer 'request.form' o 'request.files'. Limita la petición a
+    'archivos' veces SUBIDA_MAX_BYTES (más un margen para el resto del formulario),
+    sin superar MAX_CONTENT_LENGTH.
+    """
+    config = current_app.config
+    maximo = archivos * (config['SUBIDA_MAX_BYTES'] + MARGEN_FORMULARIO)
+    if config['MAX_CONTENT_LENGTH']:
+        maximo = min(maximo, config['MAX_CONTENT_LENGTH'])
+    request.max_content_length = maximo
+    if isinstance(request, PeticionSubidas):
+        request.carpeta_subidas = os.path.abspath(carpeta)
+        request.temporales_subidas = []
+
+def _temporal_de(stream, carpeta):
+    """Devuelve la ruta del archivo si el stream es un temporal de la petición en 'carpeta'."""
+    ruta = getattr(stream, 'name', None)
+    if not isinstance(ruta, str) or not has_request_context() or ruta not in request.temporales_subidas:
+        return None
+    return ruta if os.path.dirname(ruta) == os.path.abspath(carpeta) else None
+
+def _leer_validando(stream, destino, max_bytes):
+    """Lee el stream por bloques comprobando tamaño y tipo; copia a 'destino' si se indica.
+
+    Returns:
+        tuple: (SHA-256, tipo MIME, tamaño en bytes).
+    """
+    sha = hashlib.sha256()
+    cabecera, tipo, tamano = b'', None, 0
+    while True:
+        bloque = stream.read(TAMANO_BLOQUE)
+        if not bloque:
+            break
+        tamano += len(bloque)
+        if tamano > max_bytes:
+            raise ImagenRechazada(f"La imagen supera el máximo de {max_bytes / (1024 * 1024):.1f} MB.", 413)
+        if len(cabecera) < TAMANO_CABECERA:
+            cabecera += bloque[:TAMANO_CABECERA - len(cabecera)]
+            # El tipo se reconoce con el primer bloque: un archivo que no es una
+            # imagen se rechaza sin terminar de leerlo.
+            tipo = detectar_tipo(cabecera)
+            if tipo is None and len(cabecera) >= TAMANO_CABECERA:
+                raise ImagenRechazada("El archivo no es una imagen en un formato aceptado.", 415)
+        sha.update(bloque)
+        if destino is not None:
+            destino.write(bloque)
+    if tipo is None:
+        raise ImagenRechazada("El archivo no es una imagen en un formato aceptado.", 415)
+    return sha.hexdigest(), tipo, tamano
+
+def recibir(stream, carpeta, max_bytes=None, max_pixeles=None):
+    """Deja una imagen subida en un archivo temporal dentro de 'carpeta', validándola.
+
+    Si el stream es el temporal que Werkzeug ya escribió en 'carpeta' (ver 'preparar'),
+    solo se lee para validarlo; si no, se copia por bloques a un temporal nuevo.
+
+    Args:
+        stream: El stream del archivo subido (ej. 'file.stream' de Werkzeug) o de un
+            miembro de un ZIP.
+        carpeta (str): Carpeta donde queda el temporal. Conviene que sea la de
+            destino final, para poder moverlo después con un renombrado atómico.
+        max_bytes (int | None): Tamaño máximo; por defecto SUBIDA_MAX_BYTES.
+        max_pixeles (int | None): Píxeles máximos; por defecto SUBIDA_MAX_PIXELES.
+
+    Returns:
+        ImagenRecibida: Ruta del temporal, SHA-256, tipo MIME y tamaño en bytes. Quien
+            llama debe mover o eliminar el archivo (ver 'eliminar').
+
+    Raises:
+        ImagenRechazada: Si supera los límites (413) o no es una imagen aceptada (415).
+            En ese caso el temporal ya se eliminó.
+    """
+    config = current_app.config
+    max_bytes = max_bytes or config['SUBIDA_MAX_BYTES']
+    max_pixeles = max_pixeles or config['SUBIDA_MAX_PIXELES']
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = _temporal_de(stream, carpeta)
+    if ruta is not None:
+        stream.seek(0)
+        destino = None
+    else:
+        fd, ruta = tempfile.mkstemp(prefix='.subida-', dir=carpeta)
+        destino = os.fdopen(fd, 'wb')
+    try:
+        try:
+            sha256, tipo, tamano = _leer_validando(stream, destino, max_bytes)
+        finally:
+            # El temporal de Werkzeug se cierra aquí para poder moverlo (también en Windows).
+            (destino if destino is not None else stream).close()
+        verificar_pixeles(ruta, max_pixeles)
+        return ImagenRecibida(ruta, sha256, tipo, tamano)
+    except BaseException:
+        eliminar(ruta)
+        raise
+
+def eliminar(ruta):
+    """Elimina un archivo recibido, si todavía existe (puede haberse movido ya)."""
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+def guardar(stream, max_bytes=None):
+    """Recibe una imagen y la guarda en UPLOAD_FOLDER bajo su hash (ver almacenamiento.py).
+
+    La extensión sale del tipo reconocido por su contenido, no del nombre del archivo.
+
+    Args:
+        stream: El stream de la imagen (de un formulario o de un miembro de un ZIP).
+        max_bytes (int | None): Tamaño máximo; por defecto SUBIDA_MAX_BYTES.
+
+    Returns:
+        tuple: (ruta relativa a UPLOAD_FOLDER para 'Boleta.imagen_url', tamaño en bytes).
+
+    Raises:
+        ImagenRechazada: Si la imagen no cumple los límites de 'recibir'.
+    """
+    carpeta = current_app.config['UPLOAD_FOLDER']
+    recibida = recibir(stream, carpeta, max_bytes)
+    try:
+        return ubicar_por_contenido(recibida.ruta, recibida.sha256, EXTENSIONES_POR_TIPO[recibida.tipo], carpeta), recibida.tamano
+    except BaseException:
+        eliminar(recibida.ruta)
+        raise
+
+def guardar_imagen(file):
+    """Guarda la imagen de un campo de formulario (ver 'guardar') y devuelve su ruta relativa."""
+    return guardar(file.stream)[0]
@@ -0,0 +1,185 @@
+# project/versiones.py
+"""Versiones de los datos, ETags y caché de páginas para '/api/boletas' y '/api/categorias'.
+
+La página de inicio consulta esas dos rutas en cada cambio de vista, y casi siempre
+recibe el mismo JSON. Para no reconstruirlo cada vez, la tabla 'versiones_datos'
+guarda un contador por ámbito:
+
+* 'boletas:<user_id>': boletas de un usuario. Lo incrementan las rutas que crean,
+  modifican o eliminan boletas y la importación masiva, antes de su 'commit' (igual
+  que con el resumen mensual), siempre en el ámbito del dueño de la boleta.
+* 'categorias': las categorías, cuyo nombre también aparece en cada boleta.
+* 'todo': cambios hechos por fuera de las rutas (comandos de terminal).
+
+La versión de una respuesta combina los contadores de los que depende: un usuario
+normal solo ve sus boletas; un administrador ve las de todos, así que su versión
+usa la suma de los contadores de todos los usuarios, que también crece con
+cualquier cambio. Con esa versión se calcula el ETag: si coincide con
+'If-None-Match', se responde 304 sin consultar la tabla 'boletas'. Si no, la página
+se busca en una caché LRU de JSON ya serializado, en memoria de cada proceso, cuya
+clave incluye la versión; al cambiar los datos las páginas viejas simplemente dejan
+de usarse y la LRU las descarta.
+
+La versión y los datos se leen en la misma transacción, de modo que una escritura
+confirmada entre ambas lecturas no puede dejar una página nueva guardada bajo la
+versión anterior.
+"""
+import hashlib
+import threading
+from functools import wraps
+from cachetools import LRUCache
+from flask import current_app, request
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from . import db, metricas
+from .models import VersionDatos
+
+AMBITO_TODO = 'todo'
+AMBITO_CATEGORIAS = 'categorias'
+PREFIJO_BOLETAS = 'boletas:'
+
+def ambito_boletas(user_id):
+    """Devuelve el ámbito que cubre las boletas de un usuario."""
+    return f"{PREFIJO_BOLETAS}{user_id}"
+
+def incrementar(ambito):
+    """Incrementa el contador de un ámbito dentro de la transacción actual (sin 'commit').
+
+    Usa un 'upsert' atómico, como resumen.aplicar_delta, para que la primera
+    escritura de un ámbito no choque con otra simultánea.
+    """
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == 'sqlite':
+        stmt = sqlite_insert(VersionDatos).values(ambito=ambito, version=1)
+        stmt = stmt.on_conflict_do_update(index_elements=['ambito'], set_={"version": VersionDatos.version + 1})
+    elif dialecto in ('mysql', 'mariadb'):
+        stmt = mysql_insert(VersionDatos).values(ambito=ambito, version=1)
+        stmt = stmt.on_duplicate_key_update(version=VersionDatos.version + 1)
+    else:
+        actualizados = db.session.execute(
+            db.update(VersionDatos).where(VersionDatos.ambito == ambito)
+            .values(version=VersionDatos.version + 1).execution_options(synchronize_session=False)
+        ).rowcount
+        if actualizados:
+            return
+        stmt = db.insert(VersionDatos).values(ambito=ambito, version=1)
+    db.session.execute(stmt)
+
+def boletas_modificadas(user_id):
+    """Registra un cambio en las boletas del usuario indicado (el dueño de la boleta)."""
+    incrementar(ambito_boletas(user_id))
+
+def categorias_modificadas():
+    """Registra un cambio en las categorías."""
+    incrementar(AMBITO_CATEGORIAS)
+
+def invalidar_todo():
+    """Invalida los ETags y las páginas guardadas de todos los usuarios y confirma el cambio.
+
+    La usan los comandos que modifican boletas de forma masiva.
+    """
+    incrementar(AMBITO_TODO)
+    db.session.commit()
+
+def _leer(*ambitos):
+    filas = db.session.execute(db.select(VersionDatos.ambito, VersionDatos.version).where(VersionDatos.ambito.in_(ambitos))).all()
+    return dict(filas)
+
+def version_categorias(current_user):
+    """Versión de la lista de categorías, que es la misma para todos los usuarios."""
+    versiones = _leer(AMBITO_TODO, AMBITO_CATEGORIAS)
+    return f"{versiones.get(AMBITO_TODO, 0)}.{versiones.get(AMBITO_CATEGORIAS, 0)}"
+
+def version_boletas(current_user):
+    """Versión de las boletas visibles para el usuario, incluido su alcance.
+
+    Los administradores comparten la misma versión (ven las mismas boletas); la de
+    un usuario normal incluye su id, para que un navegador usado por dos cuentas no
+    reciba un 304 con la lista de la otra.
+    """
+    if current_user.role == 'admin':
+        alcance = 'admin'
+        versiones = _leer(AMBITO_TODO, AMBITO_CATEGORIAS)
+        boletas = db.session.execute(
+            db.select(db.func.coalesce(db.func.sum(VersionDatos.version), 0)).where(VersionDatos.ambito.startswith(PREFIJO_BOLETAS))
+        ).scalar_one()
+    else:
+        alcance = f"u{current_user.id}"
+        versiones = _leer(AMBITO_TODO, AMBITO_CATEGORIAS, ambito_boletas(current_user.id))
+        boletas = versiones.get(ambito_boletas(current_user.id), 0)
+    return f"{alcance}.{versiones.get(AMBITO_TODO, 0)}.{versiones.get(AMBITO_CATEGORIAS, 0)}.{boletas}"
+
+class CachePaginas:
+    """Caché LRU de cuerpos JSON ya serializados, segura entre hilos."""
+
+    def __init__(self, maxsize):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        """Devuelve el cuerpo guardado para la clave o None."""
+        with self._lock:
+            return self._cache.get(clave)
+
+    def guardar(self, clave, cuerpo):
+        """Guarda el cuerpo de una respuesta."""
+        with self._lock:
+            self._cache[clave] = cuerpo
+
+    def limpiar(self):
+        """Vacía la caché por completo."""
+        with self._lock:
+            self._cache.clear()
+
+def init_app(app):
+    """Crea la caché de páginas de la aplicación según su configuración."""
+    app.extensions['cache_paginas'] = CachePaginas(app.config['CACHE_PAGINAS_SIZE'])
+
+def _cache():
+    return current_app.extensions['cache_paginas']
+
+def _responder(cuerpo, etag):
+    respuesta = current_app.response_class(cuerpo, mimetype='application/json')
+    respuesta.set_etag(etag, weak=True)
+    # El navegador puede guardarla, pero debe revalidarla en cada uso ('If-None-Match').
+    respuesta.cache_control.private = True
+    respuesta.cache_control.no_cache = True
+    respuesta.vary.add('X-Api-Key')
+    return respuesta
+
+def respuesta_versionada(version_de):
+    """Decorador para rutas GET de lectura: agrega ETag, responde 304 y cachea páginas.
+
+    Se aplica debajo de 'api_key_required'. La página se identifica por la ruta,
+    los parámetros de la petición y la versión que devuelve 'version_de(current_user)'.
+    Solo se guardan las respuestas 200; las de error se devuelven tal cual.
+    """
+    def decorador(fn):
+        @wraps(fn)
+        def decorated_function(current_user, *args, **kwargs):
+            ruta = request.url_rule.rule
+            version = version_de(current_user)
+            etag = hashlib.sha256(f"{ruta}|{version}".encode('utf-8')).hexdigest()[:32]
+            if request.if_none_match.contains_weak(etag):
+                metricas.CACHE_PAGINAS.sumar(1, ruta, 'no_modificado')
+                respuesta = _responder(b'', etag)
+                respuesta.status_code = 304
+                return respuesta
+
+            activa = current_app.config['CACHE_PAGINAS_ACTIVA']
+            clave = (ruta, version, tuple(sorted(request.args.items(multi=True))))
+            cuerpo = _cache().obtener(clave) if activa else None
+            if cuerpo is not None:
+                metricas.CACHE_PAGINAS.sumar(1, ruta, 'acierto')
+                return _responder(cuerpo, etag)
+
+            respuesta = current_app.make_response(fn(current_user=current_user, *args, **kwargs))
+            if respuesta.status_code != 200:
+                return respuesta
+            cuerpo = respuesta.get_data()
+            if activa and len(cuerpo) <= current_app.config['CACHE_PAGINAS_MAX_BYTES']:
+                _cache().guardar(clave, cuerpo)
+            metricas.CACHE_PAGINAS.sumar(1, ruta, 'fallo')
+            return _responder(cuerpo, etag)
+        return decorated_function
+    return decorador
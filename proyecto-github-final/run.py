@@ -14,7 +14,8 @@ from project.models import User
 # Carga la configuración correspondiente ('development' o 'production')
 # basada en la variable de entorno FLASK_ENV.
 config_name = os.getenv('FLASK_ENV', 'development')
-app = create_app(f'project.config.{config_name.capitalize()}Config')
+config_class_name = f'project.config.{config_name.capitalize()}Config'
+app = create_app(config_class_name)
 
 # -------------------------------------------------------------------
 # --- Comandos Personalizados de la Línea de Comandos (CLI) ---
@@ -48,7 +49,6 @@ def create_user(username, password, admin):
         # Se crea la nueva instancia del modelo User.
         user = User(username=username)
         user.set_password(password)
-        user.generate_api_key()
 
         # Se asigna el rol basado en si se utilizó el flag --admin.
         if admin:
@@ -63,6 +63,207 @@ def create_user(username, password, admin):
         db.session.commit()
         print("¡Usuario creado exitosamente!")
 
+# Define el comando que inicia los trabajadores de la cola de OCR: 'flask ocr-worker'
+@app.cli.command("ocr-worker")
+@click.option("--procesos", default=1, show_default=True, help="Número de procesos trabajadores de OCR.")
+@click.option("--max-trabajos", default=None, type=int, help="Trabajos por proceso antes de reiniciarlo (libera memoria).")
+def ocr_worker(procesos, max_trabajos):
+    """Procesa los trabajos de OCR encolados por '/api/boletas/upload?async=1'.
+
+    Args:
+        procesos (int): Cantidad de procesos que consumen la cola en paralelo.
+        max_trabajos (int): Si se indica, cada proceso se recicla tras esa cantidad de trabajos.
+    """
+    from project.ocr_worker import iniciar_pool
+    print(f"Iniciando {procesos} trabajador(es) de OCR. Presione Ctrl+C para detener.")
+    iniciar_pool(config_class_name, procesos=procesos, max_trabajos=max_trabajos)
+
+# Define el comando que inicia el servidor de OCR compartido: 'flask ocr-server'
+@app.cli.command("ocr-server")
+@click.option("--socket", "socket_path", default=None, help="Ruta del socket Unix (por defecto, OCR_SERVER_SOCKET o instance/ocr.sock).")
+def ocr_server(socket_path):
+    """Carga el modelo de OCR una sola vez y lo atiende por un socket Unix local.
+
+    Los workers web deben iniciarse con la variable OCR_SERVER_SOCKET apuntando
+    al mismo socket para delegar la inferencia en este proceso.
+
+    Args:
+        socket_path (str): Ruta del socket Unix donde escuchar.
+    """
+    from project.ocr_server import servir
+    socket_path = socket_path or app.config['OCR_SERVER_SOCKET'] or os.path.join(app.instance_path, 'ocr.sock')
+    print(f"Cargando el modelo de OCR y escuchando en {socket_path}. Presione Ctrl+C para detener.")
+    with app.app_context():
+        servir(socket_path)
+
+# Define el comando que reconstruye y verifica la tabla de resumen: 'flask rebuild-resumen'
+@app.cli.command("rebuild-resumen")
+@click.option("--solo-verificar", is_flag=True, help="Solo compara el resumen con las boletas, sin reconstruirlo.")
+def rebuild_resumen(solo_verificar):
+    """Reconstruye la tabla de resumen mensual desde cero y la verifica contra las boletas.
+
+    Args:
+        solo_verificar (bool): Si es True, no modifica la tabla y solo informa diferencias.
+    """
+    from project import resumen
+    with app.app_context():
+        if not solo_verificar:
+            grupos = resumen.reconstruir()
+            print(f"Resumen reconstruido: {grupos} grupos.")
+        diferencias = resumen.verificar()
+        if not diferencias:
+            print("El resumen coincide con la tabla de boletas.")
+            return
+        print(f"Se encontraron {len(diferencias)} diferencias (usuario, categoría, mes, esperado, guardado):")
+        for diferencia in diferencias:
+            print("  ", diferencia)
+        raise SystemExit(1)
+
+# Define el comando que exporta boletas a un archivo: 'flask export-boletas'
+@app.cli.command("export-boletas")
+@click.argument("salida", type=click.Path(dir_okay=False, writable=True))
+@click.option("--format", "formato", type=click.Choice(["csv", "ndjson"]), default="csv", show_default=True, help="Formato del archivo.")
+@click.option("--fecha-inicio", default=None, help="Fecha mínima (AAAA-MM-DD).")
+@click.option("--fecha-fin", default=None, help="Fecha máxima (AAAA-MM-DD).")
+@click.option("--categoria", default=None, help="Nombre exacto de la categoría.")
+@click.option("--creador", default=None, help="Parte del nombre de usuario del creador.")
+@click.option("--razon", default=None, help="Razón de modificación.")
+@click.option("--excluir-eliminadas", is_flag=True, help="No incluye las boletas marcadas como eliminadas.")
+def export_boletas(salida, formato, fecha_inicio, fecha_fin, categoria, creador, razon, excluir_eliminadas):
+    """Exporta las boletas (con la visibilidad de un administrador) a un archivo CSV o NDJSON.
+
+    Args:
+        salida (str): Ruta del archivo a generar.
+        formato (str): 'csv' o 'ndjson'.
+    """
+    from werkzeug.datastructures import MultiDict
+    from project import exportar
+    from project.auth import Principal
+    from project.models import Boleta
+    from project.routes import filtrar_boletas
+    filtros = MultiDict({k: v for k, v in {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "categoria": categoria, "creador": creador, "razon": razon}.items() if v})
+    with app.app_context():
+        try:
+            query = filtrar_boletas(Boleta.select_serializado(), Principal(id=None, username=None, role='admin'), filtros)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        if excluir_eliminadas:
+            query = query.filter(Boleta.is_deleted == False)
+        escritos = exportar.exportar_a_archivo(query, formato, salida)
+    print(f"Exportación completada: {salida} ({escritos} caracteres).")
+
+# Define el comando que migra las imágenes al almacenamiento por contenido: 'flask migrar-imagenes'
+@app.cli.command("migrar-imagenes")
+def migrar_imagenes():
+    """Mueve las imágenes antiguas a rutas 'ab/cd/<sha256>.<ext>' y actualiza las boletas.
+
+    Las imágenes con el mismo contenido quedan en un solo archivo. Es seguro
+    ejecutarlo varias veces: las boletas ya migradas no se tocan.
+    """
+    from project import versiones
+    from project.almacenamiento import es_ruta_direccionada, migrar_archivo
+    from project.models import Boleta
+    with app.app_context():
+        nombres = db.session.execute(db.select(Boleta.imagen_url).filter(Boleta.imagen_url.isnot(None)).distinct()).scalars().all()
+        pendientes = [n for n in nombres if n and not es_ruta_direccionada(n)]
+        migradas, faltantes = 0, []
+        for nombre in pendientes:
+            try:
+                nueva = migrar_archivo(nombre)
+            except FileNotFoundError:
+                faltantes.append(nombre)
+                continue
+            # Cada archivo se confirma por separado para que una interrupción no deje
+            # boletas apuntando a un archivo que ya se movió.
+            db.session.execute(db.update(Boleta).where(Boleta.imagen_url == nombre).values(imagen_url=nueva))
+            db.session.commit()
+            migradas += 1
+        if migradas:
+            # Las listas de boletas guardadas por los navegadores tienen las rutas antiguas.
+            versiones.invalidar_todo()
+        print(f"Imágenes migradas: {migradas} de {len(pendientes)}.")
+        for nombre in faltantes:
+            print(f"  Archivo no encontrado: {nombre}")
+
+# Define el comando que vacía la caché de resultados de OCR: 'flask purge-ocr-cache'
+@app.cli.command("purge-ocr-cache")
+def purge_ocr_cache():
+    """Vacía la caché de OCR, forzando a leer de nuevo cada imagen al subirla.
+
+    Las lecturas de 'ocr_lecturas' se conservan: las usan 'reparse-ocr' y la búsqueda.
+    """
+    from project import ocr_cache
+    with app.app_context():
+        eliminadas = ocr_cache.purgar()
+    print(f"Caché de OCR vaciada: {eliminadas} entradas eliminadas.")
+
+# Define el comando que reconstruye el índice de búsqueda de texto completo: 'flask rebuild-busqueda'
+@app.cli.command("rebuild-busqueda")
+def rebuild_busqueda():
+    """Vuelve a generar el texto buscable ('?q=') de todas las boletas.
+
+    Útil tras cambiar datos directamente en la base de datos o tras leer imágenes
+    que no tenían resultado de OCR guardado.
+    """
+    from project import busqueda, versiones
+    with app.app_context():
+        indexadas = busqueda.reconstruir()
+        # Los resultados de '?q=' pueden cambiar: se descartan las páginas ya generadas.
+        versiones.invalidar_todo()
+    print(f"Índice de búsqueda reconstruido: {indexadas} boletas.")
+
+# Define el comando que vuelve a analizar los resultados de OCR guardados: 'flask reparse-ocr'
+@app.cli.command("reparse-ocr")
+@click.option("--procesos", default=None, type=int, help="Procesos en paralelo (por defecto, uno por CPU al analizar y uno al leer).")
+@click.option("--aplicar", is_flag=True, help="Guarda la nueva fecha y monto de las lecturas que cambian y de sus boletas.")
+@click.option("--mostrar", default=20, show_default=True, help="Cantidad de diferencias a listar.")
+@click.option("--releer", is_flag=True, help="Lee con OCR las imágenes de boletas que no tienen lectura guardada.")
+def reparse_ocr(procesos, aplicar, mostrar, releer):
+    """Vuelve a extraer fecha y monto del texto de OCR guardado, sin repetir la inferencia.
+
+    Con --releer, además, lee las imágenes de boletas que aún no tienen lectura.
+    Esa lectura se puede interrumpir y retomar: cada imagen se guarda al terminar.
+
+    Args:
+        procesos (int): Procesos del pool.
+        aplicar (bool): Si es True, actualiza la tabla 'ocr_lecturas' y las boletas que
+            tomaron sus datos de la lectura sin corregirlos.
+        mostrar (int): Máximo de diferencias a imprimir.
+        releer (bool): Si es True, ejecuta el OCR de las imágenes pendientes.
+    """
+    from project import reproceso_ocr
+    with app.app_context():
+        if releer:
+            pendientes, faltantes = reproceso_ocr.imagenes_sin_resultado()
+            for nombre in faltantes:
+                print(f"  Archivo no encontrado: {nombre}")
+            errores = []
+            with click.progressbar(length=len(pendientes), label=f"Leyendo {len(pendientes)} imágenes") as barra:
+                for sha256, error in reproceso_ocr.releer(pendientes, config_class_name, procesos=procesos or 1):
+                    if error:
+                        errores.append((sha256, error))
+                    barra.update(1)
+            print(f"Imágenes leídas: {len(pendientes) - len(errores)} de {len(pendientes)}.")
+            for sha256, error in errores:
+                print(f"  Error en {sha256}: {error}")
+            if len(pendientes) > len(errores):
+                # El texto recién leído pasa a ser buscable con '?q='.
+                from project import busqueda, versiones
+                print(f"Índice de búsqueda reconstruido: {busqueda.reconstruir()} boletas.")
+                versiones.invalidar_todo()
+
+        diferencias, boletas = [], 0
+        with click.progressbar(length=reproceso_ocr.contar_guardados(), label="Analizando lecturas guardadas") as barra:
+            for cantidad, del_bloque, actualizadas in reproceso_ocr.reanalizar(procesos=procesos, aplicar=aplicar):
+                diferencias.extend(del_bloque)
+                boletas += actualizadas
+                barra.update(cantidad)
+    print(f"Lecturas {'actualizadas' if aplicar else 'que cambiarían'}: {len(diferencias)}.")
+    if aplicar:
+        print(f"Boletas actualizadas: {boletas}.")
+    for d in diferencias[:mostrar]:
+        print(f"  {d.sha256[:12]}  fecha {d.fecha_guardada} -> {d.fecha_nueva}  monto {d.monto_guardado} -> {d.monto_nuevo}")
+
 # Este bloque permite ejecutar la aplicación directamente con 'python run.py',
 # aunque el método estándar en un entorno Flask es usar 'flask run'.
 if __name__ == '__main__':
@@ -0,0 +1,58 @@
+# tests/conftest.py
+"""Fixtures comunes: una aplicación sobre una base SQLite temporal y sus clientes.
+
+Cada prueba recibe una base de datos y carpetas nuevas dentro de 'tmp_path', de modo
+que nunca se toca instance/project.db. La configuración se arma como una subclase de
+DevelopmentConfig con los valores de la prueba (ver 'crear_app').
+"""
+import os
+import pytest
+from sqlalchemy import event
+from project import create_app, db
+from project.config import DevelopmentConfig
+
+def crear_app(carpeta, **config):
+    """Crea una aplicación de pruebas cuya base y carpetas están dentro de 'carpeta'."""
+    valores = {
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + os.path.join(carpeta, 'pruebas.db'),
+        "UPLOAD_FOLDER": os.path.join(carpeta, 'uploads'),
+        "OCR_SPOOL_FOLDER": os.path.join(carpeta, 'ocr_spool'),
+        "THUMBNAIL_FOLDER": os.path.join(carpeta, 'thumbnails'),
+        "TESTING": True,
+        **config,
+    }
+    return create_app(type('ConfigPruebas', (DevelopmentConfig,), valores))
+
+@pytest.fixture
+def app(tmp_path):
+    return crear_app(str(tmp_path))
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+def registrar(cliente, username, password='clave', admin_headers=None, is_admin=False):
+    """Crea un usuario (el primero con '/register', los demás como admin) y devuelve sus cabeceras."""
+    if admin_headers is None:
+        cliente.post('/api/register', json={"username": username, "password": password})
+    else:
+        cliente.post('/api/users', json={"username": username, "password": password, "is_admin": is_admin}, headers=admin_headers)
+    api_key = cliente.post('/api/login', json={"username": username, "password": password}).json['api_key']
+    return {'X-Api-Key': api_key}
+
+@pytest.fixture
+def admin(cliente):
+    """Cabeceras del administrador (primer usuario registrado)."""
+    return registrar(cliente, 'admin')
+
+@pytest.fixture
+def contar_consultas(app):
+    """Devuelve una lista que acumula las sentencias SQL ejecutadas por el motor."""
+    sentencias = []
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _antes)
+    yield sentencias
+    event.remove(engine, 'before_cursor_execute', _antes)
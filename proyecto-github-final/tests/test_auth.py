@@ -0,0 +1,44 @@
+# tests/test_auth.py
+"""API Keys: una por inicio de sesión, rotación y claves de versiones anteriores (ver auth.py)."""
+import pytest
+from project import db
+from project.models import ApiKey, User, hash_api_key
+from tests.conftest import crear_app
+
+def iniciar_sesion(cliente, **extra):
+    r = cliente.post('/api/login', json={"username": 'admin', "password": 'clave', **extra})
+    assert r.status_code == 200
+    return {'X-Api-Key': r.json['api_key']}
+
+def vale(cliente, cabeceras):
+    return cliente.get('/api/categorias', headers=cabeceras).status_code == 200
+
+def test_cada_inicio_de_sesion_conserva_las_claves_anteriores(cliente, admin):
+    otro_dispositivo = iniciar_sesion(cliente)
+    assert vale(cliente, admin) and vale(cliente, otro_dispositivo)
+
+def test_rotar_revoca_las_demas_claves(cliente, admin):
+    otro_dispositivo = iniciar_sesion(cliente)
+    nueva = iniciar_sesion(cliente, rotar=True)
+    assert not vale(cliente, admin)
+    assert not vale(cliente, otro_dispositivo)
+    assert vale(cliente, nueva)
+
+def test_se_revocan_las_claves_mas_antiguas(tmp_path):
+    cliente = crear_app(str(tmp_path), API_KEYS_POR_USUARIO=2).test_client()
+    cliente.post('/api/register', json={"username": 'admin', "password": 'clave'})
+    primera, segunda, tercera = (iniciar_sesion(cliente) for _ in range(3))
+    assert not vale(cliente, primera)
+    assert vale(cliente, segunda) and vale(cliente, tercera)
+
+@pytest.mark.parametrize('guardada', [hash_api_key, lambda clave: clave], ids=['hash', 'texto_plano'])
+def test_clave_de_version_anterior_pasa_a_api_keys(app, cliente, admin, guardada):
+    with app.app_context():
+        db.session.execute(db.delete(ApiKey))
+        db.session.execute(db.update(User).values(api_key_hash=guardada('clave-antigua')))
+        db.session.commit()
+    assert vale(cliente, {'X-Api-Key': 'clave-antigua'})
+    with app.app_context():
+        assert db.session.execute(db.select(User.api_key_hash)).scalar_one() is None
+        assert db.session.execute(db.select(ApiKey.key_hash)).scalar_one() == hash_api_key('clave-antigua')
+    assert vale(cliente, {'X-Api-Key': 'clave-antigua'})
@@ -0,0 +1,31 @@
+# tests/test_backends_ocr.py
+"""Los motores de OCR deben entregar la misma fecha y monto que 'int8' (ver benchmarks/backends_ocr.py).
+
+Se omite si EasyOCR no está instalado; el motor 'onnx' además necesita onnxruntime.
+Cada motor corre en un subproceso sobre las imágenes de project/uploads.
+"""
+import os
+import importlib.util
+import pytest
+
+pytest.importorskip('easyocr')
+
+from benchmarks.backends_ocr import RAIZ, medir_backend
+from benchmarks.preprocesamiento_ocr import imagenes_de
+
+RUTAS = imagenes_de(os.path.join(RAIZ, 'project', 'uploads'))
+
+@pytest.fixture(scope='module')
+def referencia(tmp_path_factory):
+    medidas = medir_backend('int8', RUTAS, 1, str(tmp_path_factory.mktemp('onnx')))
+    assert "error" not in medidas, medidas.get("error")
+    return medidas["resultados"]
+
+SIN_ONNX = importlib.util.find_spec('onnxruntime') is None
+
+@pytest.mark.parametrize('backend', ['fp32', pytest.param('onnx', marks=pytest.mark.skipif(SIN_ONNX, reason="onnxruntime no está instalado"))])
+def test_paridad_con_int8(backend, referencia, tmp_path):
+    medidas = medir_backend(backend, RUTAS, 1, str(tmp_path))
+    assert "error" not in medidas, medidas.get("error")
+    distintas = {os.path.basename(r): (medidas["resultados"][r], referencia[r]) for r in RUTAS if medidas["resultados"][r] != referencia[r]}
+    assert distintas == {}
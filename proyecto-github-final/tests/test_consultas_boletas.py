@@ -0,0 +1,50 @@
+# tests/test_consultas_boletas.py
+"""Regresión de la cantidad de consultas SQL de '/api/boletas' (sin cargas diferidas por fila)."""
+import pytest
+from conftest import crear_app, registrar
+
+@pytest.fixture
+def app(tmp_path):
+    # Sin la caché de páginas, cada petición ejecuta sus consultas reales.
+    return crear_app(str(tmp_path), CACHE_PAGINAS_ACTIVA=False)
+
+@pytest.fixture
+def con_boletas(cliente, admin):
+    """Un usuario normal con 30 boletas repartidas en dos categorías."""
+    usuario = registrar(cliente, 'usuario', admin_headers=admin)
+    categorias = [cliente.post('/api/categorias', json={"nombre": nombre}, headers=admin).json['id'] for nombre in ('Comida', 'Viaje')]
+    for i in range(30):
+        r = cliente.post('/api/boletas/manual', headers=usuario, data={
+            "fecha": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", "monto_total": str(1000 + i), "categoria_id": str(categorias[i % 2])})
+        assert r.status_code == 201
+    return usuario
+
+def _consultas_de(cliente, contar_consultas, url, cabeceras):
+    # Una primera petición llena la caché de autenticación, que no es lo que se mide.
+    assert cliente.get(url, headers=cabeceras).status_code == 200
+    contar_consultas.clear()
+    r = cliente.get(url, headers=cabeceras)
+    assert r.status_code == 200
+    return r, [s for s in contar_consultas if s.strip().upper().startswith('SELECT')]
+
+@pytest.mark.parametrize('per_page', [5, 25])
+def test_pagina_no_depende_de_per_page(cliente, con_boletas, admin, contar_consultas, per_page):
+    # Versión de los datos para el ETag (el administrador suma además la de todos los
+    # usuarios), conteo total y la página: ninguna consulta por boleta.
+    for cabeceras, esperadas in ((con_boletas, 3), (admin, 4)):
+        r, consultas = _consultas_de(cliente, contar_consultas, f'/api/boletas?per_page={per_page}', cabeceras)
+        assert len(r.json['boletas']) == per_page
+        assert len(consultas) == esperadas, consultas
+
+def test_cursor_no_cuenta_el_total(cliente, con_boletas, contar_consultas):
+    r, consultas = _consultas_de(cliente, contar_consultas, '/api/boletas?cursor=&per_page=20', con_boletas)
+    assert len(r.json['boletas']) == 20 and r.json['has_next']
+    assert len(consultas) == 2, consultas
+    r, consultas = _consultas_de(cliente, contar_consultas, f"/api/boletas?cursor={r.json['next_cursor']}&per_page=20", con_boletas)
+    assert len(r.json['boletas']) == 10 and not r.json['has_next']
+    assert len(consultas) == 2, consultas
+
+def test_respuesta_incluye_categoria_y_creador(cliente, con_boletas):
+    boleta = cliente.get('/api/boletas?per_page=1', headers=con_boletas).json['boletas'][0]
+    assert boleta['categoria'] in ('Comida', 'Viaje')
+    assert boleta['creador'] == 'usuario'
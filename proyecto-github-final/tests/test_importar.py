@@ -0,0 +1,53 @@
+# tests/test_importar.py
+"""Importación masiva de boletas desde CSV (ver importar.py)."""
+import io
+import json
+import pytest
+from project import db
+from project.models import BoletaBusqueda
+
+@pytest.fixture
+def categoria(cliente, admin):
+    cliente.post('/api/categorias', headers=admin, json={"nombre": 'Comida'})
+
+def importar_csv(cliente, cabeceras, texto, **args):
+    return cliente.post('/api/boletas/bulk', headers=cabeceras, query_string=args,
+                        data={"archivo": (io.BytesIO(texto.encode('utf-8')), 'boletas.csv')})
+
+@pytest.mark.parametrize('monto', ['inf', '1e400', 'nan', 'abc'])
+def test_monto_no_finito_es_un_error_de_fila(cliente, admin, categoria, monto):
+    r = importar_csv(cliente, admin, f"fecha,monto_total,categoria\n2024-01-01,1000,Comida\n2024-01-02,{monto},Comida\n")
+    assert r.status_code == 400
+    assert r.json['errores'] == [{"fila": 2, "errores": ["El monto total debe ser un número válido."]}]
+    assert r.json['filas_insertadas'] == 0
+
+@pytest.mark.parametrize('fila, error', [
+    ({"imagen": 5}, "La columna 'imagen' debe ser texto."),
+    ({"notas": [1]}, "La columna 'notas' debe ser texto."),
+    ({"razon_modificacion": {"a": 1}}, "La columna 'razon_modificacion' debe ser texto."),
+], ids=['imagen', 'notas', 'razon'])
+def test_columna_de_texto_con_otro_tipo_es_un_error_de_fila(cliente, admin, categoria, fila, error):
+    texto = json.dumps({"fecha": '2024-01-01', "monto_total": 1000, "categoria": 'Comida', **fila}) + '\n'
+    r = cliente.post('/api/boletas/bulk', headers=admin,
+                     data={"archivo": (io.BytesIO(texto.encode('utf-8')), 'boletas.ndjson')})
+    assert r.status_code == 400
+    assert r.json['errores'] == [{"fila": 1, "errores": [error]}]
+
+@pytest.mark.parametrize('contenido', [
+    "fecha,monto_total,categoria,notas\n2024-01-01,1000,Comida,café\n".encode('latin-1'),
+    # Un campo mayor que csv.field_size_limit() hace fallar al lector con csv.Error.
+    b'fecha,monto_total,categoria,notas\n2024-01-01,1000,Comida,"' + b'x' * 200000 + b'"\n',
+], ids=['latin1', 'csv_mal_formado'])
+def test_csv_ilegible_es_un_error_del_archivo(cliente, admin, categoria, contenido):
+    r = cliente.post('/api/boletas/bulk', headers=admin, data={"archivo": (io.BytesIO(contenido), 'boletas.csv')})
+    assert r.status_code == 400
+    assert 'msg' in r.json
+
+def test_boletas_importadas_quedan_indexadas(app, cliente, admin, categoria):
+    filas = ''.join(f"2024-01-{i % 28 + 1:02d},{1000 + i},Comida,almuerzo {i}\n" for i in range(25))
+    r = importar_csv(cliente, admin, "fecha,monto_total,categoria,notas\n" + filas)
+    assert r.status_code == 201
+    assert r.json['filas_insertadas'] == 25
+    with app.app_context():
+        assert db.session.execute(db.select(db.func.count()).select_from(BoletaBusqueda)).scalar_one() == 25
+    assert len(cliente.get('/api/boletas?q=almuerzo&per_page=50', headers=admin).json['boletas']) == 25
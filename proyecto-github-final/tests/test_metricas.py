@@ -0,0 +1,26 @@
+# tests/test_metricas.py
+"""Acceso a '/api/metrics' y métricas de la cola de OCR (ver metricas.py)."""
+import pytest
+from tests.conftest import crear_app, registrar
+
+@pytest.fixture
+def app(tmp_path):
+    return crear_app(str(tmp_path), METRICAS_TOKEN='secreto')
+
+def test_metricas_exigen_token_o_administrador(cliente, admin):
+    normal = registrar(cliente, 'ana', admin_headers=admin)
+    assert cliente.get('/api/metrics').status_code == 401
+    assert cliente.get('/api/metrics', headers=normal).status_code == 401
+    assert cliente.get('/api/metrics', headers={'Authorization': 'Bearer otro'}).status_code == 401
+    assert cliente.get('/api/metrics', headers={'Authorization': 'Bearer secreto'}).status_code == 200
+    assert cliente.get('/api/metrics', headers=admin).status_code == 200
+
+@pytest.mark.parametrize('publicas, estado', [(False, 401), (True, 200)])
+def test_metricas_publicas_solo_si_se_pide(tmp_path, publicas, estado):
+    app = crear_app(str(tmp_path), METRICAS_PUBLICAS=publicas)
+    assert app.test_client().get('/api/metrics').status_code == estado
+
+def test_tiempo_de_trabajos_es_un_gauge(cliente, admin):
+    texto = cliente.get('/api/metrics', headers=admin).get_data(as_text=True)
+    assert '# TYPE boletas_ocr_trabajo_segundos gauge' in texto
+    assert 'boletas_ocr_trabajo_segundos_total' not in texto
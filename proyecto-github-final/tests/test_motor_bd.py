@@ -0,0 +1,41 @@
+# tests/test_motor_bd.py
+"""Transacciones de escritura en SQLite: bloqueo acotado y escritores concurrentes (ver motor_bd.py)."""
+import io
+from PIL import Image
+from benchmarks.concurrencia_sqlite import ejecutar
+from project import db, models, subidas
+from project.subidas import ImagenRechazada
+from tests.conftest import registrar
+
+def test_login_verifica_la_clave_sin_transaccion_abierta(cliente, monkeypatch):
+    registrar(cliente, 'admin')
+    en_transaccion = []
+    verificar = models.check_password_hash
+    def _verificar(*args):
+        en_transaccion.append(db.session().in_transaction())
+        return verificar(*args)
+    monkeypatch.setattr(models, 'check_password_hash', _verificar)
+    r = cliente.post('/api/login', json={"username": 'admin', "password": 'clave'})
+    assert r.status_code == 200
+    assert en_transaccion == [False]
+    assert cliente.get('/api/boletas', headers={'X-Api-Key': r.json['api_key']}).status_code == 200
+
+def test_subida_se_recibe_sin_transaccion_abierta(cliente, admin, monkeypatch):
+    # El login no llena la caché de auth: esta petición consulta la base para autenticar.
+    en_transaccion = []
+    def _recibir(*args, **kwargs):
+        en_transaccion.append(db.session().in_transaction())
+        raise ImagenRechazada("rechazada en la prueba", 415)
+    monkeypatch.setattr(subidas, 'recibir', _recibir)
+    imagen = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(imagen, 'PNG')
+    imagen.seek(0)
+    r = cliente.post('/api/boletas/upload', headers=admin, data={"boleta_image": (imagen, 'boleta.png')})
+    assert r.status_code == 415
+    assert en_transaccion == [False]
+
+def test_escritores_concurrentes_sin_bloqueos(tmp_path):
+    r = ejecutar(str(tmp_path), n_escritores=4, n_lectores=1, transacciones=10)
+    assert r["errores"] == {}
+    assert r["creadas"] == r["en_base"] == r["esperadas"] == 40
+    assert r["diferencias"] == []
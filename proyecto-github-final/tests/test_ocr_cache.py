@@ -0,0 +1,43 @@
+# tests/test_ocr_cache.py
+"""Caché de resultados de OCR en '/api/boletas/upload' (ver ocr_cache.py).
+
+EasyOCR no se carga: 'reconocer' se reemplaza por un resultado fijo.
+"""
+import io
+import pytest
+from PIL import Image
+from project import ocr_cache
+
+RESULTADO = [[[0, 0], "12 de Marzo del 2024", 0.9], [[0, 0], "TOTAL $ 15.990", 0.9]]
+
+@pytest.fixture
+def lecturas(monkeypatch):
+    """Registra cada imagen que pasa por el OCR."""
+    leidas = []
+    def _reconocer(imagen, *args, **kwargs):
+        leidas.append(imagen)
+        return RESULTADO
+    monkeypatch.setattr(ocr_cache, 'reconocer', _reconocer)
+    monkeypatch.setattr(ocr_cache, 'extraer_datos', lambda resultado: ('2024-03-12', 15990))
+    return leidas
+
+def subir(cliente, cabeceras, color='white'):
+    imagen = io.BytesIO()
+    Image.new('RGB', (16, 16), color).save(imagen, 'PNG')
+    imagen.seek(0)
+    return cliente.post('/api/boletas/upload?async=0', headers=cabeceras, data={"boleta_image": (imagen, 'boleta.png')})
+
+def test_fallo_consulta_la_cache_una_vez(cliente, admin, lecturas, contar_consultas):
+    r = subir(cliente, admin)
+    assert r.status_code == 200
+    assert r.json['desde_cache'] is False
+    assert len(lecturas) == 1
+    busquedas = [s for s in contar_consultas if s.lstrip().startswith('SELECT') and 'WHERE ocr_resultados.sha256 = ?' in s]
+    assert len(busquedas) == 1
+
+def test_acierto_no_vuelve_a_leer(cliente, admin, lecturas):
+    subir(cliente, admin)
+    r = subir(cliente, admin)
+    assert r.json['desde_cache'] is True
+    assert r.json['monto_sugerido'] == 15990
+    assert len(lecturas) == 1
@@ -0,0 +1,44 @@
+# tests/test_ocr_server.py
+"""Rutas de imágenes que acepta el servidor de OCR compartido (ver ocr_server.py).
+
+EasyOCR no se carga: 'ejecutar_lectura' se reemplaza por una que devuelve la ruta leída.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import pytest
+from project import ocr_server
+
+@pytest.fixture
+def servidor(tmp_path, monkeypatch):
+    """Servidor en un hilo que acepta imágenes de 'tmp_path/spool' y 'tmp_path/uploads'."""
+    monkeypatch.setattr(ocr_server, 'ejecutar_lectura', lambda reader, imagen, modo, **opciones: [[[0, 0], imagen, 1.0]])
+    for carpeta in ('spool', 'uploads'):
+        os.makedirs(tmp_path / carpeta)
+    # La ruta de un socket Unix tiene un largo máximo: se crea en una carpeta corta.
+    carpeta_socket = tempfile.mkdtemp(dir='/tmp')
+    socket_path = os.path.join(carpeta_socket, 'ocr.sock')
+    instancia = ocr_server.ServidorOcr(socket_path, None, [str(tmp_path / 'spool'), str(tmp_path / 'uploads')])
+    threading.Thread(target=instancia.serve_forever, daemon=True).start()
+    yield socket_path
+    instancia.shutdown()
+    instancia.server_close()
+    shutil.rmtree(carpeta_socket)
+
+def leer(socket_path, ruta):
+    return ocr_server.leer_texto_remoto(socket_path, str(ruta), {}, timeout=5)[0][1]
+
+def test_lee_rutas_dentro_de_las_carpetas_de_imagenes(servidor, tmp_path):
+    for carpeta in ('spool', 'uploads'):
+        ruta = tmp_path / carpeta / 'ab' / 'imagen.png'
+        os.makedirs(ruta.parent, exist_ok=True)
+        ruta.write_bytes(b'imagen')
+        assert leer(servidor, ruta) == os.path.realpath(ruta)
+
+@pytest.mark.parametrize('ruta', ['/etc/passwd', 'spool/../secreto.png', 'spool/enlace.png', 'spool-hermana/x.png'])
+def test_rechaza_rutas_fuera_de_las_carpetas(servidor, tmp_path, ruta):
+    (tmp_path / 'secreto.png').write_bytes(b'secreto')
+    os.symlink(tmp_path / 'secreto.png', tmp_path / 'spool' / 'enlace.png')
+    with pytest.raises(RuntimeError, match='carpeta de imágenes'):
+        leer(servidor, ruta if ruta.startswith('/') else tmp_path / ruta)
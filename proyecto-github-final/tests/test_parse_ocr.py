@@ -0,0 +1,23 @@
+# tests/test_parse_ocr.py
+"""'parse_ocr_text' debe dar los mismos resultados que su implementación anterior.
+
+Usa los corpus sintético y aleatorio de benchmarks/parse_ocr.py, con semilla fija.
+"""
+import pytest
+from benchmarks.parse_ocr import corpus_aleatorio, corpus_sintetico, parse_ocr_text_anterior
+from project.ocr import parse_ocr_text
+
+@pytest.mark.parametrize('corpus', [corpus_sintetico(2000), corpus_aleatorio(20000)], ids=['sintetico', 'aleatorio'])
+def test_coincide_con_la_version_anterior(corpus):
+    distintos = [(textos, parse_ocr_text_anterior(textos), parse_ocr_text(textos))
+                 for textos in corpus if parse_ocr_text_anterior(textos) != parse_ocr_text(textos)]
+    assert distintos == []
+
+@pytest.mark.parametrize('textos, esperado', [
+    (["BOLETA", "12 de Marzo del 2024", "TOTAL $ 15.990"], ('2024-03-12', 15990)),
+    (["05 ENE 2023", "Total 1,250"], ('2023-01-05', 1250)),
+    (["2022-7-9", "monto 999"], ('2022-07-09', 999)),
+    (["sin fecha", "12"], (None, 0)),
+])
+def test_casos_conocidos(textos, esperado):
+    assert parse_ocr_text(textos) == esperado
@@ -0,0 +1,22 @@
+# tests/test_planes_boletas.py
+"""Los filtros principales de boletas deben usar un índice (ver benchmarks/planes_boletas.py)."""
+import pytest
+from benchmarks.planes_boletas import _sembrar, consultas, plan
+from project import db
+from tests.conftest import crear_app
+
+@pytest.fixture(scope='module')
+def planes(tmp_path_factory):
+    """Plan de cada consulta sobre una base con boletas sintéticas y estadísticas de ANALYZE."""
+    app = crear_app(str(tmp_path_factory.mktemp('planes')))
+    with app.app_context():
+        _sembrar(db, 5000)
+        db.session.execute(db.text("ANALYZE"))
+        resultado = {nombre: plan(db, consulta) for nombre, consulta in consultas().items()}
+        db.engine.dispose()
+    return resultado
+
+def test_ninguna_consulta_recorre_boletas_sin_indice(planes):
+    assert planes
+    sin_indice = {nombre: detalles for nombre, (detalles, falta) in planes.items() if falta}
+    assert sin_indice == {}
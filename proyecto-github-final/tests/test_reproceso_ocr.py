@@ -0,0 +1,80 @@
+# tests/test_reproceso_ocr.py
+"""Lecturas de OCR permanentes y 'flask reparse-ocr --aplicar' (ver reproceso_ocr.py).
+
+EasyOCR no se carga: 'reconocer' se reemplaza por un resultado fijo.
+"""
+import io
+import pytest
+from PIL import Image
+from project import db, busqueda, ocr_cache, resumen, reproceso_ocr
+from project.models import Boleta, OcrLectura, OcrResultado
+from tests.conftest import crear_app, registrar
+
+RESULTADO = [[[0, 0], "Ferretería El Clavo", 0.9], [[0, 0], "TOTAL $ 15.990", 0.9]]
+
+@pytest.fixture(autouse=True)
+def sin_easyocr(monkeypatch):
+    monkeypatch.setattr(ocr_cache, 'reconocer', lambda imagen, *args, **kwargs: RESULTADO)
+    monkeypatch.setattr(ocr_cache, 'extraer_datos', lambda resultado: ('2024-03-12', 15990))
+
+def imagen_png():
+    imagen = io.BytesIO()
+    Image.new('RGB', (16, 16), 'white').save(imagen, 'PNG')
+    return imagen.getvalue()
+
+def subir(cliente, cabeceras, datos):
+    r = cliente.post('/api/boletas/upload?async=0', headers=cabeceras, data={"boleta_image": (io.BytesIO(datos), 'boleta.png')})
+    assert r.status_code == 200
+    return r.json
+
+def crear_boleta(cliente, cabeceras, datos, razon):
+    r = cliente.post('/api/boletas/manual', headers=cabeceras, data={
+        "fecha": '2024-03-12', "monto_total": '15990', "categoria_id": '1', "razon_modificacion": razon,
+        "boleta_image": (io.BytesIO(datos), 'boleta.png'),
+    })
+    assert r.status_code == 201
+    return r.json['id']
+
+def contar(modelo):
+    return db.session.execute(db.select(db.func.count()).select_from(modelo)).scalar_one()
+
+def test_la_lectura_sobrevive_a_la_cache(app, cliente, admin):
+    subir(cliente, admin, imagen_png())
+    with app.app_context():
+        ocr_cache.recortar(0)
+        assert contar(OcrResultado) == 0
+        assert contar(OcrLectura) == 1
+    subir(cliente, admin, imagen_png())
+    with app.app_context():
+        assert ocr_cache.purgar() == 1
+        assert contar(OcrLectura) == 1
+
+def test_con_la_cache_desactivada_se_guarda_la_lectura(tmp_path):
+    app = crear_app(str(tmp_path), OCR_CACHE_ACTIVO=False)
+    cliente = app.test_client()
+    admin = registrar(cliente, 'admin')
+    assert subir(cliente, admin, imagen_png())['desde_cache'] is False
+    with app.app_context():
+        assert contar(OcrResultado) == 0
+        lectura = db.session.execute(db.select(OcrLectura)).scalar_one()
+        assert (lectura.fecha, lectura.monto) == ('2024-03-12', 15990)
+
+def test_aplicar_actualiza_las_boletas_sin_correcciones(app, cliente, admin):
+    datos = imagen_png()
+    cliente.post('/api/categorias', headers=admin, json={"nombre": 'Hogar'})
+    subir(cliente, admin, datos)
+    sha256 = ocr_cache.hash_bytes(datos)
+    aceptada = crear_boleta(cliente, admin, datos, '')
+    corregida = crear_boleta(cliente, admin, datos, 'Corrección Manual')
+    with app.app_context():
+        ocr_cache.purgar()
+        busqueda.reconstruir()
+        diferencia = reproceso_ocr.Diferencia(sha256, '2024-03-12', 15990, '2024-04-02', 16990)
+        assert reproceso_ocr._aplicar([diferencia]) == 1
+        assert (db.session.get(Boleta, aceptada).fecha.isoformat(), db.session.get(Boleta, aceptada).monto_total) == ('2024-04-02', 16990)
+        assert (db.session.get(Boleta, corregida).fecha.isoformat(), db.session.get(Boleta, corregida).monto_total) == ('2024-03-12', 15990)
+        assert db.session.get(OcrLectura, sha256).monto == 16990
+        assert resumen.verificar() == []
+    # El índice, reconstruido con la caché vacía, sigue incluyendo el texto leído.
+    r = cliente.get('/api/boletas?q=ferreteria', headers=admin)
+    assert {b['id'] for b in r.json['boletas']} == {aceptada, corregida}
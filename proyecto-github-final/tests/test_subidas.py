@@ -0,0 +1,100 @@
+# tests/test_subidas.py
+"""Límites de las subidas de imágenes y de las imágenes de un ZIP importado (ver subidas.py)."""
+import io
+import os
+import zipfile
+import pytest
+from PIL import Image
+from project import subidas
+from tests.conftest import crear_app, registrar
+
+@pytest.fixture
+def app(tmp_path):
+    return crear_app(str(tmp_path), SUBIDA_MAX_BYTES=100_000, SUBIDA_MAX_PIXELES=1_000_000)
+
+@pytest.fixture
+def categoria(cliente, admin):
+    return cliente.post('/api/categorias', headers=admin, json={"nombre": 'Comida'}).json['id']
+
+def png(ancho=16, alto=16):
+    datos = io.BytesIO()
+    Image.new('RGB', (ancho, alto), 'white').save(datos, 'PNG')
+    return datos.getvalue()
+
+def temporales(carpeta):
+    return [n for _, _, nombres in os.walk(carpeta) for n in nombres if n.startswith('.subida-')]
+
+def test_imagen_grande_se_rechaza_por_el_limite_de_la_peticion(app, cliente, admin):
+    grande = png() + os.urandom(300_000)
+    r = cliente.post('/api/boletas/upload?async=1', headers=admin, data={"boleta_image": (io.BytesIO(grande), 'boleta.png')})
+    assert r.status_code == 413
+    assert temporales(app.config['OCR_SPOOL_FOLDER']) == []
+
+def test_imagen_del_formulario_no_se_copia_otra_vez(app, cliente, admin, categoria, monkeypatch):
+    def _sin_copia(*args, **kwargs):
+        raise AssertionError("la imagen se copió a un segundo temporal")
+    monkeypatch.setattr(subidas.tempfile, 'mkstemp', _sin_copia)
+    datos = png()
+    r = cliente.post('/api/boletas/manual', headers=admin, data={
+        "fecha": '2024-05-01', "monto_total": '1000', "categoria_id": str(categoria), "boleta_image": (io.BytesIO(datos), 'boleta.png')})
+    assert r.status_code == 201
+    assert os.path.getsize(os.path.join(app.config['UPLOAD_FOLDER'], r.json['imagen_url'])) == len(datos)
+    assert temporales(app.config['UPLOAD_FOLDER']) == []
+
+def test_subida_asincrona_deja_la_imagen_en_la_cola(app, cliente, admin):
+    r = cliente.post('/api/boletas/upload?async=1', headers=admin, data={"boleta_image": (io.BytesIO(png()), 'boleta.png')})
+    assert r.status_code == 202
+    spool = app.config['OCR_SPOOL_FOLDER']
+    assert [n for n in os.listdir(spool) if n.endswith('_boleta.png')]
+    assert temporales(spool) == []
+
+def zip_con(imagenes):
+    datos = io.BytesIO()
+    with zipfile.ZipFile(datos, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('manifest.csv', 'fecha,monto_total,categoria,imagen\n' + ''.join(f"2024-01-{i + 1:02d},1000,Comida,{n}\n" for i, n in enumerate(imagenes)))
+        for nombre, contenido in imagenes.items():
+            archivo.writestr(nombre, contenido)
+    datos.seek(0)
+    return datos
+
+@pytest.mark.parametrize('contenido, mensaje', [
+    (b'no es una imagen' * 10, 'no es una imagen'),
+    (b'\x89PNG\r\n\x1a\n' + b'\x00' * 200_000, 'supera el máximo'),
+    (png(2000, 2000), 'píxeles'),
+], ids=['no_es_imagen', 'demasiado_grande', 'demasiados_pixeles'])
+def test_zip_con_imagen_no_valida_se_rechaza(app, cliente, admin, categoria, contenido, mensaje):
+    r = cliente.post('/api/boletas/bulk', headers=admin, data={"archivo": (zip_con({'a.png': contenido}), 'boletas.zip')})
+    assert r.status_code == 400
+    assert mensaje in r.json['msg']
+    assert cliente.get('/api/boletas', headers=admin).json['boletas'] == []
+
+def test_zip_supera_el_total_descomprimido(tmp_path):
+    app = crear_app(str(tmp_path), BULK_ZIP_MAX_BYTES=1000)
+    cliente = app.test_client()
+    admin = registrar(cliente, 'admin')
+    cliente.post('/api/categorias', headers=admin, json={"nombre": 'Comida'})
+    imagenes = {f"{i}.png": png(16 + i, 16) for i in range(20)}
+    r = cliente.post('/api/boletas/bulk', headers=admin, data={"archivo": (zip_con(imagenes), 'boletas.zip')})
+    assert r.status_code == 400
+    assert 'descomprimid' in r.json['msg']
+
+def test_zip_con_imagenes_validas(app, cliente, admin, categoria):
+    r = cliente.post('/api/boletas/bulk', headers=admin, data={"archivo": (zip_con({'a.png': png(), 'b.png': png(20, 20)}), 'boletas.zip')})
+    assert r.status_code == 201
+    assert r.json['filas_insertadas'] == 2
+    for boleta in cliente.get('/api/boletas', headers=admin).json['boletas']:
+        assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], boleta['imagen_url']))
+
+def test_extension_depende_del_contenido_y_no_del_nombre(app, cliente, admin, categoria):
+    datos = png()
+    rutas = set()
+    for nombre in ('boleta.jpg', 'boleta.JPEG', 'x.html', 'sin_extension'):
+        r = cliente.post('/api/boletas/manual', headers=admin, data={
+            "fecha": '2024-05-01', "monto_total": '1000', "categoria_id": str(categoria), "boleta_image": (io.BytesIO(datos), nombre)})
+        assert r.status_code == 201
+        rutas.add(r.json['imagen_url'])
+    r = cliente.post('/api/boletas/bulk', headers=admin, data={"archivo": (zip_con({'foto.svg': datos}), 'boletas.zip')})
+    assert r.status_code == 201
+    rutas.update(b['imagen_url'] for b in cliente.get('/api/boletas?per_page=10', headers=admin).json['boletas'])
+    assert len(rutas) == 1
+    assert rutas.pop().endswith('.png')